@@ -0,0 +1,46 @@
+import asyncio
+from contextlib import asynccontextmanager
+import time
+from typing import AsyncIterator
+import uuid
+
+from fastapi_cache import FastAPICache
+from fastapi_cache.backends.redis import RedisBackend
+from redis import asyncio as aioredis
+
+from app.config import settings
+
+
+# Снятие блокировки только её владельцем (compare-and-delete по токену)
+RELEASE_LOCK = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+def init_redis_cache():
+    """Инициализация FastAPICache с Redis-бекендом (приложение и CLI-скрипты)."""
+    redis = aioredis.from_url(f"redis://{settings.REDIS_HOST}:{settings.REDIS_PORT}", encoding="utf8", decode_responses=True)
+    FastAPICache.init(RedisBackend(redis), prefix="cache")
+    return redis
+
+
+@asynccontextmanager
+async def redis_lock(redis, key: str, timeout: int, wait: float = 0) -> AsyncIterator[bool]:
+    """
+    Блокировка в Redis: SET NX EX с уникальным токеном. Снимает её только владелец,
+    поэтому истёкшую и уже перехваченную другим процессом блокировку чужой
+    finally не удалит. wait — сколько секунд ждать освобождения.
+    Отдаёт True, если блокировка взята.
+    """
+    token = uuid.uuid4().hex
+    deadline = time.monotonic() + wait
+    while not (locked := bool(await redis.set(key, token, nx=True, ex=timeout))) and time.monotonic() < deadline:
+        await asyncio.sleep(0.05)
+    try:
+        yield locked
+    finally:
+        if locked:
+            await redis.eval(RELEASE_LOCK, 1, key, token)
@@ -3,8 +3,6 @@ from datetime import timedelta
 import json
 import uuid
 from fastapi import HTTPException
-from geopy.distance import geodesic
-from geopy.geocoders import Nominatim
 # from sentence_transformers import SentenceTransformer, util
 from fastapi_cache import FastAPICache
 from fastapi_cache.backends.redis import RedisBackend
@@ -15,34 +13,92 @@ import time
 from dataclasses import asdict
 
 from redis import asyncio as aioredis
-from sqlalchemy import insert, select
-from app.city.models import City
+from sqlalchemy import func, insert, or_, select
+from sqlalchemy.dialects.postgresql import aggregate_order_by, insert as pg_insert
+from app.cache import redis_lock
+from app.city.geocoding import geocoding_queue
+from app.city.names import normalize_city_name
+from app.city.models import City, CityAlias
+from app.city.registry import CityEntry, city_registry
 from app.dao.base import BaseDAO
 
+from app.config import settings
 from app.database import async_session_maker
 import logging
 
 logging.basicConfig(level=logging.INFO)
-geolocator = Nominatim(user_agent="geoapi")
+
+CITY_CACHE_VERSION_KEY = "city:cache_version"
+CITY_CACHE_LOCK_KEY = "city:cache_warmup"
+# Время жизни записей кэша городов, секунды
+CITY_CACHE_TTL = 604800
+# Версия истекает раньше записей (с запасом на время прогрева),
+# чтобы актуальная версия не осталась при уже истёкших записях
+CITY_CACHE_VERSION_TTL = CITY_CACHE_TTL - 3600
 
 class CityDAO(BaseDAO):
     model = City
 
-    @staticmethod
-    async def initialize_cache(cls):
-        """Инициализация кэша из базы данных."""
+    @classmethod
+    async def initialize_cache(cls, force: bool = False, chunk_size: int = 10_000) -> int:
+        """
+        Прогрев кэша городов из базы данных: все города и их алиасы пишутся
+        в Redis пачками через pipeline. Версия (число строк и контрольная сумма
+        названий, стран, координат и алиасов) хранится в CITY_CACHE_VERSION_KEY:
+        если кэш актуален, прогрев пропускается, а блокировка с токеном
+        (снимает только владелец) не даёт нескольким воркерам прогревать его одновременно.
+        Возвращает число записанных ключей.
+        """
         redis_backend = FastAPICache.get_backend()
         if not isinstance(redis_backend, RedisBackend):
             raise RuntimeError("Кэш-бекенд должен быть RedisBackend")
+        redis = redis_backend.redis
+
+        version = await cls.cache_version()
+        if not force and await redis.get(CITY_CACHE_VERSION_KEY) == version:
+            logging.info(f"Кэш городов актуален (версия {version})")
+            return 0
+
+        async with redis_lock(redis, CITY_CACHE_LOCK_KEY, timeout=300) as locked:
+            if not locked:
+                logging.info("Кэш городов прогревает другой воркер")
+                return 0
+
+            async with async_session_maker() as session:
+                cities = (await session.execute(select(City))).scalars().all()
+                aliases = (await session.execute(select(CityAlias.alias, CityAlias.city_id))).all()
+
+            payloads = {city.id: json.dumps(cls.prepare_city_dict(city)) for city in cities}
+            entries = {cls.cache_key(city.name): payloads[city.id] for city in cities}
+            entries.update({f"city:{alias}": payloads[city_id] for alias, city_id in aliases})
+
+            items = list(entries.items())
+            for start in range(0, len(items), chunk_size):
+                async with redis.pipeline(transaction=False) as pipe:
+                    for key, value in items[start:start + chunk_size]:
+                        pipe.set(key, value, ex=CITY_CACHE_TTL)
+                    await pipe.execute()
+            await redis.set(CITY_CACHE_VERSION_KEY, version, ex=CITY_CACHE_VERSION_TTL)
+            logging.info(f"Кэш городов прогрет: {len(items)} ключей (версия {version})")
+            return len(items)
 
+    @classmethod
+    async def cache_version(cls) -> str:
+        """
+        Версия содержимого таблиц городов: число строк и md5 по отсортированным
+        (название, страна, координаты) и (алиас, город). Меняется и при
+        переименовании или правке координат, когда число строк прежнее.
+        """
+        city_row = func.concat_ws("|", City.name, City.country, City.latitude, City.longitude)
+        alias_row = func.concat_ws("|", CityAlias.alias, CityAlias.city_id)
         async with async_session_maker() as session:
-            result = await session.execute(select(City))
-            cities = result.scalars().all()
-
-            for city in cities:
-                city_dict_serializable = cls.prepare_city_dict(city)
-                city_json = json.dumps(city_dict_serializable)
-                await redis_backend.set(f"city:{city.name}", city_json, expire=604800)
+            cities_count, cities_hash = (await session.execute(
+                select(func.count(), func.md5(func.string_agg(city_row, aggregate_order_by(",", City.name))))
+            )).one()
+            aliases_count, aliases_hash = (await session.execute(
+                select(func.count(), func.md5(func.string_agg(alias_row, aggregate_order_by(",", CityAlias.alias))))
+            )).one()
+        return f"{cities_count}:{aliases_count}:{cities_hash or ''}:{aliases_hash or ''}"
 
     @staticmethod
     def prepare_city_dict(city: City) -> dict:
@@ -56,72 +112,115 @@ class CityDAO(BaseDAO):
         }
         return {key: str(value) if isinstance(value, uuid.UUID) else value for key, value in city_dict.items()}
 
+    @staticmethod
+    def cache_key(city_name: str) -> str:
+        """Ключ Redis по нормализованному названию: "Moscow " и "moscow" — одна запись."""
+        return f"city:{normalize_city_name(city_name)}"
+
     @classmethod
     async def get_or_create_city(cls, city_name: str):
         """Fetch city info from cache, database, or geolocator."""
+        # Реестр воркера (с индексом алиасов) отвечает без обращений к Redis
+        entry = city_registry.get(city_name)
+        if entry is not None:
+            # Город справочника, на который впервые сослался пользователь, попадает в матрицу
+            city_registry.reference([entry.index])
+            return cls.entry_dict(entry)
+
         redis_backend = FastAPICache.get_backend()
         logging.info(f"Пытаемся найти город: {city_name}")
 
         # Проверяем кэш Redis
-        cached_city = await redis_backend.get(f"city:{city_name}")
+        cached_city = await redis_backend.get(cls.cache_key(city_name))
         if cached_city:
-            return json.loads(cached_city)
+            city_dict = json.loads(cached_city)
+            city_registry.register(city_dict)
+            city_registry.add_alias(city_name, city_dict["name"])
+            return city_dict
 
-        # Если нет в кэше, выполняем запрос к базе данных
+        # Если нет в кэше, выполняем запрос к базе данных: по имени или по алиасу
         logging.info(f"Запрос к базе данных для города: {city_name}")
         async with async_session_maker() as session:
-            result = await session.execute(select(cls.model).where(cls.model.name == city_name))
+            alias_city_ids = select(CityAlias.city_id).where(CityAlias.alias == normalize_city_name(city_name))
+            result = await session.execute(
+                select(cls.model).where(or_(cls.model.name == city_name, cls.model.id.in_(alias_city_ids)))
+            )
             city = result.scalars().first()
 
-            if not city:
-                logging.info(f"Город не найден, создаем новый: {city_name}")
-                # Используем геолокатор, если город не найден
-                await asyncio.sleep(6)
-                location = geolocator.geocode(city_name)
-                if not location:
-                    raise HTTPException(status_code=404, detail="City not found")
-
-                city_data = {
-                    "name": city_name,
-                    "country": location.address.split(",")[-1].strip(),
-                    "latitude": location.latitude,
-                    "longitude": location.longitude,
-                }
-
-                logging.info(f"Вставляем новый город в базу данных: {city_name}")
-                query = insert(cls.model).values(city_data).returning(cls.model)
-                result = await session.execute(query)
-                await session.commit()
-                city = result.scalar_one()
-            logging.info(f"Город найден: {city_name}")
-
-            # Подготовим данные города
-            city_dict_serializable = cls.prepare_city_dict(city)
-            city_json = json.dumps(city_dict_serializable)
-
-            # Запишем город в кэш и вернем данные
-            await redis_backend.set(f"city:{city_name}", city_json, expire=604800)
-            return json.loads(city_json)
+        if not city:
+            city = await cls.geocode_and_insert(city_name)
+        logging.info(f"Город найден: {city_name}")
+
+        # Подготовим данные города
+        city_dict_serializable = cls.prepare_city_dict(city)
+        city_json = json.dumps(city_dict_serializable)
+
+        # Запишем город в кэш и реестр и вернем данные
+        await redis_backend.set(cls.cache_key(city_name), city_json, expire=CITY_CACHE_TTL)
+        city_registry.register(city_dict_serializable)
+        city_registry.add_alias(city_name, city.name)
+        return json.loads(city_json)
+
+    @classmethod
+    async def geocode_and_insert(cls, city_name: str) -> City:
+        """
+        Геокодирует новый город через очередь геокодирования и сохраняет его.
+        Ненайденные города запоминаются в Redis, чтобы другие воркеры не повторяли запрос;
+        при одновременной вставке из нескольких воркеров используется уже вставленная строка.
+        """
+        redis_backend = FastAPICache.get_backend()
+        missing_key = f"city_missing:{normalize_city_name(city_name)}"
+        if await redis_backend.get(missing_key):
+            raise HTTPException(status_code=404, detail="City not found")
+
+        logging.info(f"Город не найден, геокодируем: {city_name}")
+        location = await geocoding_queue.geocode(city_name)
+        if not location:
+            await redis_backend.set(missing_key, "1", expire=settings.GEOCODER_NEGATIVE_TTL)
+            raise HTTPException(status_code=404, detail="City not found")
+
+        logging.info(f"Вставляем новый город в базу данных: {city_name}")
+        async with async_session_maker() as session:
+            await session.execute(
+                pg_insert(cls.model)
+                .values(name=city_name, **location._asdict())
+                .on_conflict_do_nothing(index_elements=[cls.model.name])
+            )
+            result = await session.execute(select(cls.model).where(cls.model.name == city_name))
+            city = result.scalar_one()
+            # Следующие написания с другим регистром/пробелами найдутся по алиасу
+            await session.execute(
+                pg_insert(CityAlias)
+                .values(alias=normalize_city_name(city_name), city_id=city.id)
+                .on_conflict_do_nothing(index_elements=[CityAlias.alias])
+            )
+            await session.commit()
+            return city
+
+    @staticmethod
+    def entry_dict(entry: CityEntry) -> dict:
+        """Запись реестра в формате prepare_city_dict."""
+        return {
+            "id": entry.id,
+            "name": entry.name,
+            "country": entry.country,
+            "latitude": entry.latitude,
+            "longitude": entry.longitude,
+        }
+
+    @classmethod
+    async def resolve_cities(cls, city_names: list[str]) -> list[CityEntry]:
+        """
+        Записи реестра для списка городов. Обращение к Redis/БД/геокодеру
+        происходит только для городов, которых ещё нет в реестре.
+        """
+        for name in dict.fromkeys(city_names):
+            if name not in city_registry:
+                await cls.get_or_create_city(name)
+        return [city_registry.get(name) for name in city_names]
 
     @classmethod
     async def calculate_geo_similarity(cls, city1: str, city2: str) -> float:
-        """Асинхронно вычисляет географическое сходство между двумя городами."""
-        city1_info = await cls.get_or_create_city(city1)
-        city2_info = await cls.get_or_create_city(city2)
-
-        if not city1_info or not city2_info:
-            return 0.0
-
-        distance = geodesic(
-            (city1_info["latitude"], city1_info["longitude"]),
-            (city2_info["latitude"], city2_info["longitude"])
-        ).kilometers
-
-        if distance < 50:
-            return 1.0
-        elif distance < 500:
-            return 0.5
-        elif city1_info["country"] == city2_info["country"]:
-            return 0.8
-        else:
-            return 0.0
\ No newline at end of file
+        """Асинхронно вычисляет географическое сходство между двумя городами по матрице реестра."""
+        entry1, entry2 = await cls.resolve_cities([city1, city2])
+        return city_registry.geo_similarity(entry1.index, entry2.index)
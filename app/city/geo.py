@@ -0,0 +1,31 @@
+import numpy as np
+
+
+# Средний радиус Земли (IUGG), км
+EARTH_RADIUS_KM = 6371.0088
+
+# Уровни географического сходства; в матрице хранится номер уровня (uint8)
+GEO_LEVELS = np.array([0.0, 0.5, 0.8, 1.0], dtype=np.float64)
+LEVEL_NONE, LEVEL_REGION, LEVEL_COUNTRY, LEVEL_LOCAL = 0, 1, 2, 3
+
+
+def haversine_km(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """Векторное расстояние по большому кругу в километрах (аргументы в градусах, с broadcasting)."""
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(a, dtype=np.float64)) for a in (lat1, lon1, lat2, lon2))
+    a = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def geo_levels(distance_km: np.ndarray, same_country: np.ndarray) -> np.ndarray:
+    """
+    Правила CityDAO: < 50 км — 1.0, < 500 км — 0.5,
+    иначе та же страна — 0.8, иначе 0.0. Возвращает номера уровней.
+    """
+    return np.select(
+        [distance_km < 50, distance_km < 500, same_country],
+        [LEVEL_LOCAL, LEVEL_REGION, LEVEL_COUNTRY],
+        default=LEVEL_NONE,
+    ).astype(np.uint8)
@@ -0,0 +1,93 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import threading
+import time
+from typing import NamedTuple, Protocol
+
+from geopy.geocoders import Nominatim
+
+from app.city.names import normalize_city_name
+from app.config import settings
+
+
+logger = logging.getLogger(__name__)
+
+
+class GeocodedCity(NamedTuple):
+    # ISO 3166-1 alpha-2, как в справочнике GeoNames
+    country: str
+    latitude: float
+    longitude: float
+
+
+class Geocoder(Protocol):
+    """Синхронный геокодер: выполняется в потоке очереди, поэтому может блокировать."""
+
+    def geocode(self, city_name: str) -> GeocodedCity | None: ...
+
+
+class NominatimGeocoder:
+    def __init__(self, user_agent: str = "geoapi"):
+        self._geolocator = Nominatim(user_agent=user_agent)
+
+    def geocode(self, city_name: str) -> GeocodedCity | None:
+        location = self._geolocator.geocode(city_name, addressdetails=True)
+        if not location:
+            return None
+        return GeocodedCity(
+            country=location.raw.get("address", {}).get("country_code", "").upper(),
+            latitude=location.latitude,
+            longitude=location.longitude,
+        )
+
+
+class GeocodingQueue:
+    """
+    Очередь геокодирования в отдельном потоке: запросы к геокодеру идут
+    по одному и не чаще одного раза в min_interval секунд, event loop не блокируется.
+    Одновременные запросы одного города (с точностью до регистра и пробелов)
+    ждут один вызов геокодера; ненайденные города запоминаются на negative_ttl секунд.
+    """
+
+    def __init__(self, geocoder: Geocoder, min_interval: float | None = None, negative_ttl: float | None = None):
+        self.geocoder = geocoder
+        self.min_interval = settings.GEOCODER_MIN_INTERVAL if min_interval is None else min_interval
+        self.negative_ttl = settings.GEOCODER_NEGATIVE_TTL if negative_ttl is None else negative_ttl
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="geocoder")
+        self._last_call = 0.0
+        self._rate_lock = threading.Lock()
+        self._in_flight: dict[str, asyncio.Future] = {}
+        self._missing: dict[str, float] = {}
+
+    def is_missing(self, city_name: str) -> bool:
+        expires = self._missing.get(normalize_city_name(city_name))
+        return expires is not None and expires > time.monotonic()
+
+    def _call(self, city_name: str) -> GeocodedCity | None:
+        with self._rate_lock:
+            wait = self._last_call + self.min_interval - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            try:
+                return self.geocoder.geocode(city_name)
+            finally:
+                self._last_call = time.monotonic()
+
+    async def geocode(self, city_name: str) -> GeocodedCity | None:
+        key = normalize_city_name(city_name)
+        if self.is_missing(key):
+            return None
+        future = self._in_flight.get(key)
+        if future is None:
+            future = asyncio.get_running_loop().run_in_executor(self._executor, self._call, city_name)
+            self._in_flight[key] = future
+            future.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        result = await asyncio.shield(future)
+        if result is None:
+            logger.info(f"Геокодер не нашёл город: {city_name}")
+            self._missing[key] = time.monotonic() + self.negative_ttl
+        return result
+
+
+geocoding_queue = GeocodingQueue(NominatimGeocoder())
@@ -0,0 +1,124 @@
+"""
+Массовая загрузка городов из справочника в формате GeoNames (cities15000.txt и т.п.:
+TSV без заголовка, колонки geonameid, name, asciiname, alternatenames, latitude, longitude,
+..., country code, ..., population). Страна хранится ISO-кодом, как и у городов,
+найденных геокодером. Города и их альтернативные названия загружаются
+через COPY во временные таблицы и переносятся в cities/city_aliases одним INSERT ... SELECT;
+существующие города не перезаписываются.
+
+Запуск из корня проекта:
+    python -m app.city.load_gazetteer data/cities15000.txt --min-population 15000
+"""
+import argparse
+import asyncio
+import csv
+import logging
+import sys
+import time
+import uuid
+
+from sqlalchemy import text
+
+from app.city.names import normalize_city_name
+from app.database import async_session_maker
+
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+csv.field_size_limit(sys.maxsize)
+
+# Номера колонок формата GeoNames
+NAME, ASCII_NAME, ALTERNATE_NAMES, LATITUDE, LONGITUDE, COUNTRY_CODE, POPULATION = 1, 2, 3, 4, 5, 8, 14
+
+CREATE_STAGING = [
+    """
+    CREATE TEMP TABLE gazetteer_cities (
+        id uuid, name text, country text, latitude float8, longitude float8, population bigint
+    ) ON COMMIT DROP
+    """,
+    "CREATE TEMP TABLE gazetteer_aliases (alias text, name text, population bigint) ON COMMIT DROP",
+]
+
+# При совпадающих названиях выигрывает самый населённый город
+MERGE_CITIES = """
+    INSERT INTO cities (id, name, country, latitude, longitude)
+    SELECT DISTINCT ON (name) id, name, country, latitude, longitude
+    FROM gazetteer_cities
+    ORDER BY name, population DESC
+    ON CONFLICT (name) DO NOTHING
+"""
+MERGE_ALIASES = """
+    INSERT INTO city_aliases (alias, city_id)
+    SELECT DISTINCT ON (a.alias) a.alias, c.id
+    FROM gazetteer_aliases a
+    JOIN cities c ON c.name = a.name
+    ORDER BY a.alias, a.population DESC
+    ON CONFLICT (alias) DO NOTHING
+"""
+
+
+def read_batches(path: str, min_population: int, batch_size: int):
+    """Потоково читает справочник и отдаёт пачки (города, алиасы) для COPY."""
+    cities, aliases = [], []
+    with open(path, encoding="utf-8", newline="") as file:
+        for row in csv.reader(file, delimiter="\t", quoting=csv.QUOTE_NONE):
+            population = int(row[POPULATION] or 0)
+            if population < min_population:
+                continue
+            name = row[NAME]
+            cities.append((
+                uuid.uuid4(), name, row[COUNTRY_CODE],
+                float(row[LATITUDE]), float(row[LONGITUDE]), population,
+            ))
+            names = {name, row[ASCII_NAME], *row[ALTERNATE_NAMES].split(",")}
+            for alias in {normalize_city_name(value) for value in names}:
+                if alias:
+                    aliases.append((alias, name, population))
+            if len(cities) >= batch_size:
+                yield cities, aliases
+                cities, aliases = [], []
+    if cities:
+        yield cities, aliases
+
+
+async def load(path: str, min_population: int, batch_size: int) -> dict:
+    started = time.perf_counter()
+    staged_cities = staged_aliases = 0
+    async with async_session_maker() as session:
+        connection = await session.connection()
+        raw_connection = (await connection.get_raw_connection()).driver_connection
+        for statement in CREATE_STAGING:
+            await session.execute(text(statement))
+
+        for cities, aliases in read_batches(path, min_population, batch_size):
+            await raw_connection.copy_records_to_table("gazetteer_cities", records=cities)
+            await raw_connection.copy_records_to_table("gazetteer_aliases", records=aliases)
+            staged_cities += len(cities)
+            staged_aliases += len(aliases)
+            logger.info(f"Прочитано городов: {staged_cities}, алиасов: {staged_aliases}")
+
+        inserted_cities = (await session.execute(text(MERGE_CITIES))).rowcount
+        inserted_aliases = (await session.execute(text(MERGE_ALIASES))).rowcount
+        await session.commit()
+
+    stats = {
+        "cities": inserted_cities,
+        "aliases": inserted_aliases,
+        "seconds": round(time.perf_counter() - started, 1),
+    }
+    logger.info(f"Справочник загружен: {stats}")
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-load a GeoNames-style gazetteer into cities")
+    parser.add_argument("path")
+    parser.add_argument("--min-population", type=int, default=0)
+    parser.add_argument("--batch-size", type=int, default=50_000)
+    args = parser.parse_args()
+    asyncio.run(load(args.path, args.min_population, args.batch_size))
+
+
+if __name__ == "__main__":
+    main()
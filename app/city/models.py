@@ -1,4 +1,4 @@
-from sqlalchemy import UUID, String
+from sqlalchemy import UUID, ForeignKey, String
 import uuid
 from sqlalchemy.orm import mapped_column, Mapped
 
@@ -15,3 +15,11 @@ class City(Base):
     latitude: Mapped[float]
     longitude: Mapped[float]
 
+
+
+class CityAlias(Base):
+    """Нормализованное написание (normalize_city_name) или альтернативное название города."""
+    __tablename__ = "city_aliases"
+
+    alias: Mapped[str] = mapped_column(String, primary_key=True)
+    city_id: Mapped[UUID] = mapped_column(ForeignKey("cities.id", ondelete="CASCADE"), index=True)
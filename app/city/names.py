@@ -0,0 +1,26 @@
+import re
+import unicodedata
+
+
+# Упрощённая транслитерация кириллицы (близко к ICAO/загранпаспортной)
+CYRILLIC_TO_LATIN = {
+    "а": "a", "б": "b", "в": "v", "г": "g", "д": "d", "е": "e", "ё": "e", "ж": "zh",
+    "з": "z", "и": "i", "й": "y", "к": "k", "л": "l", "м": "m", "н": "n", "о": "o",
+    "п": "p", "р": "r", "с": "s", "т": "t", "у": "u", "ф": "f", "х": "kh", "ц": "ts",
+    "ч": "ch", "ш": "sh", "щ": "shch", "ъ": "", "ы": "y", "ь": "", "э": "e", "ю": "yu",
+    "я": "ya", "і": "i", "ї": "yi", "є": "ye", "ґ": "g", "ў": "u",
+}
+_TRANSLITERATION = str.maketrans(CYRILLIC_TO_LATIN)
+_SEPARATORS = re.compile(r"[\W_]+")
+
+
+def normalize_city_name(city_name: str) -> str:
+    """
+    Ключ поиска города: регистр, пробелы, дефисы и знаки препинания,
+    диакритика и кириллица приводятся к одному виду
+    ("Ростов-на-Дону " -> "rostov na donu", "Zürich" -> "zurich").
+    """
+    text = city_name.casefold().translate(_TRANSLITERATION)
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return " ".join(_SEPARATORS.sub(" ", text).split())
@@ -0,0 +1,249 @@
+import logging
+from typing import NamedTuple
+
+import numpy as np
+from sklearn.neighbors import BallTree
+from sqlalchemy import select
+
+from app.city.geo import EARTH_RADIUS_KM, GEO_LEVELS, geo_levels, haversine_km
+from app.city.models import City, CityAlias
+from app.city.names import normalize_city_name
+from app.database import async_session_maker
+from app.users.models import Users
+
+
+logger = logging.getLogger(__name__)
+
+
+class CityEntry(NamedTuple):
+    id: str
+    name: str
+    country: str
+    latitude: float
+    longitude: float
+    # Порядковый номер города в реестре текущего воркера
+    index: int
+
+
+class CityRegistry:
+    """
+    In-process реестр городов воркера: name -> (id, country, lat, lon).
+    Загружается одним запросом при старте и пополняется,
+    когда CityDAO.get_or_create_city находит или создаёт новый город.
+
+    Координаты и страны хранятся массивами по CityEntry.index для всех городов
+    (включая справочник-газеттир), а плотная матрица геосходства
+    (номера уровней uint8) строится только по городам, на которые ссылаются
+    пользователи: их обычно на порядки меньше, чем городов в справочнике.
+    Для остальных городов уровни считаются на лету по координатам и стране.
+    """
+
+    def __init__(self):
+        self._by_name: dict[str, CityEntry] = {}
+        # Нормализованное написание или альтернативное название -> имя города
+        self._aliases: dict[str, str] = {}
+        self._entries: list[CityEntry] = []
+        self._latitudes = np.empty(0, dtype=np.float64)
+        self._longitudes = np.empty(0, dtype=np.float64)
+        self._countries = np.empty(0, dtype=object)
+        # CityEntry.index -> строка матрицы (-1 — города в матрице нет) и обратно
+        self._slots = np.empty(0, dtype=np.int64)
+        self._referenced = np.empty(0, dtype=np.int64)
+        self._referenced_count = 0
+        self._levels = np.zeros((0, 0), dtype=np.uint8)
+        # Пространственный индекс (BallTree по гаверсинусу), перестраивается лениво
+        self._tree: BallTree | None = None
+        self._tree_size = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, name: str) -> bool:
+        return self.get(name) is not None
+
+    @property
+    def referenced_count(self) -> int:
+        """Число городов в матрице геосходства."""
+        return self._referenced_count
+
+    def get(self, name: str) -> CityEntry | None:
+        """Город по точному имени, а если такого нет — по индексу алиасов."""
+        entry = self._by_name.get(name)
+        if entry is None:
+            canonical = self._aliases.get(normalize_city_name(name))
+            entry = self._by_name.get(canonical) if canonical is not None else None
+        return entry
+
+    def add_alias(self, alias: str, name: str) -> None:
+        """Добавляет алиас для уже известного города (первый зарегистрированный выигрывает)."""
+        self._aliases.setdefault(normalize_city_name(alias), name)
+
+    def register(self, city: dict, update_matrix: bool = True) -> CityEntry:
+        """
+        Добавляет город (словарь в формате CityDAO.prepare_city_dict), если его ещё нет.
+        update_matrix — на город ссылается пользователь, он сразу попадает в матрицу;
+        города справочника при массовой загрузке регистрируются без неё.
+        """
+        entry = self._by_name.get(city["name"])
+        if entry is None:
+            entry = CityEntry(
+                id=str(city["id"]),
+                name=city["name"],
+                country=city["country"],
+                latitude=float(city["latitude"]),
+                longitude=float(city["longitude"]),
+                index=len(self._entries),
+            )
+            self._entries.append(entry)
+            self._by_name[entry.name] = entry
+            self.add_alias(entry.name, entry.name)
+            self._append(entry)
+        if update_matrix:
+            self.reference([entry.index])
+        return entry
+
+    def _append(self, entry: CityEntry) -> None:
+        """Координаты и страна нового города (ёмкость растёт удвоением)."""
+        n = entry.index
+        if n >= len(self._latitudes):
+            capacity = max(16, 2 * len(self._latitudes))
+            self._latitudes = np.resize(self._latitudes, capacity)
+            self._longitudes = np.resize(self._longitudes, capacity)
+            self._countries = np.resize(self._countries, capacity)
+            slots = np.full(capacity, -1, dtype=np.int64)
+            slots[:n] = self._slots[:n]
+            self._slots = slots
+        self._latitudes[n] = entry.latitude
+        self._longitudes[n] = entry.longitude
+        self._countries[n] = entry.country
+        self._slots[n] = -1
+
+    def _compute_levels(self, first: np.ndarray, second: np.ndarray) -> np.ndarray:
+        """Уровни геосходства городов first × second по координатам и стране."""
+        distance = haversine_km(
+            self._latitudes[first][:, None], self._longitudes[first][:, None],
+            self._latitudes[second][None, :], self._longitudes[second][None, :],
+        )
+        return geo_levels(distance, self._countries[first][:, None] == self._countries[second][None, :])
+
+    def reference(self, indices, block: int = 1024) -> None:
+        """
+        Добавляет города в матрицу геосходства: новые строки и столбцы
+        считаются блоками против всех городов матрицы (ёмкость растёт удвоением).
+        """
+        indices = np.unique(np.asarray(indices, dtype=np.int64))
+        new = indices[self._slots[indices] < 0]
+        if not len(new):
+            return
+        m = self._referenced_count
+        total = m + len(new)
+        if total > len(self._levels):
+            capacity = max(16, 2 * len(self._levels), total)
+            levels = np.zeros((capacity, capacity), dtype=np.uint8)
+            levels[:m, :m] = self._levels[:m, :m]
+            self._levels = levels
+            self._referenced = np.resize(self._referenced, capacity)
+        self._referenced[m:total] = new
+        self._slots[new] = np.arange(m, total)
+        self._referenced_count = total
+
+        referenced = self._referenced[:total]
+        for start in range(m, total, block):
+            end = min(start + block, total)
+            levels = self._compute_levels(referenced[start:end], referenced)
+            self._levels[start:end, :total] = levels
+            self._levels[:total, start:end] = levels.T
+
+    def _rebuild_matrix(self, indices=None) -> None:
+        """Полный пересчёт матрицы по городам indices (по умолчанию — по тем же, что и раньше)."""
+        if indices is None:
+            indices = self._referenced[:self._referenced_count].copy()
+        self._slots[:len(self._entries)] = -1
+        self._referenced_count = 0
+        self._levels = np.zeros((0, 0), dtype=np.uint8)
+        self.reference(indices)
+
+    def _levels_of(self, first: np.ndarray, second: np.ndarray) -> np.ndarray:
+        """Уровни для пар (first[i], second[i]): из матрицы, если оба города в ней, иначе на лету."""
+        first_slots, second_slots = self._slots[first], self._slots[second]
+        known = (first_slots >= 0) & (second_slots >= 0)
+        levels = np.empty(len(first), dtype=np.uint8)
+        levels[known] = self._levels[first_slots[known], second_slots[known]]
+        rest = np.flatnonzero(~known)
+        if len(rest):
+            distance = haversine_km(
+                self._latitudes[first[rest]], self._longitudes[first[rest]],
+                self._latitudes[second[rest]], self._longitudes[second[rest]],
+            )
+            levels[rest] = geo_levels(distance, self._countries[first[rest]] == self._countries[second[rest]])
+        return levels
+
+    def geo_row(self, index: int, columns: np.ndarray | None = None) -> np.ndarray:
+        """
+        Геосходство города index с городами columns (CityEntry.index),
+        по умолчанию — со всеми городами реестра.
+        """
+        columns = np.arange(len(self._entries)) if columns is None else np.asarray(columns, dtype=np.int64)
+        return GEO_LEVELS[self._levels_of(np.full(len(columns), index, dtype=np.int64), columns)]
+
+    def geo_matrix(self, indices: np.ndarray) -> np.ndarray:
+        """Плотная матрица геосходства городов indices (города пользователей попадают в матрицу)."""
+        indices = np.asarray(indices, dtype=np.int64)
+        self.reference(indices)
+        slots = self._slots[indices]
+        return GEO_LEVELS[self._levels[np.ix_(slots, slots)]]
+
+    def geo_pairs(self, first: np.ndarray, second: np.ndarray) -> np.ndarray:
+        """Геосходство для пар городов (first[i], second[i]) одной выборкой."""
+        return GEO_LEVELS[self._levels_of(np.asarray(first, dtype=np.int64), np.asarray(second, dtype=np.int64))]
+
+    def coordinates(self, indices: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Широты и долготы городов по их индексам в реестре."""
+        return self._latitudes[indices], self._longitudes[indices]
+
+    def geo_similarity(self, first: int, second: int) -> float:
+        return float(self.geo_pairs(np.array([first]), np.array([second]))[0])
+
+    def _spatial_index(self) -> BallTree:
+        n = len(self._entries)
+        if self._tree is None or self._tree_size != n:
+            coordinates = np.radians(np.column_stack([self._latitudes[:n], self._longitudes[:n]]))
+            self._tree = BallTree(coordinates, metric="haversine")
+            self._tree_size = n
+        return self._tree
+
+    def cities_within(self, index: int, radius_km: float) -> list[CityEntry]:
+        """Города в радиусе radius_km от города index (включая его самого)."""
+        point = np.radians([[self._latitudes[index], self._longitudes[index]]])
+        found = self._spatial_index().query_radius(point, r=radius_km / EARTH_RADIUS_KM)[0]
+        return [self._entries[i] for i in found]
+
+    def cities_in_country(self, country: str) -> list[CityEntry]:
+        return [entry for entry in self._entries if entry.country == country]
+
+    async def load(self, session_maker=async_session_maker) -> int:
+        """Загружает все города и их алиасы; матрица строится по городам пользователей."""
+        async with session_maker() as session:
+            result = await session.execute(
+                select(City.id, City.name, City.country, City.latitude, City.longitude)
+            )
+            rows = result.mappings().all()
+            aliases = (await session.execute(
+                select(CityAlias.alias, City.name).join(City, City.id == CityAlias.city_id)
+            )).all()
+            user_cities = (await session.execute(select(Users.city).distinct())).scalars().all()
+        for row in rows:
+            self.register(dict(row), update_matrix=False)
+        for alias, name in aliases:
+            self._aliases.setdefault(alias, name)
+        # Матрица — только по городам пользователей
+        entries = [self.get(name) for name in user_cities]
+        self._rebuild_matrix([entry.index for entry in entries if entry is not None])
+        logger.info(
+            f"Реестр городов загружен: {len(self)} городов, {len(self._aliases)} алиасов, "
+            f"в матрице геосходства {self.referenced_count}"
+        )
+        return len(self)
+
+
+city_registry = CityRegistry()
@@ -26,7 +26,6 @@ router = APIRouter(
 async def get_or_create(
     city: str
 )-> SCity:
-    await CityDAO.initialize_cache()
     """
     Возвращает запись из таблицы city по city. 
     Если запись не найдена, ни в кэше, ни в базе,
@@ -28,6 +28,74 @@ class Settings(BaseSettings):
     def TEST_DATABASE_URL(self):
         return f"postgresql+asyncpg://{self.TEST_DB_USER}:{self.TEST_DB_PASS}@{self.TEST_DB_HOST}:{self.TEST_DB_PORT}/{self.DB_NAME}"
 
+    # Геокодирование новых городов: пауза между запросами и время жизни отрицательного кэша, секунды
+    GEOCODER_MIN_INTERVAL: float = 1.0
+    GEOCODER_NEGATIVE_TTL: int = 86400
+
+    # Размер пачки при массовом импорте пользователей
+    USER_IMPORT_CHUNK_SIZE: int = 1000
+    # Сколько хранится статус импорта (GET /users/import/{import_id}), секунды
+    USER_IMPORT_STATUS_TTL: int = 86400
+    # Размер пачки серверного курсора при выгрузке пользователей
+    USER_EXPORT_CHUNK_SIZE: int = 5000
+
+    # Матрица сходства профессий: CSV first,second,similarity (перечитывается при изменении)
+    PROFESSION_SIMILARITY_PATH: str = "data/profession_similarity.csv"
+
+    # Корпусный TF-IDF индекс описаний
+    DESCRIPTION_INDEX_PATH: str = "data/description_index.joblib"
+    # TTL блокировки файла индекса в Redis (с запасом на полное переобучение), секунды
+    DESCRIPTION_INDEX_LOCK_TIMEOUT: int = 1800
+    # Размер in-process оверлея строк, ещё не записанных в файл индекса
+    DESCRIPTION_OVERLAY_SIZE: int = 50_000
+    # Сходство описаний: tfidf — TF-IDF индекс, embedding — int8-эмбеддинги sentence-transformers
+    DESCRIPTION_BACKEND: Literal["tfidf", "embedding"] = "tfidf"
+    DESCRIPTION_EMBEDDINGS_PATH: str = "data/description_embeddings.joblib"
+    # Локальный каталог модели (без загрузки из сети)
+    EMBEDDING_MODEL_PATH: str = "models/all-MiniLM-L6-v2"
+    EMBEDDING_BATCH_SIZE: int = 64
+    # Размер in-process LRU подготовленных описаний
+    PREPARED_DESCRIPTION_CACHE_SIZE: int = 100_000
+    # Размер сохраняемых списков рекомендаций (top-K)
+    RECOMMENDATIONS_TOP_K: int = 10
+    # Размер чанка кандидатов при потоковом скоринге
+    SCORING_CHUNK_SIZE: int = 20_000
+    # Сколько кандидатов после дешёвого предфильтра получают полный скоринг (0 — без предфильтра)
+    RECOMMENDATION_PREFILTER: int = 0
+    # Пул процессов для скоринга (0 — скоринг в потоке без пула) и лимит заданий в нём
+    SCORING_POOL_SIZE: int = 2
+    SCORING_POOL_QUEUE_DEPTH: int = 64
+    # Кэш вычисленных рекомендаций: время жизни и таймаут блокировки вычисления, секунды
+    RECOMMENDATION_CACHE_TTL: int = 300
+    RECOMMENDATION_CACHE_LOCK_TIMEOUT: int = 30
+
+    # ANN-индекс (IVF) по векторам пользователей
+    ANN_INDEX_PATH: str = "data/ann_index.joblib"
+    ANN_LISTS: int = 256
+    ANN_PROBES: int = 8
+    ANN_CANDIDATES: int = 500
+    ANN_DESCRIPTION_DIM: int = 64
+    # TTL блокировки файла ANN-индекса в Redis (с запасом на полное перестроение), секунды
+    ANN_INDEX_LOCK_TIMEOUT: int = 1800
+
+    # Ночное перестроение рекомендаций
+    REBUILD_DIR: str = "data/rebuild"
+    # REBUILD_DIR и FEATURE_STORE_DIR на общем для всех воркеров хранилище (том docker-compose);
+    # иначе шарды и финальный шаг выполняет только воркер, собравший снимок
+    REBUILD_SHARED_STORAGE: bool = True
+    REBUILD_SHARDS: int = 8
+    REBUILD_BATCH_SIZE: int = 500
+    REBUILD_TILE_SIZE: int = 1024
+
+    # Хранилище признаков: версии .npy-колонок, открываемые воркерами через memmap
+    FEATURE_STORE_DIR: str = "data/feature_store"
+    FEATURE_STORE_KEEP_VERSIONS: int = 3
+    # Как часто воркер проверяет появление новой версии, секунды
+    FEATURE_STORE_REFRESH_INTERVAL: float = 30.0
+    # Размер in-process оверлея для пользователей, добавленных после снимка
+    FEATURE_STORE_DELTA_SIZE: int = 100_000
+    FEATURE_STORE_BATCH_SIZE: int = 5000
+
     model_config = SettingsConfigDict(env_file=".env")
 
 settings = Settings()
\ No newline at end of file
@@ -1,6 +1,10 @@
-from datetime import datetime
+import base64
+from datetime import date, datetime
+import json
+from typing import AsyncIterator
+
 from fastapi import HTTPException,status
-from sqlalchemy import delete, insert, select
+from sqlalchemy import delete, insert, select, tuple_
 from sqlalchemy.exc import SQLAlchemyError
 
 from app.database import async_session_maker
@@ -32,6 +36,57 @@ class BaseDAO:
             result = await session.execute(query)
             return result.scalars().all()
     
+    @classmethod
+    def encode_cursor(cls, row, keys: tuple[str, ...]) -> str:
+        """Курсор — значения ключа сортировки последней строки страницы."""
+        values = [getattr(row, key) for key in keys]
+        raw = json.dumps([value.isoformat() if isinstance(value, (date, datetime)) else str(value) for value in values])
+        return base64.urlsafe_b64encode(raw.encode()).decode()
+
+    @classmethod
+    def decode_cursor(cls, cursor: str, keys: tuple[str, ...]) -> list:
+        try:
+            raw = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            values = []
+            for key, value in zip(keys, raw, strict=True):
+                python_type = getattr(cls.model, key).type.python_type
+                values.append(python_type.fromisoformat(value) if python_type in (date, datetime) else python_type(value))
+            return values
+        except (ValueError, TypeError) as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid cursor: {e}")
+
+    @classmethod
+    async def find_page(cls, cursor: str | None = None, limit: int = 100, keys: tuple[str, ...] = ("id",), **filter_by):
+        """
+        Keyset-пагинация: строки после cursor в порядке keys (например, ("id",)
+        или ("date_created", "id")). В отличие от OFFSET, глубокие страницы
+        читаются так же быстро, как первая. Возвращает (строки, курсор следующей страницы).
+        """
+        columns = [getattr(cls.model, key) for key in keys]
+        query = select(cls.model).filter_by(**filter_by).order_by(*columns).limit(limit)
+        if cursor:
+            query = query.where(tuple_(*columns) > tuple_(*cls.decode_cursor(cursor, keys)))
+        async with async_session_maker() as session:
+            rows = (await session.execute(query)).scalars().all()
+        next_cursor = cls.encode_cursor(rows[-1], keys) if len(rows) == limit else None
+        return rows, next_cursor
+
+    @classmethod
+    async def stream_all(cls, chunk_size: int = 1000, **filter_by) -> AsyncIterator[list[dict]]:
+        """
+        Все строки таблицы пачками по chunk_size через серверный курсор:
+        в памяти воркера одновременно находится только одна пачка.
+        """
+        query = (
+            select(*cls.model.__table__.columns)
+            .filter_by(**filter_by)
+            .execution_options(yield_per=chunk_size)
+        )
+        async with async_session_maker() as session:
+            result = await session.stream(query)
+            async for partition in result.mappings().partitions():
+                yield [dict(row) for row in partition]
+
     @classmethod
     async def add(cls, **data):
         try:
@@ -11,12 +11,13 @@ if settings.MODE == "TEST":
     DATABASE_PARAMS = {"poolclass": NullPool}
 else:
     DATABASE_URL = settings.DATABASE_URL
-    DATABASE_PARAMS = {}
+    DATABASE_PARAMS = {
+        "pool_size": 50,         # Увеличьте размер пула
+        "max_overflow": 100,     # Максимальное количество дополнительных соединений
+        "pool_timeout": 60,
+    }
 
-engine = create_async_engine(DATABASE_URL, **DATABASE_PARAMS,
-                            pool_size=50,         # Увеличьте размер пула
-                            max_overflow=100,      # Максимальное количество дополнительных соединений
-                            pool_timeout=60,)
+engine = create_async_engine(DATABASE_URL, **DATABASE_PARAMS)
 
 # Во 2.0 версии Алхимии был добавлен async_sessionamaker.
 async_session_maker = async_sessionmaker(
@@ -1,25 +1,36 @@
-from collections.abc import AsyncIterator
 from contextlib import asynccontextmanager
 from fastapi import FastAPI,HTTPException, Request
 from fastapi.responses import JSONResponse
 
-from fastapi_cache import FastAPICache
-from fastapi_cache.backends.redis import RedisBackend
 from fastapi_cache.decorator import cache
 
-from redis import asyncio as aioredis
-
 from app.users.router import router as router_users
 from app.city.router import router as router_city
 from app.recommendation.router import router as router_recommendation
+from app.cache import init_redis_cache
+from app.city.dao import CityDAO
+from app.city.registry import city_registry
+from app.profession.registry import profession_registry
 from app.config import settings
+from app.recommendation.feature_store import feature_store
+from app.recommendation.pool import scoring_pool
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # при запуске
-    redis = aioredis.from_url(f"redis://{settings.REDIS_HOST}:{settings.REDIS_PORT}", encoding="utf8", decode_responses=True)
-    FastAPICache.init(RedisBackend(redis), prefix="cache")
+    init_redis_cache()
+    # Прогрев кэша городов (пропускается, если версия в Redis актуальна)
+    await CityDAO.initialize_cache()
+    # Реестр городов воркера: геоскоринг без обращений к Redis
+    await city_registry.load()
+    await profession_registry.load()
+    # Снимок признаков в memmap (общий для воркеров через page cache), если уже собран
+    feature_store.current()
+    # CPU-ёмкий скоринг рекомендаций выполняется вне event loop
+    scoring_pool.start()
     yield
+    # при остановке
+    scoring_pool.shutdown()
 
 
 app = FastAPI(
@@ -13,6 +13,7 @@ from app.config import settings
 from app.database import Base
 from app.users.models import Users
 from app.city.models import City
+from app.profession.models import Profession
 from app.recommendation.models import Recommendation
 
 # this is the Alembic Config object, which provides
@@ -0,0 +1,82 @@
+"""
+Офлайн-расчёт матрицы сходства профессий по описаниям пользователей:
+центроид векторов описаний каждой профессии, косинусное сходство центроидов.
+Результат пишется в CSV (first,second,similarity), который воркеры
+перечитывают без перезапуска.
+
+Запуск из корня проекта:
+    python -m app.profession.derive_matrix --out data/profession_similarity.csv --min-similarity 0.05
+"""
+import argparse
+import asyncio
+import csv
+import logging
+import os
+from pathlib import Path
+import tempfile
+
+import numpy as np
+from scipy import sparse
+from sqlalchemy import select
+
+from app.config import settings
+from app.database import async_session_maker
+from app.recommendation.dao import RecommendationDAO
+from app.users.models import Users
+
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def centroid_similarity(vectors: sparse.csr_matrix, groups: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """(названия групп, косинусное сходство L2-нормированных центроидов групп)."""
+    names, inverse = np.unique(groups, return_inverse=True)
+    membership = sparse.csr_matrix(
+        (np.ones(len(groups)), (inverse, np.arange(len(groups)))), shape=(len(names), len(groups))
+    )
+    centroids = np.asarray((membership @ vectors).todense())
+    norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+    centroids = np.divide(centroids, norms, out=np.zeros_like(centroids), where=norms > 0)
+    return names, centroids @ centroids.T
+
+
+def write_pairs(path: str, names: np.ndarray, similarity: np.ndarray, min_similarity: float) -> int:
+    """Атомарно записывает пары выше порога (каждая неупорядоченная пара один раз)."""
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=Path(path).parent, suffix=".tmp")
+    written = 0
+    with os.fdopen(fd, "w", encoding="utf-8", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(["first", "second", "similarity"])
+        for i, j in zip(*np.triu_indices(len(names), k=1)):
+            if similarity[i, j] >= min_similarity:
+                writer.writerow([names[i], names[j], round(float(similarity[i, j]), 4)])
+                written += 1
+    os.replace(tmp_path, path)
+    return written
+
+
+async def derive(out: str, min_similarity: float) -> int:
+    async with async_session_maker() as session:
+        rows = (await session.execute(select(Users.id, Users.profession))).all()
+    index = await RecommendationDAO.get_description_index()
+    if index is None:
+        raise SystemExit("Индекс описаний ещё не построен: дождитесь задачи refit_description_index")
+    vectors = index.vectors([row.id for row in rows])
+    names, similarity = centroid_similarity(vectors, np.array([row.profession for row in rows], dtype=object))
+    written = write_pairs(out, names, similarity, min_similarity)
+    logger.info(f"Матрица сходства профессий: {len(names)} профессий, {written} пар -> {out}")
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Derive the profession similarity matrix from descriptions")
+    parser.add_argument("--out", default=settings.PROFESSION_SIMILARITY_PATH)
+    parser.add_argument("--min-similarity", type=float, default=0.05)
+    args = parser.parse_args()
+    asyncio.run(derive(args.out, args.min_similarity))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,12 @@
+from sqlalchemy import String
+from sqlalchemy.orm import mapped_column, Mapped
+
+from app.database import Base
+
+
+class Profession(Base):
+    """Справочник профессий: название интернируется в целочисленный код."""
+    __tablename__ = "professions"
+
+    code: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    name: Mapped[str] = mapped_column(String, unique=True)
@@ -0,0 +1,141 @@
+import csv
+import logging
+import os
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from app.config import settings
+from app.database import async_session_maker
+from app.profession.models import Profession
+
+
+logger = logging.getLogger(__name__)
+
+# Сходство по умолчанию, пока не задан файл PROFESSION_SIMILARITY_PATH
+DEFAULT_PAIRS = {
+    ("Software Engineer", "Data Scientist"): 0.8,
+    ("Software Engineer", "Project Manager"): 0.5,
+    ("Data Scientist", "Project Manager"): 0.6,
+}
+
+
+def read_pairs(path: str) -> dict[tuple[str, str], float]:
+    """CSV с колонками first,second,similarity (пары симметричны, диагональ всегда 1)."""
+    with open(path, encoding="utf-8", newline="") as file:
+        return {
+            (row["first"], row["second"]): float(row["similarity"])
+            for row in csv.DictReader(file)
+        }
+
+
+class ProfessionRegistry:
+    """
+    In-process реестр профессий воркера: name -> code из таблицы professions
+    и плотная матрица сходства code×code (float32), поэтому сходство профессий
+    для всего набора кандидатов — одна выборка по индексам.
+    Матрица строится из файла PROFESSION_SIMILARITY_PATH и пересобирается,
+    если файл изменился, — без перезапуска воркера.
+    """
+
+    def __init__(self, path: str | None = None):
+        self.path = path or settings.PROFESSION_SIMILARITY_PATH
+        self._codes: dict[str, int] = {}
+        self._pairs: dict[tuple[str, str], float] = dict(DEFAULT_PAIRS)
+        self._pairs_mtime: int | None = None
+        self._matrix = np.ones((1, 1), dtype=np.float32)
+
+    def __len__(self) -> int:
+        return len(self._codes)
+
+    def code_of(self, name: str) -> int | None:
+        return self._codes.get(name)
+
+    def register(self, name: str, code: int) -> None:
+        if self._codes.get(name) != code:
+            self._codes[name] = code
+            self._build_matrix()
+
+    def _reload_pairs(self) -> bool:
+        """Перечитывает файл сходства, если он изменился; True — матрицу нужно пересобрать."""
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return False
+        if mtime == self._pairs_mtime:
+            return False
+        self._pairs = read_pairs(self.path)
+        self._pairs_mtime = mtime
+        logger.info(f"Матрица сходства профессий перезагружена: {self.path}, {len(self._pairs)} пар")
+        return True
+
+    def _build_matrix(self) -> None:
+        size = max(self._codes.values(), default=0) + 1
+        matrix = np.zeros((size, size), dtype=np.float32)
+        np.fill_diagonal(matrix, 1.0)
+        for (first, second), similarity in self._pairs.items():
+            i, j = self._codes.get(first), self._codes.get(second)
+            if i is not None and j is not None and i != j:
+                matrix[i, j] = matrix[j, i] = similarity
+        self._matrix = matrix
+
+    def matrix(self) -> np.ndarray:
+        """Матрица сходства, индексированная кодами профессий."""
+        if self._reload_pairs():
+            self._build_matrix()
+        return self._matrix
+
+    def similarity(self, first: str, second: str) -> float:
+        if first == second:
+            return 1.0
+        i, j = self._codes.get(first), self._codes.get(second)
+        if i is None or j is None:
+            return 0.0
+        return float(self.matrix()[i, j])
+
+    async def lookup(self, names: list[str], session_maker=async_session_maker) -> np.ndarray:
+        """
+        Коды профессий без записи в БД (пути чтения): названия, которых нет в воркере,
+        ищутся в таблице professions (их мог добавить другой воркер); -1 — профессия неизвестна.
+        """
+        missing = [name for name in dict.fromkeys(names) if name not in self._codes]
+        if missing:
+            async with session_maker() as session:
+                rows = (await session.execute(
+                    select(Profession.name, Profession.code).where(Profession.name.in_(missing))
+                )).all()
+            if rows:
+                self._codes.update({name: code for name, code in rows})
+                self._build_matrix()
+        return np.array([self._codes.get(name, -1) for name in names], dtype=np.int64)
+
+    async def resolve(self, names: list[str], session_maker=async_session_maker) -> np.ndarray:
+        """Коды профессий; новые названия добавляются в таблицу professions (только при записи пользователей)."""
+        missing = [name for name in dict.fromkeys(names) if name not in self._codes]
+        if missing:
+            async with session_maker() as session:
+                await session.execute(
+                    pg_insert(Profession)
+                    .values([{"name": name} for name in missing])
+                    .on_conflict_do_nothing(index_elements=[Profession.name])
+                )
+                await session.commit()
+                rows = (await session.execute(
+                    select(Profession.name, Profession.code).where(Profession.name.in_(missing))
+                )).all()
+            self._codes.update({name: code for name, code in rows})
+            self._build_matrix()
+        return np.array([self._codes[name] for name in names], dtype=np.int64)
+
+    async def load(self, session_maker=async_session_maker) -> int:
+        async with session_maker() as session:
+            rows = (await session.execute(select(Profession.name, Profession.code))).all()
+        self._codes = {name: code for name, code in rows}
+        self._reload_pairs()
+        self._build_matrix()
+        logger.info(f"Реестр профессий загружен: {len(self)} профессий")
+        return len(self)
+
+
+profession_registry = ProfessionRegistry()
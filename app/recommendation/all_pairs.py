@@ -0,0 +1,62 @@
+"""
+Полное перестроение сохранённых рекомендаций симметричным all-pairs ядром:
+каждая пара пользователей считается один раз, плитками tile×tile.
+
+Запуск из корня проекта:
+    python -m app.recommendation.all_pairs --k 10 --tile 1024 --batch-size 5000
+"""
+import argparse
+import asyncio
+import time
+
+from app.cache import init_redis_cache
+from app.city.registry import city_registry
+from app.config import settings
+from app.recommendation import rebuild
+from app.recommendation.dao import weights
+from app.recommendation.scoring import all_pairs_top_k
+
+
+def compute(snapshot: rebuild.FeatureSnapshot, k: int, tile: int):
+    """(indices, scores) top-K всех пользователей снимка."""
+    return all_pairs_top_k(snapshot.features, snapshot.geo_similarity, weights, k, tile)
+
+
+async def run(k: int, tile: int, batch_size: int) -> dict:
+    init_redis_cache()
+    await city_registry.load()
+
+    started = time.perf_counter()
+    snapshot = await rebuild.build_snapshot()
+    loaded = time.perf_counter()
+    indices, scores = compute(snapshot, k, tile)
+    scored = time.perf_counter()
+
+    for start in range(0, len(snapshot), batch_size):
+        batch = range(start, min(start + batch_size, len(snapshot)))
+        rows = rebuild.top_k_rows(snapshot, indices, scores, batch)
+        await rebuild.write_recommendations([snapshot.user_id(row) for row in batch], rows)
+    written = time.perf_counter()
+
+    timings = {
+        "users": len(snapshot),
+        "load_seconds": round(loaded - started, 3),
+        "score_seconds": round(scored - loaded, 3),
+        "write_seconds": round(written - scored, 3),
+    }
+    print(f"Пользователей: {timings['users']}, k={k}, tile={tile}")
+    print(f"Загрузка: {timings['load_seconds']} с, скоринг: {timings['score_seconds']} с, запись: {timings['write_seconds']} с")
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild stored recommendations with the all-pairs kernel")
+    parser.add_argument("--k", type=int, default=settings.RECOMMENDATIONS_TOP_K)
+    parser.add_argument("--tile", type=int, default=settings.REBUILD_TILE_SIZE)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args()
+    asyncio.run(run(args.k, args.tile, args.batch_size))
+
+
+if __name__ == "__main__":
+    main()
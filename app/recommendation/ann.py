@@ -0,0 +1,160 @@
+import numpy as np
+from scipy import sparse
+from sklearn.cluster import MiniBatchKMeans
+from sklearn.decomposition import TruncatedSVD
+
+
+class UserEncoder:
+    """
+    Кодирует пользователя в вектор фиксированной длины так, чтобы квадрат
+    евклидова расстояния приближал взвешенное расхождение по weights:
+    one-hot профессии, точка на единичной сфере, возраст и опыт в [0, 1]
+    и сжатый TruncatedSVD вектор описания, каждый блок умножен на sqrt(вес).
+    """
+
+    def __init__(self, professions: list[str], svd: TruncatedSVD | None, weights: dict):
+        self.professions = {name: i for i, name in enumerate(professions)}
+        self.svd = svd
+        self.weights = dict(weights)
+
+    @classmethod
+    def fit(cls, professions: list[str], descriptions: sparse.csr_matrix | None, weights: dict, n_components: int = 64) -> "UserEncoder":
+        """descriptions=None (описаний ещё нет) — кодировщик без блока описания."""
+        svd = None
+        if descriptions is not None:
+            n_components = min(n_components, descriptions.shape[1] - 1, descriptions.shape[0] - 1)
+        if descriptions is not None and n_components > 0:
+            svd = TruncatedSVD(n_components=n_components, random_state=0).fit(descriptions)
+        return cls(sorted(set(professions)), svd, weights)
+
+    @property
+    def dim(self) -> int:
+        description_dim = self.svd.n_components if self.svd is not None else 0
+        return len(self.professions) + 3 + 2 + description_dim
+
+    def encode(
+        self,
+        professions: list[str],
+        latitudes: np.ndarray,
+        longitudes: np.ndarray,
+        ages: np.ndarray,
+        experience: np.ndarray,
+        descriptions: sparse.csr_matrix | None,
+    ) -> np.ndarray:
+        n = len(professions)
+        profession = np.zeros((n, len(self.professions)), dtype=np.float32)
+        for row, name in enumerate(professions):
+            code = self.professions.get(name)
+            if code is not None:
+                profession[row, code] = 1.0
+
+        lat, lon = np.radians(latitudes), np.radians(longitudes)
+        sphere = np.column_stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)])
+
+        if self.svd is not None and descriptions is None:
+            description = np.zeros((n, self.svd.n_components))
+        elif self.svd is not None:
+            description = self.svd.transform(descriptions)
+            norms = np.linalg.norm(description, axis=1, keepdims=True)
+            description = np.divide(description, norms, out=np.zeros_like(description), where=norms > 0)
+        else:
+            description = np.zeros((n, 0))
+
+        w = {name: np.sqrt(value) for name, value in self.weights.items()}
+        return np.hstack([
+            w["profession"] * profession,
+            w["city"] * sphere,
+            w["age"] * (np.asarray(ages, dtype=np.float64)[:, None] / 100),
+            w["experience"] * np.asarray(experience, dtype=np.float64)[:, None],
+            w["description"] * description,
+        ]).astype(np.float32)
+
+
+class IVFIndex:
+    """
+    Инвертированный индекс (IVF) для приближённого поиска k ближайших соседей на CPU.
+    Векторы разбиваются k-means на n_lists списков; запрос просматривает
+    n_probe ближайших к нему списков. Поддерживает вставку и удаление.
+    """
+
+    def __init__(self, centroids: np.ndarray):
+        self.centroids = np.asarray(centroids, dtype=np.float32)
+        dim = self.centroids.shape[1]
+        self.list_ids: list[list[str]] = [[] for _ in range(len(self.centroids))]
+        self.list_vectors: list[np.ndarray] = [np.empty((0, dim), dtype=np.float32) for _ in range(len(self.centroids))]
+        self.location: dict[str, int] = {}
+
+    @classmethod
+    def train(cls, vectors: np.ndarray, n_lists: int) -> "IVFIndex":
+        n_lists = max(1, min(n_lists, len(vectors)))
+        kmeans = MiniBatchKMeans(n_clusters=n_lists, random_state=0, n_init=3).fit(vectors)
+        return cls(kmeans.cluster_centers_)
+
+    def __len__(self) -> int:
+        return len(self.location)
+
+    def _nearest_lists(self, vectors: np.ndarray, count: int) -> np.ndarray:
+        distances = (
+            (vectors ** 2).sum(axis=1, keepdims=True)
+            - 2 * vectors @ self.centroids.T
+            + (self.centroids ** 2).sum(axis=1)
+        )
+        count = min(count, len(self.centroids))
+        return np.argsort(distances, axis=1)[:, :count]
+
+    def add(self, ids: list, vectors: np.ndarray) -> None:
+        """Добавляет (или перемещает уже существующих) пользователей."""
+        ids = [str(user_id) for user_id in ids]
+        self.remove(ids)
+        assignment = self._nearest_lists(vectors, 1)[:, 0]
+        for list_no in np.unique(assignment):
+            rows = np.flatnonzero(assignment == list_no)
+            self.list_vectors[list_no] = np.vstack([self.list_vectors[list_no], vectors[rows]])
+            for row in rows:
+                self.list_ids[list_no].append(ids[row])
+                self.location[ids[row]] = int(list_no)
+
+    def remove(self, ids: list) -> None:
+        by_list: dict[int, set] = {}
+        for user_id in ids:
+            list_no = self.location.pop(str(user_id), None)
+            if list_no is not None:
+                by_list.setdefault(list_no, set()).add(str(user_id))
+        for list_no, removed in by_list.items():
+            keep = [i for i, user_id in enumerate(self.list_ids[list_no]) if user_id not in removed]
+            self.list_ids[list_no] = [self.list_ids[list_no][i] for i in keep]
+            self.list_vectors[list_no] = self.list_vectors[list_no][keep]
+
+    def search(self, vector: np.ndarray, k: int, n_probe: int) -> list[tuple[str, float]]:
+        """
+        k ближайших (id, квадрат расстояния) среди n_probe ближайших непустых списков.
+        Если в них меньше k векторов (после удалений, при разреженных списках),
+        просматриваются следующие по близости списки.
+        """
+        if not len(self.location):
+            return []
+        vector = np.asarray(vector, dtype=np.float32).reshape(1, -1)
+        ids, distances = [], []
+        for list_no in self._nearest_lists(vector, len(self.centroids))[0]:
+            if len(distances) >= n_probe and len(ids) >= k:
+                break
+            if not self.list_ids[list_no]:
+                continue
+            ids.extend(self.list_ids[list_no])
+            distances.append(((self.list_vectors[list_no] - vector) ** 2).sum(axis=1))
+        if not distances:
+            return []
+        distances = np.concatenate(distances)
+        order = np.argsort(distances)[:k]
+        return [(ids[i], float(distances[i])) for i in order]
+
+
+class UserAnnIndex:
+    """Кодировщик пользователей и IVF-индекс, сохраняемые вместе."""
+
+    def __init__(self, encoder: UserEncoder, ivf: IVFIndex):
+        self.encoder = encoder
+        self.ivf = ivf
+
+    def __len__(self) -> int:
+        return len(self.ivf)
@@ -0,0 +1,50 @@
+"""
+Заполнение кэша подготовленных описаний для уже существующих пользователей.
+
+Запуск из корня проекта:
+    python -m app.recommendation.backfill_descriptions --batch-size 500
+"""
+import argparse
+import asyncio
+import logging
+
+from sqlalchemy import select
+
+from app.database import async_session_maker
+from app.recommendation.dao import PreparedDescriptionDAO
+from app.users.models import Users
+
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+async def backfill(batch_size: int) -> int:
+    """Проходит по пользователям пачками (по возрастанию id) и подготавливает описания."""
+    last_id = None
+    processed = 0
+    while True:
+        query = select(Users.id, Users.description).order_by(Users.id).limit(batch_size)
+        if last_id is not None:
+            query = query.where(Users.id > last_id)
+        async with async_session_maker() as session:
+            rows = (await session.execute(query)).all()
+        if not rows:
+            break
+
+        await PreparedDescriptionDAO.prepare([row.description for row in rows])
+        last_id = rows[-1].id
+        processed += len(rows)
+        logger.info(f"Подготовлено описаний: {processed}")
+    return processed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill prepared descriptions")
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+    asyncio.run(backfill(args.batch_size))
+
+
+if __name__ == "__main__":
+    main()
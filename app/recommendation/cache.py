@@ -0,0 +1,104 @@
+import asyncio
+import hashlib
+import json
+import logging
+import uuid
+from typing import Awaitable, Callable
+
+from fastapi.encoders import jsonable_encoder
+from fastapi_cache import FastAPICache
+from redis.exceptions import RedisError
+
+from app.cache import RELEASE_LOCK
+from app.config import settings
+
+
+logger = logging.getLogger(__name__)
+
+
+class RecommendationCache:
+    """
+    Кэш вычисленных на лету рекомендаций в Redis (бекенд FastAPICache).
+    Все варианты запроса для пользователя лежат в одном hash
+    {prefix}:recommendations:{user_id} (поле — параметры запроса), поэтому
+    инвалидация при изменении профиля — один DEL.
+
+    Одновременные промахи по одному ключу выполняют одно вычисление:
+    внутри воркера ожидают общую задачу, между воркерами — блокировку в Redis
+    (остальные воркеры ждут, пока значение появится в кэше).
+    """
+
+    def __init__(self):
+        self._in_flight: dict[tuple[str, str], asyncio.Task] = {}
+
+    @staticmethod
+    def _redis():
+        return FastAPICache.get_backend().redis
+
+    @staticmethod
+    def key(user_id) -> str:
+        return f"{FastAPICache.get_prefix()}:recommendations:{user_id}"
+
+    async def get_or_compute(self, user_id, params: dict, compute: Callable[[], Awaitable]):
+        field = json.dumps(jsonable_encoder(params), sort_keys=True)
+        flight = (str(user_id), field)
+        task = self._in_flight.get(flight)
+        if task is None:
+            task = asyncio.ensure_future(self._load(str(user_id), field, compute))
+            self._in_flight[flight] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(flight, None))
+        # shield: отмена одного клиента не отменяет вычисление для остальных
+        return await asyncio.shield(task)
+
+    async def _load(self, user_id: str, field: str, compute: Callable[[], Awaitable]):
+        redis = self._redis()
+        key = self.key(user_id)
+        lock = f"{key}:lock:{hashlib.sha1(field.encode()).hexdigest()}"
+        token = uuid.uuid4().hex
+        locked = False
+        try:
+            cached = await redis.hget(key, field)
+            if cached is not None:
+                return json.loads(cached)
+
+            timeout = settings.RECOMMENDATION_CACHE_LOCK_TIMEOUT
+            deadline = asyncio.get_running_loop().time() + timeout
+            while not (locked := bool(await redis.set(lock, token, nx=True, ex=timeout))):
+                # Другой воркер уже считает этот ключ: ждём его результат
+                await asyncio.sleep(0.05)
+                cached = await redis.hget(key, field)
+                if cached is not None:
+                    return json.loads(cached)
+                if asyncio.get_running_loop().time() > deadline:
+                    logger.warning(f"Не дождались рекомендаций {user_id} от другого воркера, считаем сами")
+                    break
+        except RedisError as e:
+            logger.warning(f"Кэш рекомендаций недоступен: {e}")
+            return await compute()
+
+        try:
+            result = jsonable_encoder(await compute())
+            try:
+                async with redis.pipeline(transaction=True) as pipe:
+                    await pipe.hset(key, field, json.dumps(result)).expire(key, settings.RECOMMENDATION_CACHE_TTL).execute()
+            except RedisError as e:
+                logger.warning(f"Не удалось сохранить рекомендации {user_id} в кэш: {e}")
+            return result
+        finally:
+            if locked:
+                try:
+                    await redis.eval(RELEASE_LOCK, 1, lock, token)
+                except RedisError:
+                    pass
+
+    async def invalidate(self, user_ids: list) -> None:
+        """Сбрасывает кэш рекомендаций пользователей (профиль изменился или удалён)."""
+        if not user_ids:
+            return
+        try:
+            await self._redis().delete(*(self.key(user_id) for user_id in user_ids))
+        except RedisError as e:
+            logger.warning(f"Не удалось сбросить кэш рекомендаций: {e}")
+
+
+recommendation_cache = RecommendationCache()
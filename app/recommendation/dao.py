@@ -1,23 +1,72 @@
 import asyncio
+from collections import OrderedDict
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from datetime import datetime
+import logging
 import math
+import time
+import uuid
 
 from fastapi import HTTPException
+from fastapi_cache import FastAPICache
 
+from app.cache import redis_lock
+from app.config import settings
 from app.dao.base import BaseDAO
 from app.database import async_session_maker
 from app.city.dao import CityDAO
-from app.recommendation.models import Recommendation
+from app.city.registry import city_registry
+from app.profession.registry import profession_registry
+from app.recommendation.cache import recommendation_cache
+from app.recommendation.models import PreparedDescription, Recommendation
+from app.recommendation.scoring import (
+    UserFeatures,
+    calculate_ages,
+    cosine_to_row,
+    new_rows_top_k,
+    normalize_experiences,
+    score_one_vs_all,
+    TopKAccumulator,
+)
+from app.recommendation.description_index import (
+    DescriptionIndex,
+    DescriptionOverlay,
+    description_hash,
+    load_description_index,
+    save_description_index,
+)
+from app.recommendation.ann import IVFIndex, UserAnnIndex, UserEncoder
+from app.recommendation.embeddings import DescriptionEmbeddings, QuantizedVectors, encode_texts
+from app.recommendation.feature_store import (
+    DeltaRow,
+    FeatureStoreVersion,
+    description_source,
+    feature_store,
+    stack_descriptions,
+    user_key,
+    with_overlay,
+)
+from app.recommendation.persistence import load_artifact, save_artifact
+from app.recommendation.pool import PairScoringJob, ScoringJob, score_pairs_job, scoring_pool
+from app.tasks.celery_app import celery_worker
+from app.users.models import Users
 
 
+import numpy as np
 from langdetect import detect
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+from scipy import sparse
+from sqlalchemy import any_, bindparam, delete, func, insert, or_, select, tablesample, text
+from sqlalchemy.dialects.postgresql import ARRAY, UUID, insert as pg_insert
+from sqlalchemy.orm import aliased
 from aiogoogletrans import Translator
 
 
+# Блокировка файла индекса описаний (переобучение и синхронизация в Celery)
+DESCRIPTION_INDEX_LOCK_KEY = "description_index:lock"
+# Блокировка файла ANN-индекса (перестроение и синхронизация в Celery)
+ANN_INDEX_LOCK_KEY = "ann_index:lock"
+
 # Weights
 weights = {
     "city": 0.2,
@@ -28,18 +77,14 @@ weights = {
 }
 
 
-profession_similarity_matrix = {
-    ("Software Engineer", "Software Engineer"): 1.0,
-    ("Software Engineer", "Data Scientist"): 0.8,
-    ("Software Engineer", "Project Manager"): 0.5,
-    ("Data Scientist", "Data Scientist"): 1.0,
-    ("Data Scientist", "Project Manager"): 0.6,
-    ("Project Manager", "Project Manager"): 1.0,
-}
 
 
 class RecommendationDAO(BaseDAO):
     model = Recommendation
+    # Строки описаний пользователей, ещё не попавших в файл индекса
+    description_overlay = DescriptionOverlay(settings.DESCRIPTION_OVERLAY_SIZE)
+    _refit_scheduled_at = -math.inf
+    _ann_rebuild_scheduled_at = -math.inf
     
     @classmethod
     async def calculate_age(cls, birthday: datetime) -> int:
@@ -50,14 +95,8 @@ class RecommendationDAO(BaseDAO):
     
     @classmethod
     async def normalize_experience(cls, experience: float, mean: float = 5.0, std_dev: float = 2.0) -> float:
-        """Normalize experience based on mean and standard deviation."""
-        # Проверка входных данных для отладки
-        print(f"experience: {experience}, type: {type(experience)}")
-        print(f"mean: {mean}, type: {type(mean)}")
-        print(f"std_dev: {std_dev}, type: {type(std_dev)}")
-        
-        # Нормализация
         """Normalize experience using a sigmoid function."""
+        logging.debug(f"experience: {experience}, mean: {mean}, std_dev: {std_dev}")
         z_score = (experience - mean) / std_dev
         return 1 / (1 + math.exp(-z_score))
     
@@ -67,23 +106,17 @@ class RecommendationDAO(BaseDAO):
         """
         Вычисление сходства между профессиями на основе матрицы сходства.
         """
-        if profession1 == profession2:
-            return 1.0
-
-        # Пытаемся найти сходство в матрице
-        return profession_similarity_matrix.get(
-            (profession1, profession2),
-            profession_similarity_matrix.get((profession2, profession1), 0.0)
-        )
+        await profession_registry.lookup([profession1, profession2])
+        return profession_registry.similarity(profession1, profession2)
     
     @classmethod
     async def translate_to_english(cls,text: str) -> str:
         """Translate text to English."""
-        print(f"Translating text to English: {text}")
+        logging.debug(f"Translating text to English: {text}")
         translator = Translator()
         try:
             translation = await translator.translate(text, dest="en")
-            print(f"Translated text: {translation.text}")
+            logging.debug(f"Translated text: {translation.text}")
             return translation.text
         except Exception:
             return ""
@@ -92,74 +125,1184 @@ class RecommendationDAO(BaseDAO):
     async def detect_language_and_prepare(cls, description: str) -> str:
         """Detect language and prepare description for TF-IDF."""
         if not description or len(description.strip()) < 3:  # Текст пустой или слишком короткий
-            print("Description is empty or too short to detect language.")
+            logging.debug("Description is empty or too short to detect language.")
             return ""
 
         try:
             lang = detect(description)
-            print(f"Detected language: {lang}")
+            logging.debug(f"Detected language: {lang}")
             if lang not in ["en"]:
                 return await cls.translate_to_english(description)
         except Exception as e:
-            print(f"Error detecting or translating language: {e}")
+            logging.warning(f"Error detecting or translating language: {e}")
             return ""
         
         return description
         
     @classmethod
     async def calculate_description_similarity(cls, description1: str, description2: str) -> float:
-        """Calculate similarity between two descriptions using TF-IDF and cosine similarity."""
-        # Translate descriptions to English
-        
-        description1_en = await cls.detect_language_and_prepare(description1)
-        description2_en = await cls.detect_language_and_prepare(description2)
+        """Calculate similarity between two descriptions using the corpus TF-IDF index."""
+        description1_en, description2_en = await PreparedDescriptionDAO.prepare([description1, description2])
         if not description1_en or not description2_en:
-            print("One or both descriptions are empty after preprocessing.")
+            logging.debug("One or both descriptions are empty after preprocessing.")
             return 0.0
-        # Combine descriptions
-        combined_description = f"{description1_en} {description2_en}"
-                # If the combined description is empty, return 0 similarity
-        if not combined_description.strip():
-            print("Combined description is empty.")
+
+        index = await cls.get_description_index()
+        if index is None:
             return 0.0
-        # Calculate TF-IDF
-        vectorizer = TfidfVectorizer(stop_words="english")
-        tfidf_matrix = vectorizer.fit_transform([description1_en, description2_en, combined_description])
-        
-        # Calculate cosine similarity
-        cosine_sim = cosine_similarity(tfidf_matrix)
-        
-        return cosine_sim[0, 1]
+        vectors = index.transform([description1_en, description2_en])
+        return float(cosine_to_row(vectors, 0)[1])
+
+    @classmethod
+    async def prepare_descriptions(cls, descriptions: list[str], session_maker=async_session_maker) -> list[str]:
+        """Подготавливает список описаний через кэш подготовленных текстов."""
+        return await PreparedDescriptionDAO.prepare(descriptions, session_maker)
+
+    @classmethod
+    async def get_description_index(cls) -> DescriptionIndex | None:
+        """
+        Индекс описаний с диска (файл читается вне event loop).
+        Если индекса ещё нет, его построение ставится в очередь Celery,
+        а до тех пор скоринг идёт без компонента описаний.
+        """
+        index = await asyncio.to_thread(load_description_index, settings.DESCRIPTION_INDEX_PATH)
+        if index is None:
+            cls.schedule_refit()
+            return None
+        cls.description_overlay.sync(index)
+        return index
+
+    @classmethod
+    def schedule_refit(cls) -> None:
+        """Ставит первичное построение индекса описаний в очередь (не чаще раза в 5 минут на процесс)."""
+        if time.monotonic() - cls._refit_scheduled_at < 300:
+            return
+        cls._refit_scheduled_at = time.monotonic()
+        try:
+            celery_worker.send_task("refit_description_index", kwargs={"if_missing": True})
+        except Exception as e:
+            logging.warning(f"Не удалось поставить построение индекса описаний в очередь: {e}")
+
+    @classmethod
+    async def refit_description_index(cls, if_missing: bool = False, session_maker=async_session_maker) -> DescriptionIndex | None:
+        """
+        Полное переобучение индекса описаний по всем пользователям (Celery).
+        if_missing — только если индекса ещё нет (первичное построение).
+        """
+        async with cls.description_index_lock() as locked:
+            if not locked:
+                raise TimeoutError("Индекс описаний занят другой задачей")
+            if if_missing:
+                index = await asyncio.to_thread(load_description_index, settings.DESCRIPTION_INDEX_PATH)
+                if index is not None:
+                    return index
+
+            async with session_maker() as session:
+                result = await session.execute(select(Users.id, Users.description))
+                rows = result.all()
+
+            prepared = await cls.prepare_descriptions([row.description for row in rows], session_maker)
+            index = DescriptionIndex.fit(
+                [row.id for row in rows],
+                [description_hash(row.description) for row in rows],
+                prepared,
+            )
+            await asyncio.to_thread(save_description_index, index, settings.DESCRIPTION_INDEX_PATH)
+        logging.info(f"Индекс описаний переобучен: {len(index)} пользователей")
+        return index
+
+    @staticmethod
+    def description_index_lock():
+        """Блокировка чтения-изменения-записи файла индекса описаний и хранилища эмбеддингов между процессами."""
+        timeout = settings.DESCRIPTION_INDEX_LOCK_TIMEOUT
+        return redis_lock(FastAPICache.get_backend().redis, DESCRIPTION_INDEX_LOCK_KEY, timeout, wait=60)
+
+    @classmethod
+    async def sync_description_index(cls, user_ids: list, session_maker=async_session_maker) -> int:
+        """
+        Приводит файл индекса описаний в соответствие с пользователями user_ids (Celery):
+        новые и изменённые добавляются (описания при необходимости переводятся здесь,
+        вне горячего пути), удалённые убираются. Всё под блокировкой в Redis,
+        чтобы параллельные задачи не теряли строки друг друга.
+        """
+        async with cls.description_index_lock() as locked:
+            if not locked:
+                raise TimeoutError("Индекс описаний занят другой задачей")
+            index = await asyncio.to_thread(load_description_index, settings.DESCRIPTION_INDEX_PATH)
+            if index is None:
+                # Первичное построение включит и этих пользователей
+                cls.schedule_refit()
+                return 0
+
+            async with session_maker() as session:
+                rows = (await session.execute(
+                    select(Users.id, Users.description).where(Users.id.in_(user_ids))
+                )).all()
+            deleted = [user_id for user_id in {str(user_id) for user_id in user_ids} - {str(row.id) for row in rows}]
+            stale = [row for row in rows if index.hash_of(row.id) != description_hash(row.description)]
+            if not stale and not any(index.row_of(user_id) is not None for user_id in deleted):
+                return 0
+
+            # Профиль уже проиндексированного пользователя изменился: его кэш рекомендаций устарел
+            changed = [row.id for row in stale if index.hash_of(row.id) is not None]
+            index.remove(deleted)
+            if stale:
+                prepared = await cls.prepare_descriptions([row.description for row in stale], session_maker)
+                index.upsert(
+                    [row.id for row in stale],
+                    [description_hash(row.description) for row in stale],
+                    prepared,
+                )
+            await asyncio.to_thread(save_description_index, index, settings.DESCRIPTION_INDEX_PATH)
+        await recommendation_cache.invalidate(changed)
+        return len(stale) + len(deleted)
+
+    @staticmethod
+    def schedule_index_sync(user_ids: list) -> None:
+        """Ставит синхронизацию индекса описаний в очередь Celery."""
+        if not user_ids:
+            return
+        try:
+            celery_worker.send_task("sync_description_index", args=[[str(user_id) for user_id in user_ids]])
+        except Exception as e:
+            logging.warning(f"Не удалось поставить синхронизацию индекса описаний в очередь: {e}")
+
+    @classmethod
+    async def index_vectors(cls, index: DescriptionIndex, users) -> sparse.csr_matrix:
+        """
+        Строки индекса описаний для пользователей с id. Тех, кого ещё нет в файле
+        индекса, закрывает in-process оверлей (description_overlay): их уже
+        подготовленные тексты векторизуются текущим векторизатором, а добавление
+        в файл ставится в очередь Celery. Описания здесь не хэшируются и не переводятся.
+        Пользователям без id соответствуют нулевые строки.
+        """
+        ids = [getattr(user, "id", None) for user in users]
+        vectors = index.vectors(ids)
+        positions = np.array(
+            [i for i, user_id in enumerate(ids) if user_id is not None and index.row_of(user_id) is None], dtype=np.int64
+        )
+        if not len(positions):
+            return vectors
+        overlay = await cls.overlay_vectors(index, [users[i] for i in positions])
+        return with_overlay(vectors, positions, overlay)
+
+    @classmethod
+    async def overlay_vectors(cls, index: DescriptionIndex, users) -> sparse.csr_matrix:
+        """Строки оверлея для пользователей, которых нет в файле индекса."""
+        cls.description_overlay.sync(index)
+        unknown = [user for user in users if user.id not in cls.description_overlay]
+        if unknown:
+            prepared = await PreparedDescriptionDAO.lookup([user.description for user in unknown])
+            ready = [(user, text) for user, text in zip(unknown, prepared) if text is not None]
+            matrix = index.transform([text for _, text in ready]) if ready else None
+            for row, (user, _) in enumerate(ready):
+                cls.description_overlay.add(user.id, matrix[row])
+            for user, text in zip(unknown, prepared):
+                if text is None:
+                    cls.description_overlay.add(user.id, None)
+            cls.schedule_index_sync([user.id for user in unknown])
+        return cls.description_overlay.vectors([user.id for user in users])
+
+    @classmethod
+    async def description_vectors(cls, users) -> sparse.csr_matrix | QuantizedVectors | None:
+        """
+        Строки индекса описаний для набора пользователей
+        (при DESCRIPTION_BACKEND=embedding — квантованные эмбеддинги).
+        None — индекса ещё нет, скоринг идёт без описаний.
+        """
+        live = await cls.live_store(users)
+        return None if live is None else await cls.live_vectors(live, users)
+
+    @classmethod
+    async def live_store(cls, users):
+        """Индекс описаний или хранилище эмбеддингов (устаревшие эмбеддинги users ставятся в очередь)."""
+        if settings.DESCRIPTION_BACKEND == "embedding":
+            return cls.refresh_embeddings(users)
+        return await cls.get_description_index()
+
+    @classmethod
+    async def anonymous_vectors(cls, live, users):
+        """
+        Векторы описаний пользователей без id (переданных в теле запроса), вне event loop.
+        Эмбеддинги считаются только в Celery, поэтому при DESCRIPTION_BACKEND=embedding
+        такие пользователи отклоняются: модель не загружается в воркер API.
+        """
+        if not isinstance(live, DescriptionIndex):
+            raise HTTPException(
+                status_code=422,
+                detail="Users without id are not supported with the embedding description backend, pass user ids",
+            )
+        prepared = await cls.prepare_descriptions([user.description for user in users])
+        return await asyncio.to_thread(live.transform, prepared)
+
+    @classmethod
+    def refresh_embeddings(cls, users) -> DescriptionEmbeddings | None:
+        """Хранилище эмбеддингов; пользователи без актуального эмбеддинга ставятся в очередь."""
+        store = load_artifact(settings.DESCRIPTION_EMBEDDINGS_PATH)
+        if store is None:
+            return None
+        stale = [
+            user.id for user in users
+            if getattr(user, "id", None) is not None and store.hash_of(user.id) != description_hash(user.description)
+        ]
+        if stale:
+            cls.schedule_embedding(stale)
+        return store
+
+    @staticmethod
+    def schedule_embedding(user_ids: list) -> None:
+        """Ставит расчёт эмбеддингов описаний в очередь Celery."""
+        try:
+            celery_worker.send_task("embed_descriptions", args=[[str(user_id) for user_id in user_ids]])
+        except Exception as e:
+            logging.warning(f"Не удалось поставить расчёт эмбеддингов в очередь: {e}")
+
+    @classmethod
+    async def embed_users(cls, user_ids: list, session_maker=async_session_maker) -> int:
+        """
+        Приводит хранилище эмбеддингов в соответствие с пользователями user_ids (Celery):
+        эмбеддинги существующих считаются и дописываются, удалённые убираются.
+        Под той же блокировкой в Redis, что и индекс описаний.
+        """
+        async with cls.description_index_lock() as locked:
+            if not locked:
+                raise TimeoutError("Хранилище эмбеддингов занято другой задачей")
+            async with session_maker() as session:
+                rows = (await session.execute(
+                    select(Users.id, Users.description).where(Users.id.in_([uuid.UUID(str(user_id)) for user_id in user_ids]))
+                )).all()
+            deleted = list({str(user_id) for user_id in user_ids} - {str(row.id) for row in rows})
+            store = await asyncio.to_thread(load_artifact, settings.DESCRIPTION_EMBEDDINGS_PATH)
+            if rows:
+                prepared = await cls.prepare_descriptions([row.description for row in rows], session_maker)
+                vectors = await asyncio.to_thread(encode_texts, prepared)
+                store = store or DescriptionEmbeddings(vectors.shape[1])
+            if store is None:
+                return 0
+            changed = [row.id for row in rows if store.hash_of(row.id) is not None]
+            store.remove(deleted)
+            if rows:
+                store.upsert([row.id for row in rows], [description_hash(row.description) for row in rows], vectors)
+            await asyncio.to_thread(save_artifact, store, settings.DESCRIPTION_EMBEDDINGS_PATH)
+        await recommendation_cache.invalidate(changed)
+        return len(rows) + len(deleted)
+
+    @classmethod
+    async def rebuild_description_embeddings(cls, batch_size: int = 1000, session_maker=async_session_maker) -> DescriptionEmbeddings | None:
+        """Полный пересчёт эмбеддингов описаний всех пользователей пачками по id."""
+        async with cls.description_index_lock() as locked:
+            if not locked:
+                raise TimeoutError("Хранилище эмбеддингов занято другой задачей")
+            store, last_id = None, None
+            while True:
+                query = select(Users.id, Users.description).order_by(Users.id).limit(batch_size)
+                if last_id is not None:
+                    query = query.where(Users.id > last_id)
+                async with session_maker() as session:
+                    rows = (await session.execute(query)).all()
+                if not rows:
+                    break
+                prepared = await cls.prepare_descriptions([row.description for row in rows], session_maker)
+                vectors = await asyncio.to_thread(encode_texts, prepared)
+                store = store or DescriptionEmbeddings(vectors.shape[1])
+                store.upsert([row.id for row in rows], [description_hash(row.description) for row in rows], vectors)
+                last_id = rows[-1].id
+            if store is not None:
+                await asyncio.to_thread(save_artifact, store, settings.DESCRIPTION_EMBEDDINGS_PATH)
+        if store is not None:
+            logging.info(f"Эмбеддинги описаний пересчитаны: {len(store)} пользователей, {store.matrix.nbytes} байт")
+        return store
+
     @classmethod
     async def calculate_similarity(cls,user1, user2):
         """
         Вычисление сходства между двумя пользователями.
         """
-        city_similarity = await CityDAO.calculate_geo_similarity(user1.city, user2.city)
-        profession_similarity = await cls.calculate_profession_similarity(user1.profession, user2.profession)
-        age_similarity = 1 - abs( await cls.calculate_age(user1.birthday) - await cls.calculate_age(user2.birthday)) / 100
-        experience_similarity = 1 - abs( await cls.normalize_experience(user1.experience) - await cls.normalize_experience(user2.experience))
+        scores = await cls.score_candidates(user1, [user2])
+        return float(scores["similarity"][0])
+
+    @classmethod
+    async def score_batch(cls, pairs: list[tuple]) -> list[dict]:
+        """
+        Скоринг произвольных пар пользователей одним векторным проходом.
+        Пользователь — объект с полями SUser или UUID. Одинаковые пользователи
+        (по id или по содержимому) загружаются один раз, поэтому города, профессии
+        и описания разрешаются и векторизуются один раз на весь пакет.
+        Описания читаются и пары скорятся в пуле процессов, как в recommend.
+        """
+        ids = {ref for pair in pairs for ref in pair if isinstance(ref, uuid.UUID)}
+        loaded = {}
+        if ids:
+            async with async_session_maker() as session:
+                result = await session.execute(select(Users).where(Users.id.in_(ids)))
+                loaded = {user.id: user for user in result.scalars().all()}
+        missing = ids - loaded.keys()
+        if missing:
+            raise HTTPException(status_code=404, detail=f"Users not found: {sorted(map(str, missing))}")
+
+        rows, users = {}, []
+
+        def row_of(ref) -> int:
+            key = ref if isinstance(ref, uuid.UUID) else ref.model_dump_json()
+            if key not in rows:
+                rows[key] = len(users)
+                users.append(loaded[ref] if isinstance(ref, uuid.UUID) else ref)
+            return rows[key]
+
+        left = np.array([row_of(first) for first, _ in pairs], dtype=np.int64)
+        right = np.array([row_of(second) for _, second in pairs], dtype=np.int64)
+        features = await cls.build_features(users, with_descriptions=False)
+        city = city_registry.geo_pairs(features.city_codes[left], features.city_codes[right])
+        job = PairScoringJob(features=features, geo_row=city, weights=weights, left=left, right=right)
+        await cls.attach_descriptions(job, users)
+        scores = await scoring_pool.run(job, score_pairs_job)
+
+        columns = {name: values.tolist() for name, values in scores.items()}
+        return [dict(zip(columns, values)) for values in zip(*columns.values())]
+
+    @classmethod
+    async def profession_codes(cls, users) -> np.ndarray:
+        """
+        Коды профессий пользователей. Сохранённый Users.profession_code используется
+        как есть, названия без кода ищутся в реестре без записи в БД; -1 — профессия неизвестна
+        (новые профессии добавляются в реестр только при записи пользователей).
+        """
+        stored = [getattr(user, "profession_code", None) for user in users]
+        if all(code is not None for code in stored):
+            return np.array(stored, dtype=np.int64)
+        looked_up = await profession_registry.lookup([user.profession for user in users])
+        return np.array([
+            looked if code is None else code for code, looked in zip(stored, looked_up.tolist())
+        ], dtype=np.int64)
+
+    @classmethod
+    async def profession_similarity(cls, users, codes: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Коды и матрица сходства профессий набора. Если в наборе есть неизвестные
+        профессии (-1), коды перенумеровываются в матрицу только по профессиям набора:
+        неизвестная профессия похожа только на такое же название (1), с остальными — 0.
+        """
+        unknown = codes < 0
+        matrix = await cls.profession_matrix(codes)
+        if not unknown.any():
+            return codes, matrix
+        known, inverse = np.unique(codes[~unknown], return_inverse=True)
+        names = list(dict.fromkeys(users[i].profession for i in np.flatnonzero(unknown)))
+        compact = np.eye(len(known) + len(names), dtype=np.float32)
+        compact[:len(known), :len(known)] = matrix[np.ix_(known, known)]
+        compact_codes = np.empty(len(codes), dtype=np.int64)
+        compact_codes[~unknown] = inverse
+        compact_codes[unknown] = [len(known) + names.index(users[i].profession) for i in np.flatnonzero(unknown)]
+        return compact_codes, compact
+
+    @classmethod
+    async def profession_matrix(cls, codes: np.ndarray) -> np.ndarray:
+        """Матрица сходства профессий, покрывающая все коды codes."""
+        matrix = profession_registry.matrix()
+        if len(codes) and codes.max() >= len(matrix):
+            # Профессию добавил другой воркер
+            await profession_registry.load()
+            matrix = profession_registry.matrix()
+        return matrix
+
+    @classmethod
+    async def build_features(cls, users, with_descriptions: bool = True) -> UserFeatures:
+        """
+        Загружает признаки набора пользователей в колоночные массивы.
+        with_descriptions=False — только дешёвые признаки (профессия, город, возраст, опыт).
+        Дешёвые признаки пользователей, которые есть в хранилище признаков
+        (снимок или его оверлей), берутся готовыми; остальные вычисляются
+        и добавляются в оверлей.
+        """
+        snapshot = feature_store.current()
+        if snapshot is None:
+            return await cls.compute_features(users, with_descriptions)
+
+        n = len(users)
+        user_ids = [getattr(user, "id", None) for user in users]
+        birthdays = np.empty(n, dtype="datetime64[D]")
+        experience = np.empty(n, dtype=np.float64)
+        profession_codes = np.empty(n, dtype=np.int64)
+        city_codes = np.empty(n, dtype=np.int64)
+
+        rows = snapshot.rows_of(user_ids)
+        stored = np.flatnonzero(rows >= 0)
+        if len(stored):
+            snapshot_rows = rows[stored]
+            birthdays[stored] = snapshot.column("birthdays", snapshot_rows)
+            experience[stored] = snapshot.column("experience", snapshot_rows)
+            profession_codes[stored] = snapshot.column("profession_codes", snapshot_rows)
+            city_codes[stored] = (await cls.snapshot_city_codes(snapshot))[snapshot.column("city_rows", snapshot_rows)]
+
+        missing = []
+        for i in np.flatnonzero(rows < 0):
+            row = feature_store.delta.get(user_ids[i]) if user_ids[i] is not None else None
+            if row is None:
+                missing.append(i)
+            else:
+                birthdays[i], experience[i], profession_codes[i], city_codes[i] = row
+        if missing:
+            computed = await cls.compute_features([users[i] for i in missing], with_descriptions=False)
+            birthdays[missing] = [users[i].birthday for i in missing]
+            experience[missing] = computed.experience
+            profession_codes[missing] = await cls.profession_codes([users[i] for i in missing])
+            city_codes[missing] = computed.city_codes
+            for i in missing:
+                if user_ids[i] is not None and profession_codes[i] >= 0:
+                    feature_store.delta.add(user_ids[i], DeltaRow(
+                        users[i].birthday, float(experience[i]), int(profession_codes[i]), int(city_codes[i])
+                    ))
+
+        profession_codes, profession_matrix = await cls.profession_similarity(users, profession_codes)
+        return UserFeatures(
+            user_ids=user_ids,
+            ages=calculate_ages(birthdays),
+            experience=experience,
+            profession_codes=profession_codes,
+            profession_similarity=profession_matrix,
+            city_codes=city_codes,
+            descriptions=await cls.description_vectors(users) if with_descriptions else None,
+        )
+
+    @classmethod
+    async def snapshot_city_codes(cls, snapshot: FeatureStoreVersion) -> np.ndarray:
+        """CityEntry.index городов снимка в реестре воркера (один раз на версию)."""
+        if snapshot.city_codes is None:
+            entries = await CityDAO.resolve_cities(snapshot.cities)
+            snapshot.city_codes = np.array([entry.index for entry in entries], dtype=np.int64)
+        return snapshot.city_codes
+
+    @classmethod
+    async def compute_features(cls, users, with_descriptions: bool = True) -> UserFeatures:
+        """Вычисляет признаки пользователей из их полей (без хранилища признаков)."""
+        profession_codes, profession_matrix = await cls.profession_similarity(users, await cls.profession_codes(users))
+        city_names = list(dict.fromkeys(user.city for user in users))
+        city_index = {name: entry.index for name, entry in zip(city_names, await CityDAO.resolve_cities(city_names))}
+
+        return UserFeatures(
+            user_ids=[getattr(user, "id", None) for user in users],
+            ages=calculate_ages([user.birthday for user in users]),
+            experience=normalize_experiences([user.experience for user in users]),
+            profession_codes=profession_codes,
+            profession_similarity=profession_matrix,
+            city_codes=np.array([city_index[user.city] for user in users], dtype=np.int64),
+            descriptions=await cls.description_vectors(users) if with_descriptions else None,
+        )
+
+    @classmethod
+    async def score_candidates(cls, target_user, candidates) -> dict[str, np.ndarray]:
+        """
+        Пакетный скоринг: все компоненты сходства target_user со всеми кандидатами
+        считаются массивами NumPy за один проход.
+        """
+        features = await cls.build_features([target_user, *candidates])
+        geo_row = cls.compact_geo_row(features)
+        scores = score_one_vs_all(features, 0, geo_row, weights)
+        # Строка 0 — сам target_user
+        return {name: values[1:] for name, values in scores.items()}
+
+    @staticmethod
+    def compact_geo_row(features: UserFeatures) -> np.ndarray:
+        """
+        Геосходство города строки 0 только с городами набора: city_codes
+        перенумеровываются в индексы этой строки, а не всего реестра городов.
+        """
+        codes, features.city_codes = np.unique(features.city_codes, return_inverse=True)
+        return city_registry.geo_row(codes[features.city_codes[0]], codes)
+
+    @classmethod
+    async def scoring_job(cls, target_user, candidates, k: int | None = None, with_descriptions: bool = True) -> ScoringJob:
+        """
+        I/O-часть скоринга на event loop: города из реестра, дообучение индекса описаний.
+        Сам скоринг выполняет пул процессов (scoring_pool).
+        """
+        users = [target_user, *candidates]
+        features = await cls.build_features(users, with_descriptions=False)
+        job = ScoringJob(
+            features=features,
+            geo_row=cls.compact_geo_row(features),
+            weights=weights,
+            k=k,
+        )
+        if with_descriptions:
+            await cls.attach_descriptions(job, users)
+        return job
+
+    @classmethod
+    async def attach_descriptions(cls, job: ScoringJob, users) -> None:
+        """
+        Описания для задания пула. Если векторы снимка хранилища признаков совместимы
+        с живым индексом, процесс пула читает строки из memmap-снимка, а в задание
+        кладутся только векторы пользователей, которых в снимке нет.
+        Иначе в задание кладутся id для поиска в копии индекса процесса пула
+        и строки оверлея для пользователей, ещё не попавших в файл индекса,
+        и пользователей без id.
+        """
+        live = await cls.live_store(users)
+        if live is None:
+            return
+
+        snapshot = feature_store.current()
+        if snapshot is not None and snapshot.description_source == description_source(live):
+            rows = snapshot.rows_of([getattr(user, "id", None) for user in users])
+            stored = np.flatnonzero(rows >= 0)
+            # Описание пользователя могло попасть в индекс уже после сборки снимка
+            rows[stored[~snapshot.column("has_description", rows[stored])]] = -1
+            missing = [user for user, row in zip(users, rows) if row < 0]
+            job.snapshot_version = snapshot.version
+            job.description_rows = rows
+            job.description_overlay = await cls.live_vectors(live, missing) if missing else None
+            return
+
+        ids = [getattr(user, "id", None) for user in users]
+        job.description_ids = [str(user_id) for user_id in ids]
+        positions = np.array([
+            i for i, user_id in enumerate(ids)
+            if user_id is None or (isinstance(live, DescriptionIndex) and live.row_of(user_id) is None)
+        ], dtype=np.int64)
+        if len(positions):
+            job.overlay_positions = positions
+            job.description_overlay = await cls.live_vectors(live, [users[i] for i in positions])
+            job.description_source = description_source(live)
+
+    @classmethod
+    async def live_vectors(cls, live, users):
+        """
+        Векторы описаний пользователей из живого индекса (с оверлеем) или хранилища эмбеддингов;
+        пользователи без id векторизуются по тексту описания.
+        """
+        if isinstance(live, DescriptionIndex):
+            vectors = await cls.index_vectors(live, users)
+        else:
+            vectors = live.vectors([getattr(user, "id", None) for user in users])
+        anonymous = np.array([i for i, user in enumerate(users) if getattr(user, "id", None) is None], dtype=np.int64)
+        if not len(anonymous):
+            return vectors
+        return with_overlay(vectors, anonymous, await cls.anonymous_vectors(live, [users[i] for i in anonymous]))
+
+    @classmethod
+    async def prefilter_candidates(cls, target_user, candidates, size: int) -> list:
+        """
+        Первая стадия: дешёвый скор по профессии, городу, возрасту и опыту
+        без описаний, отбираются size лучших кандидатов.
+        """
+        if size >= len(candidates):
+            return list(candidates)
+        job = await cls.scoring_job(target_user, candidates, k=size, with_descriptions=False)
+        best, _ = await scoring_pool.run(job)
+        return [candidates[i] for i in best]
+
+    @classmethod
+    async def recommend(cls, target_user, candidates, k: int = 10, prefilter: int | None = None) -> list[dict]:
+        """
+        Top-K рекомендаций: кандидаты скорятся чанками в пуле процессов, каждый чанк
+        возвращает свои k лучших (argpartition), общий top-K держится в ограниченной куче.
+        Если задан prefilter, полный скоринг (с описаниями) получают только
+        prefilter лучших по дешёвому скору кандидатов.
+        """
+        if prefilter:
+            candidates = await cls.prefilter_candidates(target_user, candidates, max(prefilter, k))
+
+        chunk_size = settings.SCORING_CHUNK_SIZE
+        chunks = [candidates[start:start + chunk_size] for start in range(0, len(candidates), chunk_size)]
+        jobs = [await cls.scoring_job(target_user, chunk, k=k) for chunk in chunks]
+        results = await asyncio.gather(*(scoring_pool.run(job) for job in jobs))
+
+        accumulator = TopKAccumulator(k)
+        for chunk, (best, scores) in zip(chunks, results):
+            accumulator.push(scores, [chunk[i].id for i in best])
+        return [
+            {"user_id": user_id, "similarity": similarity}
+            for similarity, user_id in accumulator.result()
+        ]
+
+    @classmethod
+    async def load_candidates(
+        cls,
+        session: AsyncSession,
+        target_user,
+        radius_km: float | None = None,
+        same_country: bool = False,
+        tail_sample: int = 0,
+    ) -> list:
+        """
+        Генерация кандидатов. Без ограничений возвращает всех пользователей, кроме target_user.
+        Иначе по пространственному индексу городов берутся пользователи в радиусе radius_km
+        от города target_user и/или из той же страны, плюс случайная выборка
+        tail_sample остальных пользователей (TABLESAMPLE, без полного сканирования).
+        """
+        if radius_km is None and not same_country:
+            result = await session.execute(select(Users).where(Users.id != target_user.id))
+            return result.scalars().all()
+
+        [target_city] = await CityDAO.resolve_cities([target_user.city])
+        local = []
+        if radius_km is not None:
+            local += city_registry.cities_within(target_city.index, radius_km)
+        if same_country:
+            local += city_registry.cities_in_country(target_city.country)
+        local_names = await cls.city_spellings(session, local)
+
+        result = await session.execute(
+            select(Users).where(Users.id != target_user.id, Users.city.in_(local_names))
+        )
+        candidates = list(result.scalars().all())
+
+        if tail_sample:
+            candidates += await cls.sample_users(session, tail_sample, target_user.id, local_names)
+        return candidates
+
+    @classmethod
+    async def city_spellings(cls, session: AsyncSession, entries: list) -> list[str]:
+        """
+        Все значения users.city, которые реестр сводит к городам entries:
+        канонические имена и написания-алиасы ("moscow", "Москва ").
+        """
+        indices = {entry.index for entry in entries}
+        names = (await session.execute(select(Users.city).distinct())).scalars().all()
+        return [name for name in names if (entry := city_registry.get(name)) is not None and entry.index in indices]
+
+    @classmethod
+    async def sample_users(cls, session: AsyncSession, size: int, exclude_id, exclude_cities: list[str]) -> list:
+        """Случайная выборка пользователей вне указанных городов через TABLESAMPLE SYSTEM."""
+        estimate = await session.scalar(text("SELECT reltuples FROM pg_class WHERE relname = 'users'"))
+        # Берём с запасом: часть страниц придётся на уже отобранные города
+        percent = 100.0 if not estimate or estimate <= size else min(100.0, 300.0 * size / estimate)
+        sampled = aliased(Users, tablesample(Users, func.system(percent)))
+        result = await session.execute(
+            select(sampled)
+            .where(sampled.id != exclude_id, sampled.city.not_in(exclude_cities))
+            .limit(size)
+        )
+        return result.scalars().all()
+
+    @staticmethod
+    def ann_descriptions(features: UserFeatures):
+        """Описания для кодировщика ANN: TF-IDF как есть, эмбеддинги — деквантованные."""
+        if isinstance(features.descriptions, QuantizedVectors):
+            return features.descriptions.dequantize()
+        return features.descriptions
+
+    @classmethod
+    def encode_features(cls, users, features: UserFeatures, encoder: UserEncoder) -> np.ndarray:
+        latitudes, longitudes = city_registry.coordinates(features.city_codes)
+        return encoder.encode(
+            [user.profession for user in users],
+            latitudes,
+            longitudes,
+            features.ages,
+            features.experience,
+            cls.ann_descriptions(features),
+        )
+
+    @classmethod
+    async def encode_users(cls, users, encoder: UserEncoder) -> np.ndarray:
+        """Векторы пользователей для ANN-индекса."""
+        features = await cls.build_features(users)
+        return cls.encode_features(users, features, encoder)
+
+    @classmethod
+    async def rebuild_ann_index(cls, if_missing: bool = False, session_maker=async_session_maker) -> UserAnnIndex:
+        """
+        Полное построение ANN-индекса: обучение кодировщика и IVF по всем пользователям (Celery).
+        if_missing — только если индекса ещё нет (первичное построение).
+        """
+        async with cls.ann_index_lock() as locked:
+            if not locked:
+                raise TimeoutError("ANN-индекс занят другой задачей")
+            if if_missing:
+                index = await asyncio.to_thread(load_artifact, settings.ANN_INDEX_PATH)
+                if index is not None:
+                    return index
+
+            async with session_maker() as session:
+                users = (await session.execute(select(Users))).scalars().all()
+
+            features = await cls.build_features(users)
+            encoder = UserEncoder.fit(
+                [user.profession for user in users], cls.ann_descriptions(features), weights, settings.ANN_DESCRIPTION_DIM
+            )
+            if users:
+                vectors = cls.encode_features(users, features, encoder)
+                ivf = IVFIndex.train(vectors, settings.ANN_LISTS)
+                ivf.add([user.id for user in users], vectors)
+            else:
+                ivf = IVFIndex(np.zeros((1, encoder.dim), dtype=np.float32))
+
+            index = UserAnnIndex(encoder, ivf)
+            await asyncio.to_thread(save_artifact, index, settings.ANN_INDEX_PATH)
+        logging.info(f"ANN-индекс построен: {len(index)} пользователей")
+        return index
+
+    @staticmethod
+    def ann_index_lock():
+        """Блокировка чтения-изменения-записи файла ANN-индекса между процессами."""
+        timeout = settings.ANN_INDEX_LOCK_TIMEOUT
+        return redis_lock(FastAPICache.get_backend().redis, ANN_INDEX_LOCK_KEY, timeout, wait=60)
+
+    @classmethod
+    async def sync_ann_index(cls, user_ids: list, session_maker=async_session_maker) -> int:
+        """
+        Приводит файл ANN-индекса в соответствие с пользователями user_ids (Celery):
+        существующие добавляются или перемещаются, удалённые убираются.
+        Всё под блокировкой в Redis, чтобы параллельные задачи не теряли изменения друг друга.
+        """
+        async with cls.ann_index_lock() as locked:
+            if not locked:
+                raise TimeoutError("ANN-индекс занят другой задачей")
+            index = await asyncio.to_thread(load_artifact, settings.ANN_INDEX_PATH)
+            if index is None:
+                # Первичное построение включит и этих пользователей
+                cls.schedule_ann_rebuild()
+                return 0
+
+            async with session_maker() as session:
+                query = select(Users).where(Users.id.in_([uuid.UUID(str(user_id)) for user_id in user_ids]))
+                users = (await session.execute(query)).scalars().all()
+            deleted = list({str(user_id) for user_id in user_ids} - {str(user.id) for user in users})
+            index.ivf.remove(deleted)
+            if users:
+                index.ivf.add([user.id for user in users], await cls.encode_users(users, index.encoder))
+            await asyncio.to_thread(save_artifact, index, settings.ANN_INDEX_PATH)
+        return len(users) + len(deleted)
+
+    @staticmethod
+    def schedule_ann_sync(user_ids: list) -> None:
+        """Ставит синхронизацию ANN-индекса в очередь Celery."""
+        if not user_ids:
+            return
+        try:
+            celery_worker.send_task("sync_ann_index", args=[[str(user_id) for user_id in user_ids]])
+        except Exception as e:
+            logging.warning(f"Не удалось поставить синхронизацию ANN-индекса в очередь: {e}")
+
+    @classmethod
+    def schedule_ann_rebuild(cls) -> None:
+        """Ставит первичное построение ANN-индекса в очередь (не чаще раза в 5 минут на процесс)."""
+        if time.monotonic() - cls._ann_rebuild_scheduled_at < 300:
+            return
+        cls._ann_rebuild_scheduled_at = time.monotonic()
+        try:
+            celery_worker.send_task("rebuild_ann_index", kwargs={"if_missing": True})
+        except Exception as e:
+            logging.warning(f"Не удалось поставить построение ANN-индекса в очередь: {e}")
+
+    @classmethod
+    async def build_feature_store(cls, batch_size: int | None = None, session_maker=async_session_maker) -> str | None:
+        """
+        Собирает и публикует новую версию хранилища признаков (Celery).
+        Пользователи читаются пачками по id, описания берутся из текущего
+        индекса описаний или хранилища эмбеддингов.
+        """
+        batch_size = batch_size or settings.FEATURE_STORE_BATCH_SIZE
+        if settings.DESCRIPTION_BACKEND == "embedding":
+            live = load_artifact(settings.DESCRIPTION_EMBEDDINGS_PATH)
+        else:
+            live = await cls.get_description_index()
+
+        parts, descriptions, last_id = [], [], None
+        while True:
+            query = select(Users).order_by(Users.id).limit(batch_size)
+            if last_id is not None:
+                query = query.where(Users.id > last_id)
+            async with session_maker() as session:
+                users = (await session.execute(query)).scalars().all()
+            if not users:
+                break
+            features = await cls.compute_features(users, with_descriptions=False)
+            latitudes, longitudes = city_registry.coordinates(features.city_codes)
+            parts.append({
+                "user_ids": np.array([user_key(user.id) for user in users], dtype="S16"),
+                "birthdays": np.array([user.birthday for user in users], dtype="datetime64[D]"),
+                "experience": features.experience,
+                "profession_codes": features.profession_codes.astype(np.int32),
+                "city_names": np.array([city_registry.get(user.city).name for user in users], dtype=str),
+                "latitudes": latitudes,
+                "longitudes": longitudes,
+                "has_description": np.array(
+                    [live is not None and live.hash_of(user.id) == description_hash(user.description) for user in users],
+                    dtype=bool,
+                ),
+            })
+            if live is not None:
+                descriptions.append(live.vectors([user.id for user in users]))
+            last_id = users[-1].id
+        if not parts:
+            logging.info("Хранилище признаков не собрано: пользователей нет")
+            return None
+
+        columns = {name: np.concatenate([part[name] for part in parts]) for name in parts[0]}
+        order = np.argsort(columns["user_ids"], kind="stable")
+        columns = {name: values[order] for name, values in columns.items()}
+        cities, city_rows = np.unique(columns.pop("city_names"), return_inverse=True)
+        columns["city_rows"] = city_rows.astype(np.int32)
+
+        manifest = {"descriptions": None, "description_source": description_source(live)}
+        if descriptions:
+            matrix = stack_descriptions(descriptions)[order]
+            if sparse.issparse(matrix):
+                # indices и indptr одного типа, чтобы CSR поверх memmap не копировал их
+                index_dtype = np.int64 if matrix.nnz > np.iinfo(np.int32).max else np.int32
+                columns["description_data"] = matrix.data
+                columns["description_indices"] = matrix.indices.astype(index_dtype)
+                columns["description_indptr"] = matrix.indptr.astype(index_dtype)
+                manifest.update(descriptions="tfidf", description_shape=list(matrix.shape))
+            else:
+                columns["description_codes"] = matrix.codes
+                columns["description_scales"] = matrix.scales
+                manifest["descriptions"] = "embedding"
+
+        version = feature_store.publish(columns, cities.tolist(), manifest)
+        logging.info(f"Хранилище признаков: опубликована версия {version}, {len(order)} пользователей")
+        return version
+
+    @classmethod
+    async def get_ann_index(cls) -> UserAnnIndex | None:
+        """
+        ANN-индекс с диска (файл читается вне event loop).
+        Если индекса ещё нет, его построение ставится в очередь Celery.
+        """
+        index = await asyncio.to_thread(load_artifact, settings.ANN_INDEX_PATH)
+        if index is None:
+            cls.schedule_ann_rebuild()
+        return index
+
+    @classmethod
+    async def load_ann_candidates(cls, session: AsyncSession, target_user, size: int) -> list:
+        """
+        Кандидаты как k ближайших соседей target_user в ANN-индексе.
+        Пока индекс не построен, кандидаты — все пользователи (как в load_candidates).
+        """
+        index = await cls.get_ann_index()
+        if index is None:
+            return await cls.load_candidates(session, target_user)
+        [vector] = await cls.encode_users([target_user], index.encoder)
+        found = index.ivf.search(vector, size + 1, settings.ANN_PROBES)
+        user_ids = [user_id for user_id, _ in found if user_id != str(target_user.id)][:size]
+        if not user_ids:
+            return []
+        result = await session.execute(select(Users).where(Users.id.in_(user_ids)))
+        return result.scalars().all()
 
-        description_similarity = await cls.calculate_description_similarity(user1.description, user2.description)
+    @classmethod
+    def on_users_added(cls, user_ids: list) -> None:
+        """
+        Ставит добавление новых пользователей в очередь Celery: файлы индекса
+        описаний и ANN-индекса и сохранённые top-K обновляются вне запроса.
+        """
+        cls.schedule_index_sync(user_ids)
+        cls.schedule_ann_sync(user_ids)
+        cls.schedule_merge(user_ids)
+
+    @staticmethod
+    def schedule_merge(user_ids: list) -> None:
+        """Ставит вливание новых пользователей в сохранённые top-K в очередь Celery."""
+        if not user_ids:
+            return
+        try:
+            celery_worker.send_task("merge_new_users", args=[[str(user_id) for user_id in user_ids]])
+        except Exception as e:
+            logging.warning(f"Не удалось поставить обновление сохранённых рекомендаций в очередь: {e}")
+
+    @classmethod
+    async def merge_new_users(cls, user_ids: list, k: int | None = None, session_maker=async_session_maker) -> int:
+        """
+        Инкрементальное обновление сохранённых top-K при добавлении пачки пользователей (Celery).
+        Все пользователи загружаются и векторизуются один раз, новые — первыми строками;
+        блоки новые × все (new_rows_top_k) дают и top-K новых пользователей, и лучших
+        новых для каждого из остальных. В уже сохранённые списки попадают только те,
+        кто короче K или с минимумом ниже сходства; несохранённые списки оставляются
+        полному пересчёту и recommend. Запись — один COPY и один DELETE вытесненных строк.
+        """
+        k = k or settings.RECOMMENDATIONS_TOP_K
+        new_ids = {uuid.UUID(str(user_id)) for user_id in user_ids}
+        async with session_maker() as session:
+            everyone = (await session.execute(select(Users))).scalars().all()
+            stored = (await session.execute(
+                select(Recommendation.user_id, func.count().label("size"), func.min(Recommendation.similarity).label("worst"))
+                .group_by(Recommendation.user_id)
+            )).all()
+        everyone = sorted(everyone, key=lambda user: user.id not in new_ids)
+        new = sum(user.id in new_ids for user in everyone)
+        if not new or len(everyone) < 2:
+            return 0
 
-        return (
-            weights["city"] * city_similarity+
-            weights["profession"] * profession_similarity+
-            weights["age"] * age_similarity+
-            weights["experience"] * experience_similarity+
-            weights["description"] * description_similarity
+        features = await cls.build_features(everyone)
+        codes, features.city_codes = np.unique(features.city_codes, return_inverse=True)
+        geo_similarity = city_registry.geo_matrix(codes)
+        own, incoming = await asyncio.to_thread(
+            new_rows_top_k, features, geo_similarity, new, weights, k, settings.REBUILD_TILE_SIZE
         )
+
+        rows = [
+            {"user_id": everyone[row].id, "recommended_user_id": everyone[other].id, "similarity": float(score)}
+            for row in range(new)
+            for other, score in zip(own.indices[row], own.scores[row])
+            if other >= 0
+        ]
+        # Лучшие новые для сохранённых списков, в которые они проходят
+        position = {user.id: i for i, user in enumerate(everyone)}
+        beaten = set()
+        for list_row in stored:
+            row = position.get(list_row.user_id)
+            if row is None or row < new:
+                continue
+            for other, score in zip(incoming.indices[row], incoming.scores[row]):
+                if other >= 0 and (list_row.size < k or score > list_row.worst):
+                    rows.append({"user_id": list_row.user_id, "recommended_user_id": everyone[other].id, "similarity": float(score)})
+                    beaten.add(list_row.user_id)
+
+        async with session_maker() as session:
+            await cls.copy_rows(session, rows)
+            await cls.trim_lists(session, list({row["user_id"] for row in rows}), k)
+            await session.commit()
+        logging.info(f"Новых пользователей: {new}, обновлено списков рекомендаций {len(beaten)}")
+        return len(beaten)
+
+    @classmethod
+    async def trim_lists(cls, session: AsyncSession, user_ids: list, k: int) -> None:
+        """
+        Одним DELETE оставляет в списках user_ids по K лучших строк
+        и убирает повторы (одновременно влитые пачки могли добавить одну пару дважды).
+        """
+        if not user_ids:
+            return
+        copies = select(
+            Recommendation.id,
+            Recommendation.user_id,
+            Recommendation.recommended_user_id,
+            Recommendation.similarity,
+            func.row_number().over(
+                partition_by=(Recommendation.user_id, Recommendation.recommended_user_id),
+            ).label("copy"),
+        ).where(Recommendation.user_id == any_(bindparam("user_ids", user_ids, type_=ARRAY(UUID(as_uuid=True))))).subquery()
+        # Повторы ранжируются последними и в K не входят
+        ranked = select(
+            copies.c.id,
+            copies.c.copy,
+            func.row_number().over(
+                partition_by=copies.c.user_id,
+                order_by=(copies.c.copy, copies.c.similarity.desc(), copies.c.recommended_user_id),
+            ).label("rank"),
+        ).subquery()
+        await session.execute(
+            delete(Recommendation).where(
+                Recommendation.id.in_(select(ranked.c.id).where(or_(ranked.c.rank > k, ranked.c.copy > 1)))
+            )
+        )
+
+    @classmethod
+    async def insert_rows(cls, session: AsyncSession, rows: list[dict], chunk_size: int = 1000) -> None:
+        """Многострочные INSERT пачками (ограничение asyncpg на число параметров)."""
+        for start in range(0, len(rows), chunk_size):
+            await session.execute(insert(Recommendation).values(rows[start:start + chunk_size]))
+
+    @classmethod
+    async def copy_rows(cls, session: AsyncSession, rows: list[dict]) -> int:
+        """
+        Потоковая запись строк через COPY (asyncpg copy_records_to_table)
+        в транзакции сессии, без ORM-объектов и поштучных INSERT.
+        """
+        connection = await session.connection()
+        # Адаптер asyncpg открывает транзакцию (BEGIN) лениво, при первом запросе через него;
+        # COPY идёт мимо адаптера и без этого выполнился бы в autocommit
+        await connection.exec_driver_sql("SELECT 1")
+        raw_connection = await connection.get_raw_connection()
+        await raw_connection.driver_connection.copy_records_to_table(
+            Recommendation.__tablename__,
+            records=[
+                (uuid.uuid4(), row["user_id"], row["recommended_user_id"], float(row["similarity"]))
+                for row in rows
+            ],
+            columns=["id", "user_id", "recommended_user_id", "similarity"],
+        )
+        return len(rows)
+
+    @classmethod
+    async def replace_recommendations(cls, user_ids: list, rows: list[dict], session_maker=async_session_maker) -> dict:
+        """
+        Заменяет сохранённые рекомендации пользователей user_ids одной транзакцией:
+        DELETE по user_id и COPY новых строк. Возвращает число строк и скорость записи.
+        """
+        started = time.perf_counter()
+        async with session_maker() as session:
+            await session.execute(delete(Recommendation).where(Recommendation.user_id.in_(user_ids)))
+            written = await cls.copy_rows(session, rows)
+            await session.commit()
+        seconds = time.perf_counter() - started
+        stats = {"rows": written, "seconds": round(seconds, 3), "rows_per_second": round(written / seconds) if seconds else written}
+        logging.info(f"Записано рекомендаций: {stats['rows']} за {stats['seconds']} с ({stats['rows_per_second']} строк/с)")
+        return stats
+
+    @classmethod
+    async def detach_users(cls, user_ids: list, session_maker=async_session_maker) -> list:
+        """
+        Удаляет удаляемых пользователей из сохранённых рекомендаций (до удаления
+        самих пользователей, иначе мешают внешние ключи). Возвращает id пользователей,
+        чьи списки стали короче и требуют дозаполнения.
+        """
+        async with session_maker() as session:
+            result = await session.execute(
+                select(Recommendation.user_id)
+                .where(
+                    Recommendation.recommended_user_id.in_(user_ids),
+                    Recommendation.user_id.not_in(user_ids),
+                )
+                .distinct()
+            )
+            affected = result.scalars().all()
+            await session.execute(
+                delete(Recommendation).where(
+                    or_(Recommendation.user_id.in_(user_ids), Recommendation.recommended_user_id.in_(user_ids))
+                )
+            )
+            await session.commit()
+        return affected
+
+    @classmethod
+    async def backfill_recommendations(cls, user_ids: list, k: int | None = None, session_maker=async_session_maker) -> None:
+        """Дозаполняет до K списки, из которых были удалены пользователи (Celery)."""
+        k = k or settings.RECOMMENDATIONS_TOP_K
+        for user_id in user_ids:
+            async with session_maker() as session:
+                target_user = await session.get(Users, uuid.UUID(str(user_id)))
+                if target_user is None:
+                    continue
+                user_id = target_user.id
+                stored = set((await session.execute(
+                    select(Recommendation.recommended_user_id).where(Recommendation.user_id == user_id)
+                )).scalars().all())
+                result = await session.execute(
+                    select(Users).where(Users.id != user_id, Users.id.not_in(stored))
+                )
+                candidates = result.scalars().all()
+                missing = k - len(stored)
+                if missing <= 0 or not candidates:
+                    continue
+                best = await cls.recommend(target_user, candidates, missing)
+                await cls.insert_rows(session, [
+                    {"user_id": user_id, "recommended_user_id": row["user_id"], "similarity": row["similarity"]}
+                    for row in best
+                ])
+                await session.commit()
+
+    @staticmethod
+    def schedule_backfill(user_ids: list) -> None:
+        """Ставит дозаполнение списков рекомендаций в очередь Celery."""
+        if not user_ids:
+            return
+        try:
+            celery_worker.send_task("backfill_recommendations", args=[[str(user_id) for user_id in user_ids]])
+        except Exception as e:
+            logging.warning(f"Не удалось поставить дозаполнение рекомендаций в очередь: {e}")
+
     @classmethod
-    async def calculate_similarity_for_all(cls,target_user, all_users, session: AsyncSession):
+    def on_users_deleted(cls, user_ids: list) -> None:
+        """
+        Удаляет пользователей из оверлея хранилища признаков; удаление из файлов
+        индекса описаний, хранилища эмбеддингов и ANN-индекса выполняет Celery.
+        """
+        cls.schedule_index_sync(user_ids)
+        cls.schedule_ann_sync(user_ids)
+        if settings.DESCRIPTION_BACKEND == "embedding":
+            cls.schedule_embedding(user_ids)
+        feature_store.delta.remove(user_ids)
+
+
+class LRUCache:
+    """Простой in-process LRU-кэш."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+
+    def get(self, key, default=None):
+        if key not in self._data:
+            return default
+        self._data.move_to_end(key)
+        return self._data[key]
+
+    def set(self, key, value) -> None:
+        self._data[key] = value
+        self._data.move_to_end(key)
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+
+class PreparedDescriptionDAO(BaseDAO):
+    """
+    Кэш подготовленных описаний, адресуемый хэшем исходного текста:
+    in-process LRU поверх таблицы prepared_descriptions.
+    """
+    model = PreparedDescription
+    cache = LRUCache(settings.PREPARED_DESCRIPTION_CACHE_SIZE)
+    # Ограничение на число параметров в одном IN (...)
+    chunk_size = 1000
+
+    @classmethod
+    async def lookup(cls, descriptions: list[str], session_maker=async_session_maker) -> list[str | None]:
+        """Подготовленные тексты из кэша; язык не определяется и перевод не выполняется."""
+        hashes = [description_hash(description) for description in descriptions]
+        missing = list({h for h in hashes if cls.cache.get(h) is None})
+        if missing:
+            async with session_maker() as session:
+                for start in range(0, len(missing), cls.chunk_size):
+                    result = await session.execute(
+                        select(cls.model.description_hash, cls.model.prepared)
+                        .where(cls.model.description_hash.in_(missing[start:start + cls.chunk_size]))
+                    )
+                    for row in result:
+                        cls.cache.set(row.description_hash, row.prepared)
+        return [cls.cache.get(h) for h in hashes]
+
+    @classmethod
+    async def prepare(cls, descriptions: list[str], session_maker=async_session_maker) -> list[str]:
+        """
+        Подготавливает описания: кэш, затем определение языка и перевод
+        для промахов с сохранением результата в таблицу.
+        """
+        prepared = await cls.lookup(descriptions, session_maker)
+        missing = list(dict.fromkeys(
+            description for description, text in zip(descriptions, prepared) if text is None
+        ))
+        if not missing:
+            return prepared
+
         semaphore = asyncio.Semaphore(10)
-        async def worker(user):
+
+        async def prepare_one(description):
             async with semaphore:
-                similarity = await cls.calculate_similarity(target_user, user)
-                return {
-                    "user_id": user.id,
-                    "similarity": similarity
-                }
-
-        tasks = [worker(user) for user in all_users]
-        results = await asyncio.gather(*tasks)
-        return results
\ No newline at end of file
+                return await RecommendationDAO.detect_language_and_prepare(description)
+
+        computed = dict(zip(missing, await asyncio.gather(*(prepare_one(d) for d in missing))))
+        rows = [
+            {"description_hash": description_hash(description), "prepared": text}
+            for description, text in computed.items()
+            # Пустой результат для длинного текста — ошибка перевода, её не запоминаем
+            if text or len((description or "").strip()) < 3
+        ]
+        if rows:
+            async with session_maker() as session:
+                await session.execute(pg_insert(cls.model).values(rows).on_conflict_do_nothing())
+                await session.commit()
+            for row in rows:
+                cls.cache.set(row["description_hash"], row["prepared"])
+
+        return [computed[d] if text is None else text for d, text in zip(descriptions, prepared)]
+
+    @classmethod
+    async def prepare_for_users(cls, user_ids: list, session_maker=async_session_maker) -> int:
+        """Подготавливает описания указанных пользователей."""
+        async with session_maker() as session:
+            result = await session.execute(select(Users.description).where(Users.id.in_(user_ids)))
+            descriptions = result.scalars().all()
+        await cls.prepare(descriptions, session_maker)
+        return len(descriptions)
+
+    @staticmethod
+    def schedule_preparation(user_ids: list) -> None:
+        """Ставит подготовку описаний в очередь Celery, не блокируя скоринг."""
+        try:
+            celery_worker.send_task("prepare_descriptions", args=[[str(user_id) for user_id in user_ids]])
+        except Exception as e:
+            logging.warning(f"Не удалось поставить подготовку описаний в очередь: {e}")
@@ -0,0 +1,160 @@
+from collections import OrderedDict
+import hashlib
+import time
+
+import numpy as np
+from scipy import sparse
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from app.recommendation.persistence import load_artifact, save_artifact
+
+
+def description_hash(description: str) -> str:
+    """Хэш исходного описания: по нему определяется, что профиль изменился."""
+    return hashlib.sha256((description or "").encode("utf-8")).hexdigest()
+
+
+class DescriptionIndex:
+    """
+    Корпусный TF-IDF индекс описаний пользователей.
+    Векторизатор обучается один раз на всех подготовленных описаниях,
+    строки матрицы нормированы по L2, поэтому косинусное сходство —
+    это обычное скалярное произведение.
+    """
+
+    def __init__(
+        self,
+        vectorizer: TfidfVectorizer | None,
+        matrix: sparse.csr_matrix,
+        user_ids: list[str],
+        hashes: list[str],
+        fitted_at: float | None = None,
+    ):
+        self.vectorizer = vectorizer
+        # Момент обучения векторизатора: столбцы матрицы совместимы только в пределах одного обучения
+        self.fitted_at = fitted_at
+        self.matrix = matrix.tocsr()
+        self.user_ids = list(user_ids)
+        self.hashes = list(hashes)
+        self.rows = {user_id: row for row, user_id in enumerate(self.user_ids) if user_id is not None}
+
+    @classmethod
+    def fit(cls, user_ids: list, hashes: list[str], prepared: list[str]) -> "DescriptionIndex":
+        """Обучает векторизатор на всём корпусе подготовленных описаний."""
+        vectorizer = TfidfVectorizer(stop_words="english")
+        try:
+            matrix = vectorizer.fit_transform(prepared)
+        except ValueError:
+            # Пустой словарь: в корпусе нет ни одного значимого терма
+            vectorizer = None
+            matrix = sparse.csr_matrix((len(prepared), 0), dtype=np.float64)
+        return cls(vectorizer, matrix, [str(user_id) for user_id in user_ids], hashes, fitted_at=time.time())
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def transform(self, prepared: list[str]) -> sparse.csr_matrix:
+        """Векторизует тексты обученным векторизатором (незнакомые термы отбрасываются)."""
+        if self.vectorizer is None:
+            return sparse.csr_matrix((len(prepared), self.matrix.shape[1]), dtype=np.float64)
+        return self.vectorizer.transform(prepared).tocsr()
+
+    def hash_of(self, user_id) -> str | None:
+        row = self.rows.get(str(user_id))
+        return None if row is None else self.hashes[row]
+
+    def row_of(self, user_id) -> int | None:
+        return self.rows.get(str(user_id))
+
+    def _clear_row(self, row: int) -> None:
+        start, end = self.matrix.indptr[row], self.matrix.indptr[row + 1]
+        self.matrix.data[start:end] = 0
+        self.user_ids[row] = None
+
+    def upsert(self, user_ids: list, hashes: list[str], prepared: list[str]) -> None:
+        """
+        Инкрементально добавляет новых или изменённых пользователей.
+        Старая строка изменённого пользователя обнуляется, новая дописывается в конец;
+        место освобождается при плановом переобучении.
+        """
+        if not user_ids:
+            return
+        for user_id in user_ids:
+            row = self.rows.pop(str(user_id), None)
+            if row is not None:
+                self._clear_row(row)
+        self.matrix.eliminate_zeros()
+
+        first_row = self.matrix.shape[0]
+        self.matrix = sparse.vstack([self.matrix, self.transform(prepared)], format="csr")
+        for offset, (user_id, description_hash_) in enumerate(zip(user_ids, hashes)):
+            self.user_ids.append(str(user_id))
+            self.hashes.append(description_hash_)
+            self.rows[str(user_id)] = first_row + offset
+
+    def remove(self, user_ids: list) -> None:
+        for user_id in user_ids:
+            row = self.rows.pop(str(user_id), None)
+            if row is not None:
+                self._clear_row(row)
+        self.matrix.eliminate_zeros()
+
+    def vectors(self, user_ids: list) -> sparse.csr_matrix:
+        """Строки индекса для пользователей; отсутствующим соответствуют нулевые строки."""
+        rows = np.array([self.rows.get(str(user_id), -1) for user_id in user_ids], dtype=np.int64)
+        present = rows >= 0
+        if not present.any():
+            return sparse.csr_matrix((len(user_ids), self.matrix.shape[1]), dtype=np.float64)
+        result = self.matrix[np.where(present, rows, 0)]
+        if not present.all():
+            result = sparse.diags(present.astype(np.float64)) @ result
+        return result.tocsr()
+
+
+class DescriptionOverlay:
+    """
+    In-process оверлей индекса описаний: строки пользователей, которых ещё нет
+    в файле индекса (его пополняет Celery). None — подготовленного текста пока нет,
+    вместо строки используется нулевая. Оверлей привязан к объекту индекса
+    и сбрасывается, когда файл перечитан (новые строки уже в нём).
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._index: DescriptionIndex | None = None
+        self._rows: OrderedDict[str, sparse.csr_matrix | None] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __contains__(self, user_id) -> bool:
+        return str(user_id) in self._rows
+
+    def sync(self, index: DescriptionIndex) -> None:
+        if index is not self._index:
+            self._index = index
+            self._rows.clear()
+
+    def get(self, user_id) -> sparse.csr_matrix | None:
+        return self._rows.get(str(user_id))
+
+    def add(self, user_id, row: sparse.csr_matrix | None) -> None:
+        self._rows[str(user_id)] = row
+        self._rows.move_to_end(str(user_id))
+        while len(self._rows) > self.maxsize:
+            self._rows.popitem(last=False)
+
+    def vectors(self, user_ids: list) -> sparse.csr_matrix:
+        """Строки оверлея; пользователям без строки соответствуют нулевые."""
+        width = self._index.matrix.shape[1] if self._index is not None else 0
+        empty = sparse.csr_matrix((1, width), dtype=np.float64)
+        rows = [self.get(user_id) for user_id in user_ids]
+        return sparse.vstack([empty if row is None else row for row in rows], format="csr")
+
+
+def load_description_index(path: str) -> DescriptionIndex | None:
+    return load_artifact(path)
+
+
+def save_description_index(index: DescriptionIndex, path: str) -> None:
+    save_artifact(index, path)
@@ -0,0 +1,76 @@
+"""
+Отчёт память vs качество для хранения эмбеддингов описаний:
+кодирует выборку описаний в float32 и сравнивает top-k по косинусному сходству
+для float32 (эталон), float16 и int8 с масштабом на строку.
+
+Запуск из корня проекта (нужна локальная модель EMBEDDING_MODEL_PATH):
+    python -m app.recommendation.embedding_report --sample 5000 --k 10 --targets 200
+"""
+import argparse
+import asyncio
+import random
+import time
+
+import numpy as np
+from sqlalchemy import select
+
+from app.database import async_session_maker
+from app.recommendation.dao import RecommendationDAO
+from app.recommendation.embeddings import QuantizedVectors, encode_texts
+from app.recommendation.scoring import top_k
+from app.users.models import Users
+
+
+def recall_at_k(exact: np.ndarray, approximate: np.ndarray, targets: list[int], k: int) -> float:
+    """Средняя доля эталонного top-k, найденная по приближённым сходствам."""
+    found = []
+    for row in targets:
+        expected = exact[row].copy()
+        actual = approximate[row].copy()
+        expected[row] = actual[row] = -np.inf
+        found.append(len(set(top_k(expected, k).tolist()) & set(top_k(actual, k).tolist())) / k)
+    return float(np.mean(found))
+
+
+async def report(sample: int, k: int, targets: int, seed: int) -> dict:
+    async with async_session_maker() as session:
+        descriptions = (await session.execute(select(Users.description))).scalars().all()
+    descriptions = random.Random(seed).sample(descriptions, min(sample, len(descriptions)))
+    prepared = await RecommendationDAO.prepare_descriptions(descriptions)
+
+    started = time.perf_counter()
+    vectors = encode_texts(prepared)
+    encode_seconds = time.perf_counter() - started
+    rows = random.Random(seed).sample(range(len(vectors)), min(targets, len(vectors)))
+
+    exact = vectors @ vectors.T
+    half = vectors.astype(np.float16)
+    quantized = QuantizedVectors.quantize(vectors)
+    variants = {
+        "float32": (vectors.nbytes, exact),
+        "float16": (half.nbytes, half.astype(np.float32) @ half.astype(np.float32).T),
+        "int8": (quantized.nbytes, quantized.dot_block(quantized)),
+    }
+
+    print(f"Описаний: {len(vectors)}, размерность: {vectors.shape[1]}, кодирование: {encode_seconds:.1f} с")
+    print(f"{'dtype':>8} {'bytes/user':>11} {'recall@k':>10}")
+    result = {}
+    for name, (nbytes, similarity) in variants.items():
+        recall = recall_at_k(exact, similarity, rows, k)
+        result[name] = {"bytes_per_user": nbytes / max(len(vectors), 1), "recall": recall}
+        print(f"{name:>8} {nbytes / max(len(vectors), 1):>11.0f} {recall:>10.3f}")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Description embedding memory vs recall report")
+    parser.add_argument("--sample", type=int, default=5000)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--targets", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    asyncio.run(report(args.sample, args.k, args.targets, args.seed))
+
+
+if __name__ == "__main__":
+    main()
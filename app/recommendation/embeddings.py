@@ -0,0 +1,173 @@
+import logging
+import threading
+
+import numpy as np
+
+from app.config import settings
+
+
+logger = logging.getLogger(__name__)
+
+# Сколько строк int8-кодов переводится в float32 за раз при скалярных произведениях
+DOT_BLOCK_ROWS = 4096
+
+
+class QuantizedVectors:
+    """
+    L2-нормированные векторы в int8 с масштабом на строку: x ≈ codes * scale.
+    Хранение в 4 раза меньше float32; скалярные произведения считаются
+    по int8-кодам (в float32 — сумма произведений int8 точна до 2^24)
+    и умножаются на масштабы строк. Коды переводятся в float32 блоками
+    по DOT_BLOCK_ROWS строк (матричное умножение по-прежнему через BLAS),
+    поэтому временная память не растёт с числом строк.
+    """
+
+    def __init__(self, codes: np.ndarray, scales: np.ndarray):
+        self.codes = codes
+        self.scales = scales
+
+    @classmethod
+    def quantize(cls, vectors: np.ndarray) -> "QuantizedVectors":
+        vectors = np.asarray(vectors, dtype=np.float32)
+        scales = np.abs(vectors).max(axis=1) / 127 if len(vectors) else np.empty(0, dtype=np.float32)
+        codes = np.divide(vectors, scales[:, None], out=np.zeros_like(vectors), where=scales[:, None] > 0)
+        return cls(np.rint(codes).astype(np.int8), scales.astype(np.float32))
+
+    @classmethod
+    def zeros(cls, n: int, dim: int) -> "QuantizedVectors":
+        return cls(np.zeros((n, dim), dtype=np.int8), np.zeros(n, dtype=np.float32))
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def __getitem__(self, rows) -> "QuantizedVectors":
+        return QuantizedVectors(self.codes[rows], self.scales[rows])
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes + self.scales.nbytes
+
+    def dequantize(self) -> np.ndarray:
+        return self.codes.astype(np.float32) * self.scales[:, None]
+
+    @staticmethod
+    def _float_blocks(codes: np.ndarray):
+        """(start, stop, коды строк start:stop в float32) блоками по DOT_BLOCK_ROWS строк."""
+        for start in range(0, len(codes), DOT_BLOCK_ROWS):
+            block = codes[start:start + DOT_BLOCK_ROWS]
+            yield start, start + len(block), block.astype(np.float32)
+
+    def dot_row(self, row: int) -> np.ndarray:
+        """Сходство строки row со всеми строками."""
+        vector = self.codes[row].astype(np.float32)
+        raw = np.empty(len(self), dtype=np.float32)
+        for start, stop, block in self._float_blocks(self.codes):
+            raw[start:stop] = block @ vector
+        return raw * self.scales * self.scales[row]
+
+    def dot_block(self, other: "QuantizedVectors") -> np.ndarray:
+        """Матрица сходства строк self со строками other."""
+        raw = np.empty((len(self), len(other)), dtype=np.float32)
+        for column_start, column_stop, columns in self._float_blocks(other.codes):
+            for start, stop, block in self._float_blocks(self.codes):
+                raw[start:stop, column_start:column_stop] = block @ columns.T
+        raw *= self.scales[:, None]
+        raw *= other.scales[None, :]
+        return raw
+
+    def dot_pairs(self, left: np.ndarray, right: np.ndarray) -> np.ndarray:
+        """Сходство пар строк (left[i], right[i])."""
+        raw = np.empty(len(left), dtype=np.float32)
+        for start in range(0, len(left), DOT_BLOCK_ROWS):
+            stop = start + DOT_BLOCK_ROWS
+            raw[start:stop] = np.einsum(
+                "ij,ij->i",
+                self.codes[left[start:stop]].astype(np.float32),
+                self.codes[right[start:stop]].astype(np.float32),
+            )
+        return raw * self.scales[left] * self.scales[right]
+
+
+class DescriptionEmbeddings:
+    """
+    Предвычисленные эмбеддинги подготовленных описаний пользователей (int8 + масштаб).
+    Как и DescriptionIndex, поддерживает инкрементальное добавление и удаление:
+    старая строка обнуляется, новая дописывается в конец.
+    """
+
+    def __init__(self, dim: int):
+        self.dim = dim
+        self.user_ids: list[str | None] = []
+        self.hashes: list[str] = []
+        self.rows: dict[str, int] = {}
+        self.matrix = QuantizedVectors.zeros(0, dim)
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def hash_of(self, user_id) -> str | None:
+        row = self.rows.get(str(user_id))
+        return None if row is None else self.hashes[row]
+
+    def remove(self, user_ids: list) -> None:
+        for user_id in user_ids:
+            row = self.rows.pop(str(user_id), None)
+            if row is not None:
+                self.matrix.scales[row] = 0
+                self.user_ids[row] = None
+
+    def upsert(self, user_ids: list, hashes: list[str], vectors: np.ndarray) -> None:
+        if not len(user_ids):
+            return
+        self.remove(user_ids)
+        quantized = QuantizedVectors.quantize(vectors)
+        first_row = len(self.matrix)
+        self.matrix = QuantizedVectors(
+            np.vstack([self.matrix.codes, quantized.codes]),
+            np.concatenate([self.matrix.scales, quantized.scales]),
+        )
+        for offset, (user_id, description_hash_) in enumerate(zip(user_ids, hashes)):
+            self.user_ids.append(str(user_id))
+            self.hashes.append(description_hash_)
+            self.rows[str(user_id)] = first_row + offset
+
+    def vectors(self, user_ids: list) -> QuantizedVectors:
+        """Векторы пользователей; отсутствующим соответствуют нулевые строки."""
+        rows = np.array([self.rows.get(str(user_id), -1) for user_id in user_ids], dtype=np.int64)
+        result = self.matrix[np.where(rows >= 0, rows, 0)] if len(self.matrix) else QuantizedVectors.zeros(len(rows), self.dim)
+        if (rows < 0).any():
+            result.scales = np.where(rows >= 0, result.scales, 0).astype(np.float32)
+        return result
+
+
+_model = None
+_model_lock = threading.Lock()
+
+
+def get_model():
+    """
+    Модель sentence-transformers из локального каталога EMBEDDING_MODEL_PATH на CPU.
+    Загружается лениво один раз на процесс (воркер Celery), без обращений к сети.
+    """
+    global _model
+    with _model_lock:
+        if _model is None:
+            from sentence_transformers import SentenceTransformer
+
+            logger.info(f"Загружаем модель эмбеддингов: {settings.EMBEDDING_MODEL_PATH}")
+            _model = SentenceTransformer(settings.EMBEDDING_MODEL_PATH, device="cpu", local_files_only=True)
+    return _model
+
+
+def encode_texts(texts: list[str], batch_size: int | None = None) -> np.ndarray:
+    """L2-нормированные эмбеддинги float32 (пакетами по batch_size)."""
+    model = get_model()
+    if not texts:
+        return np.zeros((0, model.get_sentence_embedding_dimension()), dtype=np.float32)
+    return model.encode(
+        texts,
+        batch_size=batch_size or settings.EMBEDDING_BATCH_SIZE,
+        normalize_embeddings=True,
+        convert_to_numpy=True,
+        show_progress_bar=False,
+    ).astype(np.float32)
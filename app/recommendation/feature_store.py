@@ -0,0 +1,282 @@
+from collections import OrderedDict
+from datetime import date, datetime
+import json
+import logging
+import math
+import os
+from pathlib import Path
+import shutil
+import tempfile
+import time
+from typing import NamedTuple
+import uuid
+
+import numpy as np
+from scipy import sparse
+
+from app.config import settings
+from app.recommendation.description_index import DescriptionIndex
+from app.recommendation.embeddings import DescriptionEmbeddings, QuantizedVectors
+
+
+logger = logging.getLogger(__name__)
+
+CURRENT = "CURRENT"
+MANIFEST = "manifest.json"
+
+
+def user_key(user_id) -> bytes:
+    """Ключ строки снимка: 16 байт UUID (их порядок совпадает с порядком uuid в PostgreSQL)."""
+    return uuid.UUID(str(user_id)).bytes
+
+
+def user_id_of(key: bytes) -> uuid.UUID:
+    """Обратное к user_key (numpy обрезает у S16 хвостовые нулевые байты)."""
+    return uuid.UUID(bytes=bytes(key).ljust(16, b"\0"))
+
+
+def description_source(store) -> str | None:
+    """
+    Пространство векторов описаний: строки снимка можно смешивать
+    со строками живого индекса только при совпадении источника.
+    """
+    if isinstance(store, DescriptionEmbeddings):
+        return f"embedding:{settings.EMBEDDING_MODEL_PATH}:{store.dim}"
+    if isinstance(store, DescriptionIndex) and getattr(store, "fitted_at", None) is not None:
+        return f"tfidf:{store.fitted_at}"
+    return None
+
+
+def stack_descriptions(parts: list):
+    """Вертикальная склейка строк описаний (CSR или QuantizedVectors)."""
+    if sparse.issparse(parts[0]):
+        return sparse.vstack(parts, format="csr")
+    return QuantizedVectors(
+        np.vstack([part.codes for part in parts]),
+        np.concatenate([part.scales for part in parts]),
+    )
+
+
+def with_overlay(descriptions, positions: np.ndarray, overlay):
+    """Строки descriptions, в которых строки positions заменены по порядку строками overlay."""
+    if overlay is None or not len(positions):
+        return descriptions
+    n = descriptions.shape[0] if sparse.issparse(descriptions) else len(descriptions)
+    order = np.arange(n)
+    order[positions] = n + np.arange(len(positions))
+    return stack_descriptions([descriptions, overlay])[order]
+
+
+class FeatureStoreVersion:
+    """
+    Версия хранилища признаков: каталог .npy-колонок, открытых через numpy.memmap
+    (np.load(mmap_mode="r")). Все воркеры gunicorn и процессы пула скоринга
+    читают одни и те же страницы из page cache ОС вместо собственных копий.
+    Строки упорядочены по ключу user id, поиск строки — бинарный.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.manifest = json.loads((self.path / MANIFEST).read_text())
+        self.version: str = self.manifest["version"]
+        self.columns = {
+            name: np.load(self.path / f"{name}.npy", mmap_mode="r")
+            for name in self.manifest["columns"]
+        }
+        # Таблица городов снимка невелика и читается целиком
+        self.cities: list[str] = np.load(self.path / "cities.npy").tolist()
+        # CityEntry.index городов снимка в реестре текущего процесса (заполняет DAO)
+        self.city_codes: np.ndarray | None = None
+        self._descriptions: sparse.csr_matrix | None = None
+
+    def __len__(self) -> int:
+        return len(self.columns["user_ids"])
+
+    @property
+    def description_source(self) -> str | None:
+        return self.manifest.get("description_source")
+
+    def rows_of(self, user_ids: list) -> np.ndarray:
+        """Строки пользователей в снимке; -1 — пользователя нет (добавлен позже или без id)."""
+        rows = np.full(len(user_ids), -1, dtype=np.int64)
+        ids = self.columns["user_ids"]
+        known = np.array([i for i, user_id in enumerate(user_ids) if user_id is not None], dtype=np.int64)
+        if not len(known) or not len(ids):
+            return rows
+        keys = np.array([user_key(user_ids[i]) for i in known], dtype="S16")
+        found = np.minimum(np.searchsorted(ids, keys), len(ids) - 1)
+        match = ids[found] == keys
+        rows[known[match]] = found[match]
+        return rows
+
+    def column(self, name: str, rows: np.ndarray) -> np.ndarray:
+        """Значения колонки для строк rows (с диска читаются только нужные страницы)."""
+        return np.asarray(self.columns[name][rows])
+
+    def descriptions(self, rows: np.ndarray | None = None):
+        """
+        Строки описаний снимка: CSR для tfidf, QuantizedVectors для embedding.
+        rows=None — все строки без копирования (поверх memmap).
+        """
+        kind = self.manifest.get("descriptions")
+        if kind == "tfidf":
+            if self._descriptions is None:
+                # copy=False: CSR ссылается прямо на memmap-колонки
+                self._descriptions = sparse.csr_matrix(
+                    (
+                        self.columns["description_data"],
+                        self.columns["description_indices"],
+                        self.columns["description_indptr"],
+                    ),
+                    shape=tuple(self.manifest["description_shape"]),
+                    copy=False,
+                )
+            return self._descriptions if rows is None else self._descriptions[rows]
+        if kind == "embedding" and rows is None:
+            return QuantizedVectors(self.columns["description_codes"], self.columns["description_scales"])
+        if kind == "embedding":
+            return QuantizedVectors(
+                self.column("description_codes", rows),
+                self.column("description_scales", rows),
+            )
+        return None
+
+    def descriptions_with_overlay(self, rows: np.ndarray, overlay) -> "sparse.csr_matrix | QuantizedVectors":
+        """Строки описаний снимка; строки с -1 берутся по порядку из overlay."""
+        missing = np.flatnonzero(rows < 0)
+        return with_overlay(self.descriptions(np.where(rows >= 0, rows, 0)), missing, overlay)
+
+
+class DeltaRow(NamedTuple):
+    birthday: date
+    experience: float  # нормированный опыт
+    profession_code: int
+    city_code: int  # CityEntry.index в реестре текущего процесса
+
+
+class FeatureDelta:
+    """
+    Небольшой in-process оверлей поверх снимка: готовые дешёвые признаки
+    пользователей, которых нет в текущей версии (добавлены после её сборки).
+    Сбрасывается при переходе на новую версию, старые записи вытесняются.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._rows: OrderedDict[str, DeltaRow] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def get(self, user_id) -> DeltaRow | None:
+        return self._rows.get(str(user_id))
+
+    def add(self, user_id, row: DeltaRow) -> None:
+        self._rows[str(user_id)] = row
+        self._rows.move_to_end(str(user_id))
+        while len(self._rows) > self.maxsize:
+            self._rows.popitem(last=False)
+
+    def remove(self, user_ids: list) -> None:
+        for user_id in user_ids:
+            self._rows.pop(str(user_id), None)
+
+    def clear(self) -> None:
+        self._rows.clear()
+
+
+class FeatureStore:
+    """
+    Версионированное хранилище признаков пользователей в каталоге root:
+    root/<version>/*.npy и файл root/CURRENT с именем текущей версии.
+    Celery собирает версию во временном каталоге, переименовывает его и
+    атомарно подменяет CURRENT (os.replace). Процессы замечают новую версию
+    не чаще раза в refresh_interval секунд и переключаются одной ссылкой;
+    задания пула закрепляют версию, поэтому старые каталоги удаляются не сразу.
+    """
+
+    def __init__(self, root: str, refresh_interval: float, delta_size: int, keep_versions: int):
+        self.root = Path(root)
+        self.refresh_interval = refresh_interval
+        self.keep_versions = keep_versions
+        self.delta = FeatureDelta(delta_size)
+        self._snapshot: FeatureStoreVersion | None = None
+        self._opened: dict[str, FeatureStoreVersion] = {}
+        self._checked_at = -math.inf
+
+    def current_version(self) -> str | None:
+        try:
+            return (self.root / CURRENT).read_text().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def current(self) -> FeatureStoreVersion | None:
+        """Текущий снимок (None, пока ни одна версия не собрана)."""
+        now = time.monotonic()
+        if now - self._checked_at >= self.refresh_interval:
+            self._checked_at = now
+            version = self.current_version()
+            if version is not None and (self._snapshot is None or self._snapshot.version != version):
+                self._snapshot = self.open(version)
+                self.delta.clear()
+                logger.info(f"Хранилище признаков: версия {version}, {len(self._snapshot)} пользователей")
+        return self._snapshot
+
+    def open(self, version: str) -> FeatureStoreVersion:
+        """Снимок конкретной версии; открытыми держатся только две последние."""
+        snapshot = self._opened.get(version)
+        if snapshot is None:
+            snapshot = FeatureStoreVersion(self.root / version)
+            self._opened[version] = snapshot
+            for old in list(self._opened)[:-2]:
+                del self._opened[old]
+        return snapshot
+
+    def publish(self, columns: dict[str, np.ndarray], cities: list[str], manifest: dict) -> str:
+        """Записывает новую версию и атомарно делает её текущей."""
+        self.root.mkdir(parents=True, exist_ok=True)
+        # Имена версий упорядочены по времени сборки (до микросекунд)
+        version = f"{datetime.now().strftime('%Y%m%dT%H%M%S%f')}-{uuid.uuid4().hex[:8]}"
+        tmp = Path(tempfile.mkdtemp(dir=self.root, prefix=".tmp-"))
+        try:
+            for name, values in columns.items():
+                np.save(tmp / f"{name}.npy", values)
+            np.save(tmp / "cities.npy", np.array(cities, dtype=str))
+            manifest = {
+                **manifest,
+                "version": version,
+                "users": len(columns["user_ids"]),
+                "columns": list(columns),
+            }
+            (tmp / MANIFEST).write_text(json.dumps(manifest))
+            os.rename(tmp, self.root / version)
+        except Exception:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+
+        fd, pointer = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+        with os.fdopen(fd, "w") as file:
+            file.write(version)
+        os.replace(pointer, self.root / CURRENT)
+        self.prune()
+        return version
+
+    def prune(self) -> None:
+        """Удаляет старые версии, кроме keep_versions последних (и текущей)."""
+        current = self.current_version()
+        versions = sorted(
+            path.name for path in self.root.iterdir()
+            if path.is_dir() and not path.name.startswith(".")
+        )
+        for name in versions[:-self.keep_versions]:
+            if name != current:
+                # Открытые memmap остаются валидными: файл живёт до закрытия отображения
+                shutil.rmtree(self.root / name, ignore_errors=True)
+
+
+feature_store = FeatureStore(
+    settings.FEATURE_STORE_DIR,
+    refresh_interval=settings.FEATURE_STORE_REFRESH_INTERVAL,
+    delta_size=settings.FEATURE_STORE_DELTA_SIZE,
+    keep_versions=settings.FEATURE_STORE_KEEP_VERSIONS,
+)
@@ -0,0 +1,65 @@
+"""
+Задержка лёгких эндпоинтов под параллельной нагрузкой рекомендациями:
+concurrency клиентов непрерывно запрашивают /recommendation/recommendations/{user_id},
+параллельно измеряется время ответа /healthcheck и /.
+
+Запуск при работающем сервере:
+    python -m app.recommendation.latency_report --base-url http://localhost:8000/api --user-id <uuid> --concurrency 8 --seconds 30
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+import numpy as np
+
+
+LIGHT_ENDPOINTS = ["/healthcheck", "/"]
+
+
+async def load_recommendations(client: httpx.AsyncClient, user_id: str, deadline: float, statuses: dict) -> None:
+    while time.perf_counter() < deadline:
+        response = await client.get(f"/recommendation/recommendations/{user_id}")
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+
+async def probe(client: httpx.AsyncClient, path: str, deadline: float, interval: float, latencies: list) -> None:
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        await client.get(path)
+        latencies.append(time.perf_counter() - started)
+        await asyncio.sleep(interval)
+
+
+async def report(base_url: str, user_id: str, concurrency: int, seconds: float, interval: float) -> dict:
+    deadline = time.perf_counter() + seconds
+    statuses: dict[int, int] = {}
+    latencies = {path: [] for path in LIGHT_ENDPOINTS}
+    async with httpx.AsyncClient(base_url=base_url, timeout=60) as client:
+        await asyncio.gather(
+            *(load_recommendations(client, user_id, deadline, statuses) for _ in range(concurrency)),
+            *(probe(client, path, deadline, interval, latencies[path]) for path in LIGHT_ENDPOINTS),
+        )
+
+    print(f"Параллельных запросов рекомендаций: {concurrency}, ответы: {statuses}")
+    print(f"{'endpoint':>14} {'n':>6} {'p50, ms':>9} {'p99, ms':>9}")
+    for path, values in latencies.items():
+        if values:
+            p50, p99 = 1000 * np.percentile(values, [50, 99])
+            print(f"{path:>14} {len(values):>6} {p50:>9.1f} {p99:>9.1f}")
+    return {"statuses": statuses, "latencies": latencies}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Light endpoint latency under recommendation load")
+    parser.add_argument("--base-url", default="http://localhost:8000/api")
+    parser.add_argument("--user-id", required=True)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=30)
+    parser.add_argument("--interval", type=float, default=0.05)
+    args = parser.parse_args()
+    asyncio.run(report(args.base_url, args.user_id, args.concurrency, args.seconds, args.interval))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,6 @@
 from typing import Literal
 import uuid
-from sqlalchemy import UUID,  Date, ForeignKey
+from sqlalchemy import UUID,  Date, ForeignKey, Index, String, text
 from sqlalchemy.orm import mapped_column, Mapped
 
 from app.database import Base
@@ -11,5 +11,17 @@ class Recommendation(Base):
     
     id: Mapped[UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     user_id: Mapped[UUID] = mapped_column(ForeignKey("users.id"))
-    recommended_user_id: Mapped[UUID] = mapped_column(ForeignKey("users.id"))
-    similarity: Mapped[float]
\ No newline at end of file
+    recommended_user_id: Mapped[UUID] = mapped_column(ForeignKey("users.id"), index=True)
+    similarity: Mapped[float]
+
+    # Top-k пользователя — один проход по диапазону индекса; он же служит индексом для FK user_id
+    __table_args__ = (
+        Index("ix_recommendations_user_id_similarity", "user_id", text("similarity DESC")),
+    )
+
+class PreparedDescription(Base):
+    """Подготовленный (переведённый на английский) текст описания по хэшу исходного описания."""
+    __tablename__ = "prepared_descriptions"
+
+    description_hash: Mapped[str] = mapped_column(String(64), primary_key=True)
+    prepared: Mapped[str]
@@ -0,0 +1,46 @@
+import logging
+import os
+from pathlib import Path
+import tempfile
+
+import joblib
+
+
+logger = logging.getLogger(__name__)
+
+# path -> (mtime, объект): каждый артефакт загружается заново только если файл изменился
+_loaded: dict[str, tuple[int, object]] = {}
+
+
+def load_artifact(path: str):
+    """
+    Загружает артефакт (индекс, модель) с диска. Повторная загрузка происходит
+    только если файл изменился, например после перестроения в Celery.
+    """
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        cached = _loaded.get(path)
+        return cached[1] if cached else None
+
+    cached = _loaded.get(path)
+    if cached is None or cached[0] != mtime:
+        logger.info(f"Загружаем артефакт: {path}")
+        cached = (mtime, joblib.load(path))
+        _loaded[path] = cached
+    return cached[1]
+
+
+def save_artifact(artifact, path: str) -> None:
+    """Атомарно сохраняет артефакт: запись во временный файл и os.replace."""
+    directory = Path(path).parent
+    directory.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    os.close(fd)
+    try:
+        joblib.dump(artifact, tmp_path)
+        os.replace(tmp_path, path)
+    except Exception:
+        os.unlink(tmp_path)
+        raise
+    _loaded[path] = (os.stat(path).st_mtime_ns, artifact)
@@ -0,0 +1,151 @@
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+import logging
+import multiprocessing
+
+import numpy as np
+from fastapi import HTTPException, status
+
+from app.config import settings
+from app.recommendation.description_index import load_description_index
+from app.recommendation.feature_store import description_source, feature_store, with_overlay
+from app.recommendation.persistence import load_artifact
+from app.recommendation.scoring import UserFeatures, score_one_vs_all, score_pairs, top_k
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ScoringJob:
+    """
+    Задание на скоринг строки 0 (target) против остальных строк features.
+    Описания целиком в задание не кладутся: процесс пула читает строки
+    description_rows из memmap-снимка версии snapshot_version (отсутствующие там
+    строки — по порядку из description_overlay), а без снимка берёт векторы
+    по description_ids из своей копии индекса (перечитывается при изменении файла).
+    """
+    features: UserFeatures
+    geo_row: np.ndarray
+    weights: dict
+    # Сколько лучших вернуть; None — вернуть сходство со всеми кандидатами
+    k: int | None = None
+    description_ids: list | None = None
+    snapshot_version: str | None = None
+    description_rows: np.ndarray | None = None
+    description_overlay: object = None
+    # Без снимка: строки description_ids, заменяемые строками description_overlay,
+    # если индекс процесса пула из того же обучения (description_source)
+    overlay_positions: np.ndarray | None = None
+    description_source: str | None = None
+
+
+@dataclass
+class PairScoringJob(ScoringJob):
+    """
+    Задание на скоринг пар строк (left[i], right[i]) features;
+    geo_row — геосходство городов каждой пары (CityRegistry.geo_pairs).
+    """
+    left: np.ndarray | None = None
+    right: np.ndarray | None = None
+
+
+def score_job(job: ScoringJob) -> tuple[np.ndarray | None, np.ndarray]:
+    """
+    Выполняется в процессе пула: (индексы top-k кандидатов, их сходство)
+    или (None, сходство со всеми кандидатами), если job.k не задан.
+    Индексы кандидатов отсчитываются без строки target.
+    """
+    features = load_job_descriptions(job)
+    scores = score_one_vs_all(features, 0, job.geo_row, job.weights)["similarity"][1:]
+    if job.k is None:
+        return None, scores
+    best = top_k(scores, job.k)
+    return best, scores[best]
+
+
+def score_pairs_job(job: PairScoringJob) -> dict[str, np.ndarray]:
+    """Выполняется в процессе пула: компоненты сходства пар job.left, job.right."""
+    return score_pairs(load_job_descriptions(job), job.left, job.right, job.geo_row, job.weights)
+
+
+def load_job_descriptions(job: ScoringJob) -> UserFeatures:
+    """Признаки задания с описаниями из memmap-снимка или копии индекса процесса пула."""
+    features = job.features
+    if job.description_rows is not None:
+        snapshot = feature_store.open(job.snapshot_version)
+        features.descriptions = snapshot.descriptions_with_overlay(job.description_rows, job.description_overlay)
+    elif job.description_ids is not None:
+        store = load_description_store()
+        if store is not None:
+            features.descriptions = store.vectors(job.description_ids)
+            if job.description_overlay is not None and description_source(store) == job.description_source:
+                features.descriptions = with_overlay(features.descriptions, job.overlay_positions, job.description_overlay)
+    return features
+
+
+def load_description_store():
+    """TF-IDF индекс или хранилище эмбеддингов описаний — в зависимости от DESCRIPTION_BACKEND."""
+    if settings.DESCRIPTION_BACKEND == "embedding":
+        return load_artifact(settings.DESCRIPTION_EMBEDDINGS_PATH)
+    return load_description_index(settings.DESCRIPTION_INDEX_PATH)
+
+
+def _warm_up() -> None:
+    """
+    Инициализатор процесса пула: открывает снимок хранилища признаков,
+    а если его ещё нет — заранее загружает описания.
+    """
+    if feature_store.current() is None:
+        load_description_store()
+
+
+class ScoringPool:
+    """
+    Пул процессов для CPU-ёмкого скоринга: event loop только готовит признаки
+    (I/O) и ждёт результат. Одновременно принимается не более queue_depth
+    заданий, сверх этого запрос получает 503, а не копится в очереди.
+    Если пул не запущен (Celery, CLI), задания выполняются в потоке.
+    """
+
+    def __init__(self):
+        self._executor: ProcessPoolExecutor | None = None
+        self._queue_depth = 0
+        self._in_flight = 0
+
+    def start(self, size: int | None = None, queue_depth: int | None = None) -> None:
+        size = settings.SCORING_POOL_SIZE if size is None else size
+        self._queue_depth = settings.SCORING_POOL_QUEUE_DEPTH if queue_depth is None else queue_depth
+        if size <= 0:
+            return
+        self._executor = ProcessPoolExecutor(
+            max_workers=size,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_warm_up,
+        )
+        logger.info(f"Пул скоринга запущен: {size} процессов, очередь {self._queue_depth}")
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+    async def run(self, job: ScoringJob, function=None):
+        """Выполняет function(job) (по умолчанию score_job) в пуле или, без пула, в потоке."""
+        function = function or score_job
+        if self._executor is None:
+            return await asyncio.to_thread(function, job)
+        if self._queue_depth and self._in_flight >= self._queue_depth:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Scoring queue is full, retry later",
+            )
+        self._in_flight += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, function, job)
+        finally:
+            self._in_flight -= 1
+
+
+scoring_pool = ScoringPool()
@@ -0,0 +1,71 @@
+"""
+Отчёт recall vs latency для двухстадийного отбора кандидатов:
+для выборки пользователей сравнивает top-k с предфильтром разного размера
+с полным (исчерпывающим) скорингом на тех же данных.
+
+Запуск из корня проекта:
+    python -m app.recommendation.prefilter_report --targets 20 --k 10 --sizes 100 500 2000
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from sqlalchemy import select
+
+from app.cache import init_redis_cache
+from app.city.registry import city_registry
+from app.database import async_session_maker
+from app.recommendation.dao import RecommendationDAO
+from app.users.models import Users
+
+
+async def report(targets: int, k: int, sizes: list[int], seed: int) -> dict:
+    init_redis_cache()
+    await city_registry.load()
+    async with async_session_maker() as session:
+        users = (await session.execute(select(Users))).scalars().all()
+
+    sample = random.Random(seed).sample(users, min(targets, len(users)))
+    if not sample:
+        raise SystemExit("Нет пользователей для отчёта: таблица users пуста или --targets 0")
+    recall = {size: [] for size in sizes}
+    latency = {size: [] for size in [0, *sizes]}
+
+    for target in sample:
+        candidates = [user for user in users if user.id != target.id]
+
+        started = time.perf_counter()
+        exact = await RecommendationDAO.recommend(target, candidates, k)
+        latency[0].append(time.perf_counter() - started)
+        exact_ids = {row["user_id"] for row in exact}
+
+        for size in sizes:
+            started = time.perf_counter()
+            approximate = await RecommendationDAO.recommend(target, candidates, k, prefilter=size)
+            latency[size].append(time.perf_counter() - started)
+            found = {row["user_id"] for row in approximate}
+            recall[size].append(len(found & exact_ids) / max(len(exact_ids), 1))
+
+    print(f"Пользователей: {len(users)}, целей: {len(sample)}, k={k}")
+    print(f"{'M':>10} {'recall@k':>10} {'latency, ms':>12}")
+    print(f"{'exhaustive':>10} {1.0:>10.3f} {1000 * sum(latency[0]) / len(sample):>12.1f}")
+    for size in sizes:
+        mean_recall = sum(recall[size]) / len(sample)
+        mean_latency = 1000 * sum(latency[size]) / len(sample)
+        print(f"{size:>10} {mean_recall:>10.3f} {mean_latency:>12.1f}")
+    return {"recall": recall, "latency": latency}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prefilter recall vs latency report")
+    parser.add_argument("--targets", type=int, default=20)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 500, 2000])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    asyncio.run(report(args.targets, args.k, args.sizes, args.seed))
+
+
+if __name__ == "__main__":
+    main()
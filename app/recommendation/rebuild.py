@@ -0,0 +1,126 @@
+from dataclasses import dataclass
+from pathlib import Path
+import uuid
+
+import numpy as np
+from app.city.registry import city_registry
+from app.config import settings
+from app.database import async_session_maker
+from app.recommendation.dao import RecommendationDAO, weights
+from app.recommendation.feature_store import feature_store, user_id_of
+from app.recommendation.persistence import load_artifact, save_artifact
+from app.recommendation.scoring import RunningTopK, UserFeatures, calculate_ages, score_block
+
+
+@dataclass
+class FeatureSnapshot:
+    """
+    Общие предвычисленные признаки всех пользователей для пакетного перестроения.
+    Колонки features — memmap-колонки версии хранилища признаков (feature_store),
+    поэтому воркеры всех шардов читают одни и те же страницы page cache.
+    city_codes в features — строки таблицы городов версии, по ним же
+    индексирована компактная матрица geo_similarity, поэтому снимок
+    не зависит от реестра городов конкретного процесса.
+    """
+    version: str
+    features: UserFeatures
+    geo_similarity: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.features)
+
+    def user_id(self, row: int) -> uuid.UUID:
+        return user_id_of(self.features.user_ids[row])
+
+
+def snapshot_path(run_id: str) -> str:
+    return str(Path(settings.REBUILD_DIR) / f"{run_id}.joblib")
+
+
+def open_snapshot(version: str, geo_similarity: np.ndarray, profession_similarity: np.ndarray) -> FeatureSnapshot:
+    """Признаки версии хранилища без копирования колонок (кроме возрастов)."""
+    store = feature_store.open(version)
+    features = UserFeatures(
+        user_ids=store.columns["user_ids"],
+        ages=calculate_ages(store.columns["birthdays"]),
+        experience=store.columns["experience"],
+        profession_codes=store.columns["profession_codes"],
+        profession_similarity=profession_similarity,
+        city_codes=store.columns["city_rows"],
+        descriptions=store.descriptions(),
+    )
+    return FeatureSnapshot(version, features, geo_similarity)
+
+
+async def build_snapshot(session_maker=async_session_maker) -> FeatureSnapshot:
+    """
+    Публикует свежую версию хранилища признаков (пользователи по возрастанию id)
+    и считает по её таблице городов компактную матрицу геосходства.
+    """
+    version = await RecommendationDAO.build_feature_store(session_maker=session_maker)
+    if version is None:
+        raise RuntimeError("Хранилище признаков не собрано: пользователей нет")
+    store = feature_store.open(version)
+    codes = await RecommendationDAO.snapshot_city_codes(store)
+    geo_similarity = city_registry.geo_matrix(codes)
+    profession_similarity = await RecommendationDAO.profession_matrix(np.asarray(store.columns["profession_codes"]))
+    return open_snapshot(version, geo_similarity, profession_similarity)
+
+
+def save_snapshot(snapshot: FeatureSnapshot, run_id: str) -> None:
+    """Сохраняет только версию хранилища и небольшие матрицы городов и профессий."""
+    save_artifact(
+        {
+            "version": snapshot.version,
+            "geo_similarity": snapshot.geo_similarity,
+            "profession_similarity": snapshot.features.profession_similarity,
+        },
+        snapshot_path(run_id),
+    )
+
+
+def load_snapshot(run_id: str) -> FeatureSnapshot:
+    plan = load_artifact(snapshot_path(run_id))
+    if plan is None:
+        raise FileNotFoundError(f"Снимок признаков {run_id} не найден")
+    return open_snapshot(plan["version"], plan["geo_similarity"], plan["profession_similarity"])
+
+
+def score_rows(snapshot: FeatureSnapshot, rows: range, k: int, tile: int | None = None) -> list[dict]:
+    """
+    Top-K рекомендаций для строк rows снимка: блоки score_block rows × tile
+    по всем столбцам вливаются в RunningTopK (память O(len(rows) · tile)).
+    """
+    tile = tile or settings.REBUILD_TILE_SIZE
+    n = len(snapshot)
+    best = RunningTopK(len(rows), k)
+    for start in range(0, n, tile):
+        columns = slice(start, min(start + tile, n))
+        block = score_block(snapshot.features, snapshot.geo_similarity, slice(rows.start, rows.stop), columns, weights)
+        # Себя не рекомендуем
+        own = np.arange(max(rows.start, columns.start), min(rows.stop, columns.stop))
+        block[own - rows.start, own - columns.start] = -np.inf
+        best.update(slice(None), block, np.arange(columns.start, columns.stop))
+    return top_k_rows(snapshot, best.indices, best.scores, rows, offset=rows.start)
+
+
+def top_k_rows(snapshot: FeatureSnapshot, indices: np.ndarray, scores: np.ndarray, rows: range, offset: int = 0) -> list[dict]:
+    """
+    Строки для записи из результата all_pairs_top_k или score_rows (пустые места пропускаются).
+    offset — номер строки снимка, соответствующей первой строке indices.
+    """
+    return [
+        {
+            "user_id": snapshot.user_id(row),
+            "recommended_user_id": snapshot.user_id(other),
+            "similarity": float(score),
+        }
+        for row in rows
+        for other, score in zip(indices[row - offset], scores[row - offset])
+        if other >= 0
+    ]
+
+
+async def write_recommendations(user_ids: list, rows: list[dict], session_maker=async_session_maker) -> dict:
+    """Заменяет сохранённые рекомендации пользователей user_ids (DELETE + COPY)."""
+    return await RecommendationDAO.replace_recommendations(user_ids, rows, session_maker)
@@ -1,11 +1,14 @@
 from datetime import date
+from typing import Literal
 from uuid import UUID
 from fastapi import APIRouter, HTTPException, Query,status
-from sqlalchemy import delete, select
+from sqlalchemy import select
 
+from app.config import settings
+from app.recommendation.cache import recommendation_cache
 from app.recommendation.dao import RecommendationDAO
 from app.recommendation.models import Recommendation
-from app.recommendation.schemas import SUser
+from app.recommendation.schemas import SSimilarityBatch, SSimilarityScore, SUser
 from app.database import async_session_maker
 from app.users.models import Users
 
@@ -87,24 +90,79 @@ async def calculate_similarity(
     result = await RecommendationDAO.calculate_similarity(user1, user2)
     return result
 
+@router.post("/calculate_similarity_batch", summary="Calculate similarity for a batch", response_model=list[SSimilarityScore])
+async def calculate_similarity_batch(batch: SSimilarityBatch):
+    """
+    Возвращает компоненты сходства и итоговое взвешенное сходство
+    для target с каждым из candidates (в том же порядке) или для каждой пары из pairs.
+    Пользователи задаются объектом SUser или id; весь пакет скорится за один проход.
+    """
+    if batch.target is not None:
+        pairs = [(batch.target, candidate) for candidate in batch.candidates]
+    else:
+        pairs = batch.pairs
+    if not pairs:
+        return []
+    return await RecommendationDAO.score_batch(pairs)
+
 @router.get("/recommendations/{user_id}")
-async def get_recommendations(user_id: UUID):
-    
-    async with async_session_maker() as session:
-        target_user = await session.get(Users, user_id)
-        if not target_user:
-            raise HTTPException(status_code=404, detail="User not found")
+async def get_recommendations(
+    user_id: UUID,
+    radius_km: float | None = Query(None, gt=0, description="Только пользователи в радиусе от города (км)"),
+    same_country: bool = Query(False, description="Добавить пользователей из той же страны"),
+    tail_sample: int = Query(0, ge=0, le=10000, description="Случайная выборка остальных пользователей"),
+    k: int = Query(10, ge=1, le=100, description="Количество рекомендаций"),
+    prefilter: int | None = Query(None, ge=0, description="Сколько кандидатов после дешёвого предфильтра получают полный скоринг"),
+    strategy: Literal["exact", "ann"] = Query("exact", description="exact — перебор кандидатов, ann — k-NN по ANN-индексу"),
+):
+    """
+    Возвращает топ-k рекомендаций, вычисленных на лету.
+    Если задан radius_km или same_country, скорятся только кандидаты
+    из пространственного индекса городов (плюс tail_sample случайных).
+    prefilter (по умолчанию RECOMMENDATION_PREFILTER) включает двухстадийный отбор.
+    strategy=ann берёт кандидатов из ANN-индекса и точно переранжирует их по весам.
+    Результат кэшируется в Redis на RECOMMENDATION_CACHE_TTL секунд,
+    одновременные запросы одного пользователя разделяют одно вычисление.
+    """
+    if prefilter is None:
+        prefilter = settings.RECOMMENDATION_PREFILTER
 
-        result = await session.execute(
-            select(Users).where(Users.id != user_id)
-        )
-        all_users = result.scalars().all()
+    async def compute():
+        async with async_session_maker() as session:
+            target_user = await session.get(Users, user_id)
+            if not target_user:
+                raise HTTPException(status_code=404, detail="User not found")
+
+            if strategy == "ann":
+                all_users = await RecommendationDAO.load_ann_candidates(
+                    session, target_user, max(settings.ANN_CANDIDATES, k)
+                )
+            else:
+                all_users = await RecommendationDAO.load_candidates(
+                    session, target_user, radius_km=radius_km, same_country=same_country, tail_sample=tail_sample
+                )
+
+            return await RecommendationDAO.recommend(target_user, all_users, k, prefilter=prefilter)
+
+    params = {
+        "radius_km": radius_km,
+        "same_country": same_country,
+        "tail_sample": tail_sample,
+        "k": k,
+        "prefilter": prefilter,
+        "strategy": strategy,
+    }
+    return await recommendation_cache.get_or_compute(user_id, params, compute)
 
-        recommendations = await RecommendationDAO.calculate_similarity_for_all(target_user, all_users, session)
-        recommendations.sort(key=lambda x: x["similarity"], reverse=True)
-        return recommendations[:10]
 @router.post("/update_recommendations/{user_id}")
-async def update_recommendations_for_user(user_id: UUID)-> dict:
+async def update_recommendations_for_user(
+    user_id: UUID,
+    k: int | None = Query(None, ge=1, description="Сколько рекомендаций сохранить (по умолчанию RECOMMENDATIONS_TOP_K)"),
+)-> dict:
+    """
+    Пересчитывает и сохраняет top-k рекомендаций пользователя.
+    Запись идёт одним COPY вместо ORM-объекта на каждого пользователя.
+    """
     async with async_session_maker() as session:
         target_user = await session.get(Users, user_id)
         if not target_user:
@@ -115,36 +173,48 @@ async def update_recommendations_for_user(user_id: UUID)-> dict:
         )
         all_users = result.scalars().all()
 
-        recommendations = await RecommendationDAO.calculate_similarity_for_all(target_user, all_users, session)
-
-        await session.execute(
-            delete(Recommendation).where(Recommendation.user_id == user_id)
-        )
-        session.add_all(
-            [Recommendation(user_id=user_id, recommended_user_id=r["user_id"], similarity=r["similarity"]) for r in recommendations]
-        )
-        await session.commit()
-        return {"status": "updated"}
+    recommendations = await RecommendationDAO.recommend(target_user, all_users, k or settings.RECOMMENDATIONS_TOP_K)
+    stats = await RecommendationDAO.replace_recommendations(
+        [user_id],
+        [
+            {"user_id": user_id, "recommended_user_id": r["user_id"], "similarity": r["similarity"]}
+            for r in recommendations
+        ],
+    )
+    return {"status": "updated", **stats}
 
 @router.get("/recommendations_from_database/{user_id}")
-async def get_top_recommendations(user_id: UUID):
+async def get_top_recommendations(
+    user_id: UUID,
+    k: int = Query(5, ge=1, le=100, description="Количество рекомендаций"),
+    with_profile: bool = Query(False, description="Добавить профиль рекомендованного пользователя"),
+):
+    """
+    Возвращает k сохранённых рекомендаций с наибольшим сходством.
+    Один запрос: диапазон индекса (user_id, similarity DESC) с LIMIT k,
+    при with_profile — с join профиля рекомендованного пользователя.
+    """
+    columns = [Recommendation.recommended_user_id, Recommendation.similarity]
+    if with_profile:
+        columns += [
+            Users.first_name, Users.surname, Users.gender, Users.birthday,
+            Users.city, Users.profession, Users.experience,
+        ]
+    query = (
+        select(*columns)
+        .where(Recommendation.user_id == user_id)
+        .order_by(Recommendation.similarity.desc())
+        .limit(k)
+    )
+    if with_profile:
+        query = query.join(Users, Users.id == Recommendation.recommended_user_id)
+
     try:
         async with async_session_maker() as session:
-            result = await session.execute(
-                select(Recommendation)
-                .where(Recommendation.user_id == user_id)
-                .order_by(Recommendation.similarity.desc())  
-            )
-            
-            recommendations = result.scalars().all()
-
-            if not recommendations:
-                raise HTTPException(status_code=404, detail="No recommendations found for this user")
-
-            # Ограничиваем результат первыми 5 рекомендациями
-            top_recommendations = recommendations[:5]
-
-            return top_recommendations
-
+            top_recommendations = (await session.execute(query)).mappings().all()
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error occurred: {e}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error occurred: {e}")
+
+    if not top_recommendations:
+        raise HTTPException(status_code=404, detail="No recommendations found for this user")
+    return top_recommendations
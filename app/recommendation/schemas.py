@@ -1,7 +1,7 @@
 from datetime import date
 from typing import Literal
 from uuid import UUID
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, model_validator
 
 
 class SUser(BaseModel):
@@ -18,3 +18,28 @@ class SUser(BaseModel):
 
     class Config:
         from_attributes = True
+
+
+class SSimilarityBatch(BaseModel):
+    """
+    Пакетный скоринг: либо target и candidates (один против многих),
+    либо список пар. Пользователь задаётся целиком (SUser) или по id.
+    """
+    target: SUser | UUID | None = None
+    candidates: list[SUser | UUID] = Field(default_factory=list, max_length=10_000)
+    pairs: list[tuple[SUser | UUID, SUser | UUID]] = Field(default_factory=list, max_length=10_000)
+
+    @model_validator(mode="after")
+    def check_mode(self):
+        if (self.target is None) == (not self.pairs):
+            raise ValueError("Передайте либо target и candidates, либо pairs")
+        return self
+
+
+class SSimilarityScore(BaseModel):
+    city: float
+    profession: float
+    age: float
+    experience: float
+    description: float
+    similarity: float
@@ -0,0 +1,305 @@
+from dataclasses import dataclass
+from datetime import date
+import heapq
+from typing import TYPE_CHECKING, Sequence
+
+import numpy as np
+from scipy import sparse
+
+if TYPE_CHECKING:
+    from app.recommendation.embeddings import QuantizedVectors
+
+
+@dataclass
+class UserFeatures:
+    """
+    Колоночное представление набора пользователей для пакетного скоринга.
+    Строка i во всех массивах соответствует user_ids[i].
+    """
+    user_ids: list
+    ages: np.ndarray
+    experience: np.ndarray
+    profession_codes: np.ndarray  # коды реестра профессий
+    profession_similarity: np.ndarray  # матрица сходства, индексированная кодами
+    city_codes: np.ndarray  # CityEntry.index в реестре городов
+    # Строки корпусного TF-IDF индекса или квантованные эмбеддинги описаний;
+    # None — дешёвые признаки без описаний
+    descriptions: "sparse.csr_matrix | QuantizedVectors | None"
+
+    def __len__(self) -> int:
+        return len(self.user_ids)
+
+
+def calculate_ages(birthdays: "Sequence[date] | np.ndarray", today: date | None = None) -> np.ndarray:
+    """Векторный аналог RecommendationDAO.calculate_age (даты или массив datetime64[D])."""
+    today = today or date.today()
+    birthdays = np.asarray(birthdays, dtype="datetime64[D]")
+    month_start = birthdays.astype("datetime64[M]")
+    years = birthdays.astype("datetime64[Y]").astype(np.int64) + 1970
+    months = month_start.astype(np.int64) % 12 + 1
+    days = (birthdays - month_start).astype(np.int64) + 1
+    not_yet = (months > today.month) | ((months == today.month) & (days > today.day))
+    return today.year - years - not_yet.astype(np.int64)
+
+
+def normalize_experiences(experience: np.ndarray, mean: float = 5.0, std_dev: float = 2.0) -> np.ndarray:
+    """Векторный аналог RecommendationDAO.normalize_experience (сигмоида от z-оценки)."""
+    z_score = (np.asarray(experience, dtype=np.float64) - mean) / std_dev
+    return 1 / (1 + np.exp(-z_score))
+
+
+def cosine_to_row(matrix: sparse.csr_matrix, row: int) -> np.ndarray:
+    """Сходство строки row со всеми строками L2-нормированной матрицы: одно произведение матрицы на вектор."""
+    return np.asarray((matrix @ matrix[row].T).todense()).ravel()
+
+
+# Описания — строки TF-IDF (sparse) или квантованные эмбеддинги (embeddings.QuantizedVectors)
+
+def description_to_row(descriptions, row: int) -> np.ndarray:
+    if sparse.issparse(descriptions):
+        return cosine_to_row(descriptions, row)
+    return descriptions.dot_row(row)
+
+
+def description_block(descriptions, rows: slice, columns: slice) -> np.ndarray:
+    if sparse.issparse(descriptions):
+        return (descriptions[rows] @ descriptions[columns].T).toarray()
+    return descriptions[rows].dot_block(descriptions[columns])
+
+
+def description_pairs(descriptions, left: np.ndarray, right: np.ndarray) -> np.ndarray:
+    if sparse.issparse(descriptions):
+        return np.asarray(descriptions[left].multiply(descriptions[right]).sum(axis=1)).ravel()
+    return descriptions.dot_pairs(left, right)
+
+
+def score_one_vs_all(features: UserFeatures, target: int, geo_row: np.ndarray, weights: dict) -> dict[str, np.ndarray]:
+    """
+    Вычисляет все взвешенные компоненты сходства пользователя target со всеми
+    строками features за один проход.
+    geo_row — сходство города target с каждым городом реестра (CityRegistry.geo_row).
+    Если описания не загружены, их компонент равен нулю: это дешёвый предварительный скор.
+    """
+    city = geo_row[features.city_codes]
+    profession = features.profession_similarity[features.profession_codes[target], features.profession_codes]
+    age = 1 - np.abs(features.ages[target] - features.ages) / 100
+    experience = 1 - np.abs(features.experience[target] - features.experience)
+    if features.descriptions is not None:
+        description = description_to_row(features.descriptions, target)
+    else:
+        description = np.zeros(len(features), dtype=np.float64)
+
+    total = (
+        weights["city"] * city +
+        weights["profession"] * profession +
+        weights["age"] * age +
+        weights["experience"] * experience +
+        weights["description"] * description
+    )
+    return {
+        "city": city,
+        "profession": profession,
+        "age": age,
+        "experience": experience,
+        "description": description,
+        "similarity": total,
+    }
+
+
+def score_pairs(
+    features: UserFeatures,
+    left: np.ndarray,
+    right: np.ndarray,
+    city: np.ndarray,
+    weights: dict,
+) -> dict[str, np.ndarray]:
+    """
+    Компоненты сходства для произвольных пар строк (left[i], right[i]).
+    city — геосходство городов этих пар (CityRegistry.geo_pairs).
+    """
+    profession = features.profession_similarity[features.profession_codes[left], features.profession_codes[right]]
+    age = 1 - np.abs(features.ages[left] - features.ages[right]) / 100
+    experience = 1 - np.abs(features.experience[left] - features.experience[right])
+    if features.descriptions is not None:
+        description = description_pairs(features.descriptions, left, right)
+    else:
+        description = np.zeros(len(left), dtype=np.float64)
+
+    total = (
+        weights["city"] * city +
+        weights["profession"] * profession +
+        weights["age"] * age +
+        weights["experience"] * experience +
+        weights["description"] * description
+    )
+    return {
+        "city": city,
+        "profession": profession,
+        "age": age,
+        "experience": experience,
+        "description": description,
+        "similarity": total,
+    }
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Индексы k лучших значений по убыванию за O(N + k log k):
+    argpartition отбирает k лучших, сортируются только они.
+    При равенстве выше оказывается меньший индекс, как при стабильной сортировке.
+    """
+    scores = np.asarray(scores)
+    if k <= 0 or not len(scores):
+        return np.empty(0, dtype=np.int64)
+    if k < len(scores):
+        # k-е по величине значение; на границе берём равные с меньшими индексами
+        threshold = scores[np.argpartition(-scores, k - 1)[k - 1]]
+        above = np.flatnonzero(scores > threshold)
+        equal = np.flatnonzero(scores == threshold)[:k - len(above)]
+        candidates = np.concatenate([above, equal])
+    else:
+        candidates = np.arange(len(scores))
+    return candidates[np.lexsort((candidates, -scores[candidates]))]
+
+
+class TopKAccumulator:
+    """
+    Ограниченная куча для потокового отбора top-K по чанкам.
+    Внутри каждого чанка сначала работает argpartition, в кучу попадает не более k элементов.
+    """
+
+    def __init__(self, k: int):
+        self.k = k
+        self._heap: list[tuple[float, int, object]] = []
+        self._seen = 0
+
+    def push(self, scores: np.ndarray, items: Sequence) -> None:
+        for i in top_k(scores, self.k):
+            # Отрицательный порядковый номер: при равенстве раньше пришедший элемент выше
+            entry = (float(scores[i]), -(self._seen + int(i)), items[i])
+            if len(self._heap) < self.k:
+                heapq.heappush(self._heap, entry)
+            elif entry[:2] > self._heap[0][:2]:
+                heapq.heapreplace(self._heap, entry)
+        self._seen += len(scores)
+
+    def result(self) -> list[tuple[float, object]]:
+        """Пары (score, item) по убыванию score."""
+        return [(score, item) for score, _, item in sorted(self._heap, key=lambda e: e[:2], reverse=True)]
+
+
+def score_block(
+    features: UserFeatures,
+    geo_similarity: np.ndarray,
+    rows: slice,
+    columns: slice,
+    weights: dict,
+) -> np.ndarray:
+    """
+    Плотный блок взвешенного сходства строк rows со строками columns.
+    geo_similarity — сходство городов, индексированное features.city_codes.
+    Формула та же, что в score_one_vs_all, поэтому блок (j, i) равен транспонированному (i, j).
+    """
+    codes = features.city_codes
+    total = weights["city"] * geo_similarity[codes[rows][:, None], codes[columns][None, :]]
+    professions = features.profession_codes
+    total += weights["profession"] * features.profession_similarity[professions[rows][:, None], professions[columns][None, :]]
+    total += weights["age"] * (1 - np.abs(features.ages[rows][:, None] - features.ages[columns][None, :]) / 100)
+    total += weights["experience"] * (1 - np.abs(features.experience[rows][:, None] - features.experience[columns][None, :]))
+    if features.descriptions is not None:
+        total += weights["description"] * description_block(features.descriptions, rows, columns)
+    return total
+
+
+class RunningTopK:
+    """
+    Текущие top-K для каждой строки: массивы (n, k) значений и индексов.
+    Незаполненные места имеют значение -inf и индекс -1.
+    """
+
+    def __init__(self, n: int, k: int):
+        self.k = k
+        self.scores = np.full((n, k), -np.inf, dtype=np.float64)
+        self.indices = np.full((n, k), -1, dtype=np.int64)
+
+    def update(self, rows: slice, block: np.ndarray, columns: np.ndarray) -> None:
+        """Вливает блок значений (len(rows), len(columns)) в top-K строк rows."""
+        if block.shape[1] > self.k:
+            # Сначала сужаем блок до k лучших в каждой строке
+            best = np.argpartition(-block, self.k - 1, axis=1)[:, :self.k]
+            block = np.take_along_axis(block, best, axis=1)
+            candidates = columns[best]
+        else:
+            candidates = np.broadcast_to(columns, block.shape)
+        candidates = np.where(np.isfinite(block), candidates, -1)
+
+        scores = np.hstack([self.scores[rows], block])
+        indices = np.hstack([self.indices[rows], candidates])
+        # По убыванию значения, при равенстве — меньший индекс выше
+        order = np.lexsort((indices, -scores), axis=1)[:, :self.k]
+        self.scores[rows] = np.take_along_axis(scores, order, axis=1)
+        self.indices[rows] = np.take_along_axis(indices, order, axis=1)
+
+
+def all_pairs_top_k(
+    features: UserFeatures,
+    geo_similarity: np.ndarray,
+    weights: dict,
+    k: int,
+    tile: int = 1024,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Top-K рекомендаций для всех пользователей сразу.
+    Сходство симметрично, поэтому обходится только верхний треугольник
+    плиткой tile×tile: каждый блок считается один раз и обновляет top-K
+    и своих строк, и своих столбцов. Пиковая память — O(tile² + N·k), а не O(N²).
+    Возвращает (indices, scores) формы (N, k); при N - 1 < k хвост заполнен -1 и -inf.
+    """
+    n = len(features)
+    result = RunningTopK(n, k)
+    for row_start in range(0, n, tile):
+        rows = slice(row_start, min(row_start + tile, n))
+        row_indices = np.arange(rows.start, rows.stop)
+        for column_start in range(row_start, n, tile):
+            columns = slice(column_start, min(column_start + tile, n))
+            column_indices = np.arange(columns.start, columns.stop)
+            block = score_block(features, geo_similarity, rows, columns, weights)
+            if column_start == row_start:
+                # Диагональная плитка симметрична сама по себе, себя не рекомендуем
+                np.fill_diagonal(block, -np.inf)
+                result.update(rows, block, column_indices)
+            else:
+                result.update(rows, block, column_indices)
+                result.update(columns, block.T, row_indices)
+    return result.indices, result.scores
+
+
+def new_rows_top_k(
+    features: UserFeatures,
+    geo_similarity: np.ndarray,
+    new: int,
+    weights: dict,
+    k: int,
+    tile: int = 1024,
+) -> tuple[RunningTopK, RunningTopK]:
+    """
+    Top-K при добавлении пользователей: строки 0..new-1 features — новые.
+    Каждый блок score_block (новые × tile столбцов) считается один раз и даёт
+    top-K новых строк по всем строкам, а транспонированный — лучших новых
+    для каждой строки (сходство симметрично). Память O(new · tile + N · k).
+    Возвращает (top-K новых строк, лучшие новые для всех N строк).
+    """
+    n = len(features)
+    own = RunningTopK(new, k)
+    incoming = RunningTopK(n, k)
+    row_indices = np.arange(new)
+    for start in range(0, n, tile):
+        columns = slice(start, min(start + tile, n))
+        column_indices = np.arange(columns.start, columns.stop)
+        block = score_block(features, geo_similarity, slice(0, new), columns, weights)
+        # Себя не рекомендуем
+        diagonal = np.arange(start, min(columns.stop, new))
+        block[diagonal, diagonal - start] = -np.inf
+        own.update(slice(None), block, column_indices)
+        incoming.update(columns, block.T, row_indices)
+    return own, incoming
@@ -1,21 +1,75 @@
+import asyncio
+
 from celery import Celery
 from celery.schedules import crontab
+from app.cache import init_redis_cache
+from app.city.registry import city_registry
+from app.profession.registry import profession_registry
 from app.config import settings
+from app.database import engine
 
 celery_worker = Celery(
     "tasks",
     broker=f"redis://{settings.REDIS_HOST}:{settings.REDIS_PORT}/0",
+    # Бекенд результатов нужен для chord (шардированное перестроение рекомендаций)
+    backend=f"redis://{settings.REDIS_HOST}:{settings.REDIS_PORT}/1",
     include=[
         "app.tasks.tasks",
         "app.tasks.scheduled",
+        "app.tasks.rebuild",
     ]
 )
+# Каждый воркер слушает и свою очередь <hostname>.dq: в неё отправляются шарды перестроения,
+# если снимок лежит на локальном диске воркера (REBUILD_SHARED_STORAGE=False)
+celery_worker.conf.worker_direct = True
+
+
+def run_async(coro):
+    """
+    Запуск асинхронной функции внутри celery таски.
+    Каждая таска получает свой event loop, поэтому кэш и реестры городов и профессий
+    инициализируются в нём, а пул соединений закрывается вместе с ним.
+    """
+    async def runner():
+        init_redis_cache()
+        if not len(city_registry):
+            await city_registry.load()
+        if not len(profession_registry):
+            await profession_registry.load()
+        try:
+            return await coro
+        finally:
+            await engine.dispose()
+
+    return asyncio.run(runner())
 
 
 celery_worker.conf.beat_schedule = {
-    "luboe-nazvanie": {
-        "task": "periodic_task",
+    "refresh-city-cache": {
+        "task": "refresh_city_cache",
+        "schedule": crontab(minute="15"),
+    },
+    "refit-description-index": {
+        "task": "refit_description_index",
+        "schedule": crontab(minute="00", hour="03"),
+    },
+    "rebuild-description-embeddings": {
+        "task": "rebuild_description_embeddings",
+        "schedule": crontab(minute="00", hour="02"),
+    },
+    # Снимок признаков собирается сразу после переобучения индекса описаний
+    "build-feature-store": {
+        "task": "build_feature_store",
+        "schedule": crontab(minute="15", hour="03"),
+    },
+    "rebuild-ann-index": {
+        "task": "rebuild_ann_index",
+        "schedule": crontab(minute="30", hour="03"),
+    },
+    # Ночное перестроение рекомендаций всех пользователей (после индексов)
+    "rebuild-all-recommendations": {
+        "task": "rebuild_all_recommendations",
         #"schedule": 5,  # секунды
-        "schedule": crontab(minute="00", hour="00"),
-    }
+        "schedule": crontab(minute="00", hour="04"),
+    },
 }
\ No newline at end of file
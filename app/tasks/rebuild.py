@@ -0,0 +1,112 @@
+import json
+import logging
+import os
+import time
+import uuid
+
+from celery import chord
+from celery.utils import worker_direct
+from redis import Redis
+
+from app.config import settings
+from app.recommendation import rebuild
+from app.tasks.celery_app import celery_worker, run_async
+
+
+logger = logging.getLogger(__name__)
+
+# Ключи Redis: прогресс шардов и итог последнего перестроения
+CHECKPOINT_KEY = "rebuild:{run_id}:shard:{shard}"
+LAST_REBUILD_KEY = "rebuild:last"
+CHECKPOINT_TTL = 2 * 24 * 3600
+
+
+def get_redis() -> Redis:
+    return Redis(host=settings.REDIS_HOST, port=settings.REDIS_PORT, decode_responses=True)
+
+
+def shard_bounds(total: int, shard: int, shards: int) -> tuple[int, int]:
+    """Диапазон строк снимка [start, end) для шарда."""
+    return total * shard // shards, total * (shard + 1) // shards
+
+
+@celery_worker.task(name="rebuild_all_recommendations", bind=True)
+def rebuild_all_recommendations(self, shards: int | None = None):
+    """
+    Ночное перестроение сохранённых рекомендаций всех пользователей.
+    Признаки всех пользователей публикуются одной версией memmap-хранилища признаков,
+    затем шарды раздаются воркерам, а финальный шаг фиксирует итоги.
+    Снимок должен быть виден воркеру шарда: при REBUILD_SHARED_STORAGE=False
+    шарды уходят в личную очередь воркера, собравшего снимок.
+    """
+    shards = shards or settings.REBUILD_SHARDS
+    run_id = time.strftime("%Y%m%d%H%M%S") + "-" + uuid.uuid4().hex[:8]
+    started = time.time()
+
+    snapshot = run_async(rebuild.build_snapshot())
+    rebuild.save_snapshot(snapshot, run_id)
+    logger.info(f"Перестроение {run_id}: {len(snapshot)} пользователей, {shards} шардов")
+
+    options = {} if settings.REBUILD_SHARED_STORAGE else {"queue": worker_direct(self.request.hostname)}
+    chord(
+        rebuild_recommendations_shard.s(run_id, shard, shards).set(**options) for shard in range(shards)
+    )(finalize_recommendations_rebuild.s(run_id, started).set(**options))
+    return run_id
+
+
+@celery_worker.task(
+    name="rebuild_recommendations_shard",
+    acks_late=True,
+    reject_on_worker_lost=True,
+    autoretry_for=(Exception,),
+    max_retries=3,
+    default_retry_delay=30,
+)
+def rebuild_recommendations_shard(run_id: str, shard: int, shards: int) -> dict:
+    """
+    Перестраивает рекомендации одного шарда пачками по REBUILD_BATCH_SIZE пользователей.
+    После каждой записанной пачки прогресс сохраняется в Redis, поэтому
+    повторно доставленная (после падения воркера) таска продолжает шард с места остановки.
+    """
+    started = time.time()
+    snapshot = rebuild.load_snapshot(run_id)
+    start, end = shard_bounds(len(snapshot), shard, shards)
+    redis = get_redis()
+    checkpoint_key = CHECKPOINT_KEY.format(run_id=run_id, shard=shard)
+    position = max(start, int(redis.get(checkpoint_key) or start))
+    if position > start:
+        logger.info(f"Шард {shard}: продолжаем с {position} из [{start}, {end})")
+
+    k = settings.RECOMMENDATIONS_TOP_K
+    batch_size = settings.REBUILD_BATCH_SIZE
+    while position < end:
+        batch = range(position, min(position + batch_size, end))
+        rows = rebuild.score_rows(snapshot, batch, k)
+        user_ids = [snapshot.user_id(row) for row in batch]
+        run_async(rebuild.write_recommendations(user_ids, rows))
+        position = batch.stop
+        redis.set(checkpoint_key, position, ex=CHECKPOINT_TTL)
+
+    return {"shard": shard, "users": end - start, "seconds": round(time.time() - started, 3)}
+
+
+@celery_worker.task(name="finalize_recommendations_rebuild")
+def finalize_recommendations_rebuild(shard_results: list[dict], run_id: str, started: float) -> dict:
+    """Фиксирует завершение перестроения: длительность и время по шардам."""
+    summary = {
+        "run_id": run_id,
+        "finished_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "duration_seconds": round(time.time() - started, 3),
+        "users": sum(result["users"] for result in shard_results),
+        "shards": sorted(shard_results, key=lambda result: result["shard"]),
+    }
+    redis = get_redis()
+    redis.set(LAST_REBUILD_KEY, json.dumps(summary))
+    for result in shard_results:
+        redis.delete(CHECKPOINT_KEY.format(run_id=run_id, shard=result["shard"]))
+    try:
+        os.unlink(rebuild.snapshot_path(run_id))
+    except FileNotFoundError:
+        pass
+    logger.info(f"Перестроение {run_id} завершено: {summary}")
+    return summary
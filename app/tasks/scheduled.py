@@ -1,12 +1,36 @@
-from app.tasks.celery_app import celery_worker
-import asyncio
+from app.tasks.celery_app import celery_worker, run_async
 
+from app.city.dao import CityDAO
+from app.config import settings
+from app.recommendation.dao import RecommendationDAO
 
-async def get_data():
-    await asyncio.sleep(5)
 
-@celery_worker.task(name="periodic_task")
-def periodic_task():
-    """Пример запуска асинхронной функции внутри celery таски"""
-    print(12345)
-    asyncio.run(get_data())
\ No newline at end of file
+@celery_worker.task(name="refit_description_index")
+def refit_description_index(if_missing: bool = False):
+    """Плановое переобучение корпусного TF-IDF индекса описаний (if_missing — только первичное построение)"""
+    run_async(RecommendationDAO.refit_description_index(if_missing=if_missing))
+
+
+@celery_worker.task(name="rebuild_description_embeddings")
+def rebuild_description_embeddings():
+    """Плановый пересчёт эмбеддингов описаний (только для DESCRIPTION_BACKEND=embedding)"""
+    if settings.DESCRIPTION_BACKEND == "embedding":
+        run_async(RecommendationDAO.rebuild_description_embeddings())
+
+
+@celery_worker.task(name="rebuild_ann_index")
+def rebuild_ann_index(if_missing: bool = False):
+    """Плановое перестроение ANN-индекса пользователей (if_missing — только первичное построение)"""
+    run_async(RecommendationDAO.rebuild_ann_index(if_missing=if_missing))
+
+
+@celery_worker.task(name="refresh_city_cache")
+def refresh_city_cache():
+    """Периодическое обновление кэша городов в Redis (только если версия изменилась)"""
+    run_async(CityDAO.initialize_cache())
+
+
+@celery_worker.task(name="build_feature_store")
+def build_feature_store():
+    """Сборка новой версии хранилища признаков (воркеры API подхватывают её сами)"""
+    run_async(RecommendationDAO.build_feature_store())
@@ -1,4 +1,53 @@
-from app.tasks.celery_app import celery_worker
+from app.recommendation.dao import PreparedDescriptionDAO, RecommendationDAO
+from app.tasks.celery_app import celery_worker, run_async
 
-# @celery.task
-# def 
\ No newline at end of file
+
+@celery_worker.task(name="prepare_descriptions")
+def prepare_descriptions(user_ids: list[str]):
+    """Подготовка (определение языка и перевод) описаний вне горячего пути скоринга"""
+    run_async(PreparedDescriptionDAO.prepare_for_users(user_ids))
+
+
+@celery_worker.task(
+    name="embed_descriptions",
+    autoretry_for=(TimeoutError,),
+    max_retries=5,
+    default_retry_delay=30,
+)
+def embed_descriptions(user_ids: list[str]):
+    """Расчёт эмбеддингов описаний новых и изменённых и удаление удалённых пользователей"""
+    run_async(RecommendationDAO.embed_users(user_ids))
+
+
+@celery_worker.task(
+    name="sync_description_index",
+    autoretry_for=(TimeoutError,),
+    max_retries=5,
+    default_retry_delay=30,
+)
+def sync_description_index(user_ids: list[str]):
+    """Добавление новых/изменённых и удаление удалённых пользователей в файле индекса описаний"""
+    run_async(RecommendationDAO.sync_description_index(user_ids))
+
+
+@celery_worker.task(
+    name="sync_ann_index",
+    autoretry_for=(TimeoutError,),
+    max_retries=5,
+    default_retry_delay=30,
+)
+def sync_ann_index(user_ids: list[str]):
+    """Добавление новых/изменённых и удаление удалённых пользователей в файле ANN-индекса"""
+    run_async(RecommendationDAO.sync_ann_index(user_ids))
+
+
+@celery_worker.task(name="backfill_recommendations")
+def backfill_recommendations(user_ids: list[str]):
+    """Дозаполнение до K списков рекомендаций, из которых были удалены пользователи"""
+    run_async(RecommendationDAO.backfill_recommendations(user_ids))
+
+
+@celery_worker.task(name="merge_new_users")
+def merge_new_users(user_ids: list[str]):
+    """Вливание новых пользователей (пачкой) в сохранённые top-K"""
+    run_async(RecommendationDAO.merge_new_users(user_ids))
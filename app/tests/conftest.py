@@ -6,6 +6,7 @@ from app.config import settings
 
 from app.users.models import Users
 from app.city.models import City
+from app.profession.models import Profession
 from app.recommendation.models import Recommendation 
 
 
@@ -0,0 +1,96 @@
+import time
+
+from app.cache import RELEASE_LOCK
+
+
+class FakeRedis:
+    """
+    In-memory замена redis.asyncio.Redis (decode_responses=True) для тестов:
+    только команды, которые использует приложение, с TTL по time.monotonic.
+    eval понимает единственный скрипт приложения — RELEASE_LOCK.
+    """
+
+    def __init__(self):
+        self.data: dict = {}
+        self.expires: dict[str, float] = {}
+        self.calls: list[tuple] = []
+
+    def _alive(self, key: str) -> bool:
+        if key in self.expires and self.expires[key] <= time.monotonic():
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+        return key in self.data
+
+    async def get(self, key: str):
+        self.calls.append(("get", key))
+        return self.data[key] if self._alive(key) else None
+
+    async def set(self, key: str, value, nx: bool = False, ex: int | None = None):
+        self.calls.append(("set", key))
+        if nx and self._alive(key):
+            return None
+        self.data[key] = str(value)
+        self.expires.pop(key, None)
+        if ex is not None:
+            self.expires[key] = time.monotonic() + ex
+        return True
+
+    async def delete(self, *keys: str) -> int:
+        self.calls.append(("delete", *keys))
+        deleted = sum(1 for key in keys if self._alive(key))
+        for key in keys:
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+        return deleted
+
+    async def hget(self, key: str, field: str):
+        self.calls.append(("hget", key))
+        return self.data[key].get(field) if self._alive(key) else None
+
+    async def hset(self, key: str, field: str, value) -> int:
+        self.calls.append(("hset", key))
+        if not self._alive(key):
+            self.data[key] = {}
+        self.data[key][field] = str(value)
+        return 1
+
+    async def expire(self, key: str, seconds: int) -> bool:
+        if not self._alive(key):
+            return False
+        self.expires[key] = time.monotonic() + seconds
+        return True
+
+    async def eval(self, script: str, numkeys: int, *keys_and_args):
+        assert script == RELEASE_LOCK, "FakeRedis.eval поддерживает только RELEASE_LOCK"
+        self.calls.append(("eval", keys_and_args[0]))
+        key, token = keys_and_args[0], keys_and_args[numkeys]
+        if self._alive(key) and self.data[key] == token:
+            return await self.delete(key)
+        return 0
+
+    def pipeline(self, transaction: bool = True) -> "FakePipeline":
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    """Буферизует команды и выполняет их подряд в execute()."""
+
+    def __init__(self, redis: FakeRedis):
+        self.redis = redis
+        self.commands = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.commands.clear()
+
+    def __getattr__(self, name):
+        def command(*args, **kwargs):
+            self.commands.append((name, args, kwargs))
+            return self
+        return command
+
+    async def execute(self) -> list:
+        commands, self.commands = self.commands, []
+        return [await getattr(self.redis, name)(*args, **kwargs) for name, args, kwargs in commands]
@@ -0,0 +1,54 @@
+import pytest
+from httpx import AsyncClient
+import pytest_asyncio
+from fastapi_cache import FastAPICache
+from fastapi_cache.backends.redis import RedisBackend
+from sqlalchemy import delete
+
+from app.city.models import City, CityAlias
+from app.database import async_session_maker
+from app.profession.models import Profession
+from app.recommendation.models import PreparedDescription, Recommendation
+from app.tasks.celery_app import celery_worker
+from app.tests.fake_redis import FakeRedis
+from app.users.models import Users
+
+
+@pytest_asyncio.fixture(autouse=True)
+async def clean_tables():
+    async with async_session_maker() as session:
+        await session.execute(delete(Recommendation))
+        await session.execute(delete(PreparedDescription))
+        await session.execute(delete(Users))
+        await session.execute(delete(Profession))
+        await session.execute(delete(CityAlias))
+        await session.execute(delete(City))
+        await session.commit()
+
+
+@pytest.fixture(autouse=True)
+def redis():
+    redis = FakeRedis()
+    FastAPICache.reset()
+    FastAPICache.init(RedisBackend(redis), prefix="test")
+    return redis
+
+
+@pytest.fixture(autouse=True)
+def sent_tasks(monkeypatch):
+    """Задачи, поставленные в очередь Celery (брокер в тестах не нужен)."""
+    sent = []
+    monkeypatch.setattr(
+        celery_worker, "send_task",
+        lambda name, args=None, kwargs=None, **options: sent.append((name, args, kwargs)),
+    )
+    return sent
+
+
+@pytest_asyncio.fixture
+async def ac():
+    """HTTP-клиент приложения без lifespan (Redis и пул скоринга не запускаются)."""
+    from app.main import app as fastapi_app
+
+    async with AsyncClient(app=fastapi_app, base_url="http://test") as client:
+        yield client
@@ -0,0 +1,40 @@
+from datetime import date
+import uuid
+
+from app.database import async_session_maker
+from app.recommendation.models import Recommendation
+from app.users.models import Users
+
+
+def make_user(**data) -> Users:
+    defaults = {
+        "id": uuid.uuid4(),
+        "first_name": "Иван",
+        "surname": "Иванов",
+        "date_created": date(2024, 1, 1),
+        "description": "python developer",
+        "birthday": date(1990, 1, 1),
+        "gender": "man",
+        "city": "Москва",
+        "profession": "developer",
+        "experience": 5.0,
+    }
+    return Users(**{**defaults, **data})
+
+
+async def add_users(*users: Users) -> list[Users]:
+    async with async_session_maker() as session:
+        session.add_all(users)
+        await session.commit()
+    return list(users)
+
+
+async def add_recommendations(lists: dict) -> None:
+    """lists: {user: [(recommended_user, similarity), ...]}"""
+    async with async_session_maker() as session:
+        session.add_all(
+            Recommendation(user_id=user.id, recommended_user_id=other.id, similarity=similarity)
+            for user, rows in lists.items()
+            for other, similarity in rows
+        )
+        await session.commit()
@@ -0,0 +1,73 @@
+import uuid
+
+import numpy as np
+import pytest
+
+from app.config import settings
+from app.database import async_session_maker
+from app.recommendation.ann import IVFIndex, UserAnnIndex
+from app.recommendation.dao import ANN_INDEX_LOCK_KEY, RecommendationDAO
+from app.recommendation.persistence import load_artifact, save_artifact
+from app.tests.integration_tests.factories import add_users, make_user
+from app.users.dao import UsersDAO
+
+
+@pytest.fixture
+def ann_path(monkeypatch, tmp_path) -> str:
+    """Файл ANN-индекса во временном каталоге; векторы пользователей — по стажу."""
+    path = str(tmp_path / "ann_index.joblib")
+    monkeypatch.setattr(settings, "ANN_INDEX_PATH", path)
+
+    async def encode_users(users, encoder):
+        return np.array([[user.experience, 0.0] for user in users], dtype=np.float32)
+
+    monkeypatch.setattr(RecommendationDAO, "encode_users", encode_users)
+    monkeypatch.setattr(RecommendationDAO, "_ann_rebuild_scheduled_at", -np.inf)
+    return path
+
+
+def save_index(path: str, ids: list) -> None:
+    ivf = IVFIndex(np.array([[0.0, 0.0], [10.0, 0.0]]))
+    ivf.add(ids, np.zeros((len(ids), 2), dtype=np.float32))
+    save_artifact(UserAnnIndex(None, ivf), path)
+
+
+@pytest.mark.asyncio
+async def test_sync_adds_existing_and_removes_deleted_users(ann_path, redis):
+    junior, senior = await add_users(make_user(experience=1.0), make_user(experience=9.0))
+    deleted = uuid.uuid4()
+    save_index(ann_path, [deleted, junior.id])
+
+    changed = await RecommendationDAO.sync_ann_index([junior.id, senior.id, deleted])
+
+    index = load_artifact(ann_path)
+    assert changed == 3
+    assert index.ivf.location == {str(junior.id): 0, str(senior.id): 1}
+    assert [user_id for user_id, _ in index.ivf.search(np.array([9.0, 0.0]), 1, 1)] == [str(senior.id)]
+    assert ANN_INDEX_LOCK_KEY not in redis.data
+
+
+@pytest.mark.asyncio
+async def test_missing_index_is_built_in_celery_not_in_request(ann_path, sent_tasks):
+    target, other = await add_users(make_user(), make_user())
+
+    assert await RecommendationDAO.sync_ann_index([target.id]) == 0
+    async with async_session_maker() as session:
+        candidates = await RecommendationDAO.load_ann_candidates(session, target, 10)
+
+    # Пока индекса нет, кандидаты — все пользователи; построение поставлено в очередь один раз
+    assert [user.id for user in candidates] == [other.id]
+    assert load_artifact(ann_path) is None
+    assert [(name, kwargs) for name, _, kwargs in sent_tasks] == [("rebuild_ann_index", {"if_missing": True})]
+
+
+@pytest.mark.asyncio
+async def test_user_writes_only_schedule_ann_sync(ann_path, sent_tasks):
+    save_index(ann_path, [])
+    [user] = await add_users(make_user())
+
+    RecommendationDAO.on_users_added([user.id])
+    await UsersDAO.delete(id=user.id)
+
+    assert len(load_artifact(ann_path)) == 0
+    assert [args for name, args, _ in sent_tasks if name == "sync_ann_index"] == [[[str(user.id)]]] * 2
@@ -0,0 +1,44 @@
+import pytest
+import pytest_asyncio
+
+from app.city import dao as city_dao
+from app.city.models import City, CityAlias
+from app.city.registry import CityRegistry
+from app.database import async_session_maker
+from app.recommendation import dao
+from app.recommendation.dao import RecommendationDAO
+from app.tests.integration_tests.factories import add_users, make_user
+
+
+@pytest_asyncio.fixture
+async def registry(monkeypatch):
+    async with async_session_maker() as session:
+        moscow = City(name="Москва", country="RU", latitude=55.7558, longitude=37.6173)
+        session.add_all([moscow, City(name="Paris", country="FR", latitude=48.8566, longitude=2.3522)])
+        await session.flush()
+        session.add(CityAlias(alias="moscow", city_id=moscow.id))
+        await session.commit()
+    registry = CityRegistry()
+    monkeypatch.setattr(dao, "city_registry", registry)
+    monkeypatch.setattr(city_dao, "city_registry", registry)
+    return registry
+
+
+@pytest.mark.asyncio
+async def test_local_candidates_include_alias_spellings(registry):
+    target, canonical, alias, padded, paris = await add_users(
+        make_user(city="Москва"),
+        make_user(city="Москва"),
+        make_user(city="Moscow"),
+        make_user(city="Москва "),
+        make_user(city="Paris"),
+    )
+    await registry.load()
+
+    async with async_session_maker() as session:
+        local = await RecommendationDAO.load_candidates(session, target, radius_km=50)
+        with_tail = await RecommendationDAO.load_candidates(session, target, radius_km=50, tail_sample=10)
+
+    assert {user.id for user in local} == {canonical.id, alias.id, padded.id}
+    # Алиасы не попадают в хвостовую выборку повторно
+    assert sorted(user.id for user in with_tail) == sorted([canonical.id, alias.id, padded.id, paris.id])
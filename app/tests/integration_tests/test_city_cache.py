@@ -0,0 +1,67 @@
+import json
+
+import pytest
+from sqlalchemy import update
+
+from app.city.dao import CITY_CACHE_LOCK_KEY, CITY_CACHE_VERSION_KEY, CityDAO
+from app.city.models import City, CityAlias
+from app.database import async_session_maker
+
+
+async def add_cities():
+    async with async_session_maker() as session:
+        moscow = City(name="Москва", country="RU", latitude=55.7558, longitude=37.6173)
+        paris = City(name="Paris", country="FR", latitude=48.8566, longitude=2.3522)
+        session.add_all([moscow, paris])
+        await session.flush()
+        session.add(CityAlias(alias="moscow", city_id=moscow.id))
+        await session.commit()
+
+
+@pytest.mark.asyncio
+async def test_initialize_cache_skips_current_version_and_releases_lock(redis):
+    await add_cities()
+
+    assert await CityDAO.initialize_cache() == 3
+    assert json.loads(redis.data["city:moscow"])["name"] == "Москва"
+    assert CITY_CACHE_LOCK_KEY not in redis.data
+    assert await CityDAO.initialize_cache() == 0
+
+
+@pytest.mark.asyncio
+async def test_initialize_cache_notices_rename_and_coordinate_edit(redis):
+    await add_cities()
+    await CityDAO.initialize_cache()
+    version = redis.data[CITY_CACHE_VERSION_KEY]
+
+    async with async_session_maker() as session:
+        await session.execute(update(City).where(City.name == "Paris").values(latitude=48.86))
+        await session.commit()
+
+    assert await CityDAO.cache_version() != version
+    assert await CityDAO.initialize_cache() == 3
+    assert json.loads(redis.data["city:paris"])["latitude"] == 48.86
+
+
+@pytest.mark.asyncio
+async def test_initialize_cache_leaves_foreign_lock(redis):
+    await add_cities()
+    await redis.set(CITY_CACHE_LOCK_KEY, "other-worker", nx=True, ex=300)
+
+    assert await CityDAO.initialize_cache() == 0
+    assert redis.data[CITY_CACHE_LOCK_KEY] == "other-worker"
+    assert CITY_CACHE_VERSION_KEY not in redis.data
+
+
+@pytest.mark.asyncio
+async def test_version_expires_no_later_than_entries(redis):
+    await add_cities()
+    await CityDAO.initialize_cache()
+
+    assert redis.expires[CITY_CACHE_VERSION_KEY] < redis.expires["city:moscow"]
+
+    # Версия истекла вместе с записями: следующий прогрев их восстанавливает
+    for key in list(redis.data):
+        redis.expires[key] = 0
+    assert await CityDAO.initialize_cache() == 3
+    assert "city:moscow" in redis.data
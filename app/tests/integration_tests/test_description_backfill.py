@@ -0,0 +1,63 @@
+import pytest
+from sqlalchemy import select
+
+from app.database import async_session_maker
+from app.recommendation import dao
+from app.recommendation.backfill_descriptions import backfill
+from app.recommendation.dao import LRUCache, PreparedDescriptionDAO, RecommendationDAO
+from app.recommendation.description_index import description_hash
+from app.recommendation.models import PreparedDescription
+from app.tests.integration_tests.factories import add_users, make_user
+
+
+@pytest.fixture(autouse=True)
+def translator(monkeypatch):
+    calls = []
+
+    async def translate_to_english(text):
+        calls.append(text)
+        return f"en: {text}"
+
+    monkeypatch.setattr(RecommendationDAO, "translate_to_english", translate_to_english)
+    monkeypatch.setattr(dao, "detect", lambda text: "en" if text.isascii() else "ru")
+    monkeypatch.setattr(PreparedDescriptionDAO, "cache", LRUCache(100))
+    return calls
+
+
+async def stored() -> dict:
+    async with async_session_maker() as session:
+        rows = (await session.execute(select(PreparedDescription))).scalars().all()
+    return {row.description_hash: row.prepared for row in rows}
+
+
+@pytest.mark.asyncio
+async def test_backfill_prepares_every_user_once(translator):
+    await add_users(
+        make_user(description="Опытный разработчик"),
+        make_user(description="python developer"),
+        make_user(description="Опытный разработчик"),
+    )
+
+    assert await backfill(batch_size=2) == 3
+
+    assert await stored() == {
+        description_hash("Опытный разработчик"): "en: Опытный разработчик",
+        description_hash("python developer"): "python developer",
+    }
+    assert translator == ["Опытный разработчик"]
+
+
+@pytest.mark.asyncio
+async def test_pairwise_description_similarity_uses_prepared_cache(ac, translator, monkeypatch):
+    async def get_description_index():
+        return None
+
+    monkeypatch.setattr(RecommendationDAO, "get_description_index", get_description_index)
+    params = {"description1": "Опытный разработчик", "description2": "python developer"}
+
+    for _ in range(2):
+        response = await ac.get("/recommendation/calculate_description_similarity", params=params)
+        assert response.json() == 0.0
+
+    assert translator == ["Опытный разработчик"]
+    assert description_hash("Опытный разработчик") in await stored()
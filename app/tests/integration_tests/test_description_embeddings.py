@@ -0,0 +1,58 @@
+import uuid
+
+import numpy as np
+import pytest
+
+from app.config import settings
+from app.recommendation import dao
+from app.recommendation.dao import DESCRIPTION_INDEX_LOCK_KEY, RecommendationDAO
+from app.recommendation.description_index import description_hash
+from app.recommendation.embeddings import DescriptionEmbeddings
+from app.recommendation.persistence import load_artifact, save_artifact
+from app.tests.integration_tests.factories import add_users, make_user
+from app.users.dao import UsersDAO
+
+
+@pytest.fixture
+def embeddings_path(monkeypatch, tmp_path) -> str:
+    """Хранилище эмбеддингов во временном каталоге; модель не загружается, тексты кодируются длиной."""
+    path = str(tmp_path / "description_embeddings.joblib")
+    monkeypatch.setattr(settings, "DESCRIPTION_EMBEDDINGS_PATH", path)
+    monkeypatch.setattr(settings, "DESCRIPTION_BACKEND", "embedding")
+
+    async def prepare_descriptions(descriptions, session_maker=None):
+        return descriptions
+
+    def encode_texts(texts):
+        vectors = np.array([[len(text), 1.0] for text in texts], dtype=np.float32)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    monkeypatch.setattr(RecommendationDAO, "prepare_descriptions", prepare_descriptions)
+    monkeypatch.setattr(dao, "encode_texts", encode_texts)
+    return path
+
+
+@pytest.mark.asyncio
+async def test_embed_users_upserts_existing_and_removes_deleted(embeddings_path, redis):
+    [user] = await add_users(make_user(description="python developer"))
+    deleted = uuid.uuid4()
+    store = DescriptionEmbeddings(2)
+    store.upsert([deleted], [description_hash("old")], np.array([[0.0, 1.0]], dtype=np.float32))
+    save_artifact(store, embeddings_path)
+
+    assert await RecommendationDAO.embed_users([str(user.id), str(deleted)]) == 2
+
+    store = load_artifact(embeddings_path)
+    assert store.hash_of(user.id) == description_hash("python developer")
+    assert store.hash_of(deleted) is None
+    assert DESCRIPTION_INDEX_LOCK_KEY not in redis.data
+
+
+@pytest.mark.asyncio
+async def test_delete_schedules_embedding_removal(embeddings_path, sent_tasks):
+    [user] = await add_users(make_user())
+
+    await UsersDAO.delete(id=user.id)
+
+    assert ("embed_descriptions", [[str(user.id)]], None) in sent_tasks
+
@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+from sqlalchemy import func, select
+
+from app.database import async_session_maker
+from app.profession.models import Profession
+from app.profession.registry import ProfessionRegistry
+from app.recommendation import dao
+from app.recommendation.dao import RecommendationDAO
+from app.recommendation.schemas import SUser
+
+
+@pytest.fixture
+def registry(monkeypatch, tmp_path):
+    registry = ProfessionRegistry(path=str(tmp_path / "missing.csv"))
+    monkeypatch.setattr(dao, "profession_registry", registry)
+    return registry
+
+
+async def stored_professions() -> int:
+    async with async_session_maker() as session:
+        return await session.scalar(select(func.count()).select_from(Profession))
+
+
+def body_user(profession: str) -> SUser:
+    return SUser(
+        first_name="Анна", surname="Иванова", date_created="2024-01-01", description="",
+        birthday="1990-01-01", gender="woman", city="Москва", profession=profession, experience=3,
+    )
+
+
+@pytest.mark.asyncio
+async def test_read_paths_do_not_register_professions(ac, registry):
+    params = {"profession1": "Junk 1", "profession2": "Junk 1"}
+    assert (await ac.get("/recommendation/calculate_profession_similarity", params=params)).json() == 1.0
+    params = {"profession1": "Junk 1", "profession2": "Junk 2"}
+    assert (await ac.get("/recommendation/calculate_profession_similarity", params=params)).json() == 0.0
+
+    codes = await RecommendationDAO.profession_codes([body_user("Junk 3")])
+
+    assert codes.tolist() == [-1]
+    assert await stored_professions() == 0
+    assert len(registry) == 0
+
+
+@pytest.mark.asyncio
+async def test_unknown_professions_match_only_themselves(registry):
+    await registry.resolve(["Software Engineer", "Data Scientist"])
+    users = [body_user(name) for name in ["Software Engineer", "Junk", "Data Scientist", "Junk", "Other"]]
+
+    codes, matrix = await RecommendationDAO.profession_similarity(users, await RecommendationDAO.profession_codes(users))
+
+    similarity = matrix[codes[:, None], codes[None, :]]
+    assert similarity[0, 2] == pytest.approx(0.8)
+    assert similarity[1, 3] == 1.0
+    assert similarity[1, 4] == similarity[0, 1] == 0.0
+    assert matrix.shape == (4, 4)
+    assert np.allclose(similarity, similarity.T)
+    assert await stored_professions() == 2
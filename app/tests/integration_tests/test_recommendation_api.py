@@ -0,0 +1,36 @@
+import pytest
+
+from app.tests.integration_tests.factories import add_recommendations, add_users, make_user
+
+
+@pytest.mark.asyncio
+async def test_top_recommendations_from_database_are_ordered_and_limited(ac):
+    target, first, second, third = await add_users(
+        make_user(), make_user(first_name="Анна"), make_user(), make_user()
+    )
+    await add_recommendations({target: [(second, 0.5), (first, 0.9), (third, 0.1)], first: [(target, 0.9)]})
+
+    response = await ac.get(f"/recommendation/recommendations_from_database/{target.id}", params={"k": 2})
+
+    assert response.status_code == 200
+    assert response.json() == [
+        {"recommended_user_id": str(first.id), "similarity": 0.9},
+        {"recommended_user_id": str(second.id), "similarity": 0.5},
+    ]
+
+    response = await ac.get(
+        f"/recommendation/recommendations_from_database/{target.id}", params={"k": 1, "with_profile": True}
+    )
+
+    [row] = response.json()
+    assert row["recommended_user_id"] == str(first.id)
+    assert row["first_name"] == "Анна" and row["city"] == first.city
+
+
+@pytest.mark.asyncio
+async def test_top_recommendations_from_database_not_found(ac):
+    [user] = await add_users(make_user())
+
+    response = await ac.get(f"/recommendation/recommendations_from_database/{user.id}")
+
+    assert response.status_code == 404
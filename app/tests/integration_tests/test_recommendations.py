@@ -0,0 +1,158 @@
+import numpy as np
+import pytest
+from sqlalchemy import select
+
+from app.city.registry import city_registry
+from app.database import async_session_maker
+from app.recommendation import dao
+from app.recommendation.dao import RecommendationDAO
+from app.recommendation.models import Recommendation
+from app.recommendation.scoring import RunningTopK, UserFeatures
+from app.tests.integration_tests.factories import add_recommendations, add_users, make_user
+from app.users.dao import UsersDAO
+
+
+async def stored_lists() -> dict:
+    async with async_session_maker() as session:
+        rows = (await session.execute(select(Recommendation))).scalars().all()
+    lists = {}
+    for row in rows:
+        lists.setdefault(row.user_id, {})[row.recommended_user_id] = pytest.approx(row.similarity)
+    return lists
+
+
+def fixed_scores(monkeypatch, scores: dict):
+    """Сходство пар пользователей задаётся таблицей scores {frozenset(пары id): сходство}."""
+    async def build_features(users, with_descriptions: bool = True):
+        return UserFeatures(
+            user_ids=[user.id for user in users],
+            ages=np.zeros(len(users)),
+            experience=np.zeros(len(users)),
+            profession_codes=np.zeros(len(users), dtype=np.int64),
+            profession_similarity=np.zeros((1, 1)),
+            city_codes=np.zeros(len(users), dtype=np.int64),
+            descriptions=None,
+        )
+
+    def new_rows_top_k(features, geo_similarity, new, weights, k, tile):
+        ids = features.user_ids
+        block = np.array([
+            [scores.get(frozenset((ids[row], other)), -np.inf) for other in ids] for row in range(new)
+        ])
+        own, incoming = RunningTopK(new, k), RunningTopK(len(ids), k)
+        own.update(slice(None), block, np.arange(len(ids)))
+        incoming.update(slice(None), block.T, np.arange(new))
+        return own, incoming
+
+    monkeypatch.setattr(RecommendationDAO, "build_features", build_features)
+    monkeypatch.setattr(city_registry, "geo_matrix", lambda codes: np.ones((len(codes), len(codes))))
+    monkeypatch.setattr(dao, "new_rows_top_k", new_rows_top_k)
+
+
+@pytest.mark.asyncio
+async def test_merge_new_users_updates_only_existing_lists_they_beat(monkeypatch):
+    full, short, missing, worse = await add_users(make_user(), make_user(), make_user(), make_user())
+    await add_recommendations({
+        full: [(short, 0.9), (missing, 0.5)],
+        short: [(full, 0.9)],
+        worse: [(full, 0.8), (short, 0.6)],
+    })
+    new, newer = await add_users(make_user(), make_user())
+    fixed_scores(monkeypatch, {
+        frozenset((new.id, full.id)): 0.7, frozenset((new.id, short.id)): 0.1,
+        frozenset((new.id, missing.id)): 0.8, frozenset((new.id, worse.id)): 0.2,
+        frozenset((newer.id, full.id)): 0.6, frozenset((newer.id, new.id)): 0.75,
+    })
+
+    updated = await RecommendationDAO.merge_new_users([new.id, newer.id], k=2)
+
+    lists = await stored_lists()
+    assert updated == 2
+    # Обе новые строки прошли в список full, вытеснена только его прежняя минимальная
+    assert lists[full.id] == {short.id: 0.9, new.id: 0.7}
+    assert lists[short.id] == {full.id: 0.9, new.id: 0.1}
+    assert lists[worse.id] == {full.id: 0.8, short.id: 0.6}
+    assert missing.id not in lists
+    assert lists[new.id] == {missing.id: 0.8, newer.id: 0.75}
+    assert lists[newer.id] == {new.id: 0.75, full.id: 0.6}
+
+
+@pytest.mark.asyncio
+async def test_trim_lists_keeps_k_best_and_drops_repeated_pairs():
+    owner, first, second = await add_users(make_user(), make_user(), make_user())
+    await add_recommendations({owner: [(first, 0.9), (first, 0.9), (second, 0.5)]})
+
+    async with async_session_maker() as session:
+        await RecommendationDAO.trim_lists(session, [owner.id], k=2)
+        await session.commit()
+
+    async with async_session_maker() as session:
+        rows = (await session.execute(select(Recommendation.recommended_user_id))).scalars().all()
+    assert sorted(rows) == sorted([first.id, second.id])
+
+
+@pytest.mark.asyncio
+async def test_delete_detaches_user_and_defers_backfill(sent_tasks):
+    kept, deleted, other = await add_users(make_user(), make_user(), make_user())
+    await add_recommendations({kept: [(deleted, 0.9), (other, 0.5)], deleted: [(kept, 0.9)]})
+
+    assert await UsersDAO.delete(id=deleted.id) == 1
+
+    assert await stored_lists() == {kept.id: {other.id: 0.5}}
+    assert ("backfill_recommendations", [[str(kept.id)]], None) in sent_tasks
+
+
+@pytest.mark.asyncio
+async def test_backfill_recommendations_fills_lists_up_to_k(monkeypatch):
+    target, stored, first, second = await add_users(make_user(), make_user(), make_user(), make_user())
+    await add_recommendations({target: [(stored, 0.9)]})
+
+    async def recommend(target_user, candidates, k):
+        assert {candidate.id for candidate in candidates} == {first.id, second.id}
+        return [{"user_id": first.id, "similarity": 0.4}][:k]
+    monkeypatch.setattr(RecommendationDAO, "recommend", recommend)
+
+    await RecommendationDAO.backfill_recommendations([str(target.id)], k=2)
+
+    assert (await stored_lists())[target.id] == {stored.id: 0.9, first.id: 0.4}
+
+
+@pytest.mark.asyncio
+async def test_copy_rows_writes_in_session_transaction():
+    first, second = await add_users(make_user(), make_user())
+
+    async with async_session_maker() as session:
+        written = await RecommendationDAO.copy_rows(
+            session, [{"user_id": first.id, "recommended_user_id": second.id, "similarity": 0.25}]
+        )
+        await session.rollback()
+    assert written == 1
+    assert await stored_lists() == {}
+
+    async with async_session_maker() as session:
+        await RecommendationDAO.copy_rows(
+            session, [{"user_id": first.id, "recommended_user_id": second.id, "similarity": np.float32(0.25)}]
+        )
+        await session.commit()
+    assert await stored_lists() == {first.id: {second.id: 0.25}}
+
+
+@pytest.mark.asyncio
+async def test_replace_recommendations_replaces_only_given_users():
+    first, second, third = await add_users(make_user(), make_user(), make_user())
+    await add_recommendations({first: [(second, 0.9), (third, 0.1)], second: [(first, 0.9)]})
+
+    stats = await RecommendationDAO.replace_recommendations(
+        [first.id, third.id],
+        [
+            {"user_id": first.id, "recommended_user_id": third.id, "similarity": 0.7},
+            {"user_id": third.id, "recommended_user_id": first.id, "similarity": 0.7},
+        ],
+    )
+
+    assert stats["rows"] == 2
+    assert await stored_lists() == {
+        first.id: {third.id: 0.7},
+        second.id: {first.id: 0.9},
+        third.id: {first.id: 0.7},
+    }
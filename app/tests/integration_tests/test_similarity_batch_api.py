@@ -0,0 +1,159 @@
+from datetime import date
+import uuid
+
+import numpy as np
+import pytest
+
+from app.city.registry import city_registry
+from app.config import settings
+from app.recommendation import dao
+from app.recommendation.dao import RecommendationDAO
+from app.recommendation.description_index import DescriptionIndex, description_hash, save_description_index
+from app.recommendation.embeddings import DescriptionEmbeddings
+from app.recommendation.persistence import save_artifact
+from app.recommendation.pool import score_pairs_job, scoring_pool
+from app.recommendation.scoring import UserFeatures
+from app.tests.integration_tests.factories import add_users, make_user
+
+
+def inline_user(**data) -> dict:
+    user = {
+        "first_name": "Пётр",
+        "surname": "Петров",
+        "date_created": "2024-01-01",
+        "description": "python developer",
+        "birthday": "1990-01-01",
+        "gender": "man",
+        "city": "Москва",
+        "profession": "developer",
+        "experience": 5,
+    }
+    return {**user, **data}
+
+
+@pytest.fixture
+def built(monkeypatch) -> list:
+    """
+    Признаки без реестров и модели описаний: город и профессия совпадают
+    или нет, описания не учитываются. Возвращает списки пользователей,
+    для которых строились признаки.
+    """
+    calls = []
+
+    async def build_features(users, with_descriptions: bool = True):
+        calls.append(users)
+        cities = sorted({user.city for user in users})
+        professions = sorted({user.profession for user in users})
+        return UserFeatures(
+            user_ids=[getattr(user, "id", None) for user in users],
+            ages=np.array([2024 - user.birthday.year for user in users]),
+            experience=np.array([user.experience / 10 for user in users]),
+            profession_codes=np.array([professions.index(user.profession) for user in users]),
+            profession_similarity=np.eye(len(professions)),
+            city_codes=np.array([cities.index(user.city) for user in users]),
+            descriptions=None,
+        )
+
+    monkeypatch.setattr(RecommendationDAO, "build_features", build_features)
+    monkeypatch.setattr(city_registry, "geo_pairs", lambda first, second: (first == second).astype(np.float64))
+    return calls
+
+
+@pytest.mark.asyncio
+async def test_target_against_candidates_by_id_and_inline(ac, built):
+    same, other = await add_users(make_user(), make_user(city="Paris", profession="analyst"))
+
+    response = await ac.post("/recommendation/calculate_similarity_batch", json={
+        "target": str(same.id),
+        "candidates": [str(other.id), inline_user(), str(other.id)],
+    })
+
+    assert response.status_code == 200
+    first, second, third = response.json()
+    assert first == third
+    assert (first["city"], first["profession"]) == (0, 0)
+    assert second == pytest.approx({
+        "city": 1, "profession": 1, "age": 1, "experience": 1, "description": 0,
+        "similarity": 1 - dao.weights["description"],
+    })
+    # Повторяющиеся пользователи загружаются и векторизуются один раз
+    assert len(built[0]) == 3
+
+
+@pytest.mark.asyncio
+async def test_pairs_mode_keeps_order(ac, built):
+    first, second = await add_users(make_user(birthday=date(1980, 1, 1)), make_user())
+
+    response = await ac.post("/recommendation/calculate_similarity_batch", json={
+        "pairs": [[str(first.id), str(second.id)], [str(second.id), str(second.id)]],
+    })
+
+    ages = [row["age"] for row in response.json()]
+    assert ages == pytest.approx([0.9, 1.0])
+
+
+@pytest.mark.asyncio
+async def test_unknown_ids_and_ambiguous_batches_are_rejected(ac, built):
+    [user] = await add_users(make_user())
+    missing = uuid.uuid4()
+
+    response = await ac.post("/recommendation/calculate_similarity_batch", json={
+        "target": str(user.id), "candidates": [str(missing)],
+    })
+    assert response.status_code == 404
+    assert str(missing) in response.json()["detail"]
+
+    response = await ac.post("/recommendation/calculate_similarity_batch", json={
+        "target": str(user.id), "pairs": [[str(user.id), str(user.id)]],
+    })
+    assert response.status_code == 422
+    assert built == []
+
+
+@pytest.mark.asyncio
+async def test_descriptions_are_scored_in_the_pool(ac, built, monkeypatch, tmp_path):
+    python, manager = await add_users(make_user(description="python developer"), make_user(description="sales manager"))
+    index = DescriptionIndex.fit([python.id, manager.id], ["", ""], ["python developer", "sales manager"])
+    save_description_index(index, str(tmp_path / "index.joblib"))
+    monkeypatch.setattr(settings, "DESCRIPTION_INDEX_PATH", str(tmp_path / "index.joblib"))
+
+    async def prepare_descriptions(descriptions):
+        return descriptions
+
+    functions = []
+    original_run = scoring_pool.run
+
+    async def run(job, function=None):
+        functions.append(function)
+        return await original_run(job, function)
+
+    monkeypatch.setattr(RecommendationDAO, "prepare_descriptions", prepare_descriptions)
+    monkeypatch.setattr(scoring_pool, "run", run)
+
+    response = await ac.post("/recommendation/calculate_similarity_batch", json={
+        "target": str(python.id),
+        "candidates": [inline_user(description="python developer"), str(manager.id)],
+    })
+
+    inline, stored = [row["description"] for row in response.json()]
+    assert inline == pytest.approx(1.0)
+    assert stored == pytest.approx(0.0)
+    assert functions == [score_pairs_job]
+
+
+@pytest.mark.asyncio
+async def test_inline_users_are_rejected_with_embedding_backend(ac, built, monkeypatch, tmp_path):
+    [user] = await add_users(make_user())
+    store = DescriptionEmbeddings(2)
+    store.upsert([user.id], [description_hash(user.description)], np.array([[1.0, 0.0]], dtype=np.float32))
+    save_artifact(store, str(tmp_path / "embeddings.joblib"))
+    monkeypatch.setattr(settings, "DESCRIPTION_EMBEDDINGS_PATH", str(tmp_path / "embeddings.joblib"))
+    monkeypatch.setattr(settings, "DESCRIPTION_BACKEND", "embedding")
+
+    response = await ac.post("/recommendation/calculate_similarity_batch", json={
+        "target": str(user.id), "candidates": [inline_user()],
+    })
+
+    # Модель эмбеддингов не загружается в воркер API
+    assert response.status_code == 422
+    assert "without id" in response.json()["detail"]
@@ -0,0 +1,94 @@
+import json
+
+import numpy as np
+import pytest
+from sqlalchemy import select
+
+from app.database import async_session_maker
+from app.profession.registry import profession_registry
+from app.users import importer
+from app.users.models import Users
+
+
+def user_line(**data) -> str:
+    user = {
+        "first_name": "Иван",
+        "surname": "Иванов",
+        "date_created": "2024-01-01",
+        "description": "python developer",
+        "birthday": "1990-01-01",
+        "gender": "man",
+        "city": "Москва",
+        "profession": "developer",
+        "experience": 5,
+    }
+    return json.dumps({**user, **data}, ensure_ascii=False) + "\n"
+
+
+@pytest.fixture(autouse=True)
+def known_cities_and_professions(monkeypatch):
+    """Города и профессии считаются известными: проверяется сам импорт, а не реестры."""
+    async def resolve_batch_cities(users):
+        return {}
+
+    async def resolve(names):
+        return np.array([None] * len(names), dtype=object)
+
+    monkeypatch.setattr(importer, "resolve_batch_cities", resolve_batch_cities)
+    monkeypatch.setattr(profession_registry, "resolve", resolve)
+
+
+async def imported_names() -> list[str]:
+    async with async_session_maker() as session:
+        return sorted((await session.execute(select(Users.first_name))).scalars().all())
+
+
+@pytest.mark.asyncio
+async def test_import_schedules_hooks_and_exposes_status(ac, sent_tasks, monkeypatch):
+    monkeypatch.setattr(importer.settings, "USER_IMPORT_CHUNK_SIZE", 2)
+    body = user_line(first_name="Анна") + "not json\n" + user_line(first_name="Пётр", gender="other")
+
+    response = await ac.post("/users/import", params={"import_id": "batch-1"}, content=body.encode())
+
+    report = response.json()
+    assert response.status_code == 200
+    assert report["import_id"] == "batch-1"
+    assert (report["processed"], report["imported"], report["failed"], report["chunks"]) == (3, 1, 2, 2)
+    assert [error["row"] for error in report["errors"]] == [2, 3]
+    assert report["chunk_errors"] == []
+    assert await imported_names() == ["Анна"]
+    [merged] = [args for name, args, _ in sent_tasks if name == "merge_new_users"]
+    assert len(merged[0]) == 1
+
+    status = (await ac.get("/users/import/batch-1")).json()
+    assert status["state"] == "done"
+    assert status["imported"] == 1
+    assert (await ac.get("/users/import/unknown")).status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_failed_chunk_is_reported_and_import_continues(monkeypatch):
+    original = importer.import_chunk
+    calls = []
+
+    async def import_chunk(records, report):
+        calls.append(records)
+        if len(calls) == 1:
+            raise RuntimeError("database is unavailable")
+        await original(records, report)
+
+    async def body():
+        yield (user_line(first_name="Анна") + user_line(first_name="Борис") + user_line(first_name="Вера")).encode()
+
+    progress = []
+
+    async def on_progress(report):
+        progress.append((report["processed"], report["imported"]))
+
+    monkeypatch.setattr(importer, "import_chunk", import_chunk)
+    report = await importer.import_users(body(), "ndjson", chunk_size=2, on_progress=on_progress)
+
+    assert (report["processed"], report["imported"], report["failed"]) == (3, 1, 2)
+    assert report["chunk_errors"] == [{"rows": [1, 2], "error": "database is unavailable"}]
+    assert progress == [(2, 0), (3, 1)]
+    assert await imported_names() == ["Вера"]
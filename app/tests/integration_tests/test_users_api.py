@@ -0,0 +1,84 @@
+import base64
+from datetime import date
+import json
+import uuid
+
+import pytest
+from fastapi import HTTPException
+
+from app.tests.integration_tests.factories import add_users, make_user
+from app.users.dao import UsersDAO
+
+
+def test_cursor_round_trip():
+    user = make_user(date_created=date(2024, 3, 5))
+
+    cursor = UsersDAO.encode_cursor(user, ("date_created", "id"))
+
+    assert UsersDAO.decode_cursor(cursor, ("date_created", "id")) == [date(2024, 3, 5), user.id]
+
+
+@pytest.mark.parametrize("raw, keys", [
+    (b"not json", ("id",)),
+    (b'["not-a-uuid"]', ("id",)),
+    (b'["2024-01-01"]', ("date_created", "id")),
+])
+def test_invalid_cursor_is_bad_request(raw, keys):
+    with pytest.raises(HTTPException) as error:
+        UsersDAO.decode_cursor(base64.urlsafe_b64encode(raw).decode(), keys)
+    assert error.value.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_find_page_breaks_date_ties_by_id():
+    ids = sorted(uuid.uuid4() for _ in range(5))
+    users = [make_user(id=ids[i], date_created=date(2024, 1, 1 if i < 3 else 2)) for i in (4, 2, 0, 3, 1)]
+    await add_users(*users)
+
+    pages, cursor = [], None
+    while True:
+        rows, cursor = await UsersDAO.find_page(cursor=cursor, limit=2, keys=("date_created", "id"))
+        pages.append([row.id for row in rows])
+        if cursor is None:
+            break
+
+    assert pages == [ids[0:2], ids[2:4], ids[4:5]]
+
+
+@pytest.mark.asyncio
+async def test_page_endpoint_follows_next_cursor_with_filters(ac):
+    women = await add_users(*(make_user(gender="woman") for _ in range(3)))
+    await add_users(make_user(gender="man"))
+
+    first = (await ac.get("/users/page", params={"limit": 2, "gender": "woman"})).json()
+    second = (await ac.get("/users/page", params={"limit": 2, "gender": "woman", "cursor": first["next_cursor"]})).json()
+
+    found = [item["id"] for item in first["items"] + second["items"]]
+    assert found == sorted(str(user.id) for user in women)
+    assert second["next_cursor"] is None
+    assert (await ac.get("/users/page", params={"cursor": "garbage"})).status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_export_streams_filtered_users_as_ndjson(ac, monkeypatch):
+    monkeypatch.setattr("app.users.router.settings.USER_EXPORT_CHUNK_SIZE", 2)
+    moscow = await add_users(*(make_user(city="Москва") for _ in range(3)))
+    await add_users(make_user(city="Paris"))
+
+    response = await ac.get("/users/export", params={"city": "Москва"})
+
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert sorted(row["id"] for row in rows) == sorted(str(user.id) for user in moscow)
+    assert rows[0]["birthday"] == "1990-01-01"
+
+
+@pytest.mark.asyncio
+async def test_all_uses_shared_filters(ac):
+    anna = (await add_users(make_user(first_name="Анна", profession="analyst")))[0]
+    await add_users(make_user(first_name="Анна"), make_user(first_name="Пётр", profession="analyst"))
+
+    response = await ac.get("/users/all", params={"first_name": "Анна", "profession": "analyst"})
+
+    assert [user["id"] for user in response.json()] == [str(anna.id)]
+    assert (await ac.get("/users/all", params={"city": "Нигде"})).status_code == 404
@@ -0,0 +1,64 @@
+import numpy as np
+from scipy import sparse
+
+from app.recommendation.ann import IVFIndex, UserEncoder
+
+
+def test_ivf_search_finds_exact_neighbours_with_all_probes():
+    vectors = np.random.default_rng(0).random((300, 8)).astype(np.float32)
+    ivf = IVFIndex.train(vectors, n_lists=10)
+    ivf.add([str(i) for i in range(len(vectors))], vectors)
+
+    found = ivf.search(vectors[0], k=5, n_probe=10)
+
+    expected = np.argsort(((vectors - vectors[0]) ** 2).sum(axis=1))[:5]
+    assert [user_id for user_id, _ in found] == [str(i) for i in expected]
+
+
+def test_ivf_remove():
+    vectors = np.random.default_rng(1).random((50, 4)).astype(np.float32)
+    ivf = IVFIndex.train(vectors, n_lists=4)
+    ivf.add([str(i) for i in range(len(vectors))], vectors)
+
+    ivf.remove(["0"])
+
+    assert len(ivf) == 49
+    assert "0" not in [user_id for user_id, _ in ivf.search(vectors[0], k=5, n_probe=4)]
+
+
+def test_ivf_search_skips_empty_probed_lists():
+    vectors = np.random.default_rng(2).random((60, 4)).astype(np.float32)
+    ivf = IVFIndex.train(vectors, n_lists=6)
+    ivf.add([str(i) for i in range(len(vectors))], vectors)
+    nearest = ivf._nearest_lists(vectors[:1], 1)[0, 0]
+
+    # Все пользователи ближайшего к запросу списка удалены
+    ivf.remove(list(ivf.list_ids[nearest]))
+    found = ivf.search(vectors[0], k=5, n_probe=1)
+
+    assert len(found) == 5
+    assert all(ivf.location[user_id] != nearest for user_id, _ in found)
+
+    ivf.remove([str(i) for i in range(len(vectors))])
+    assert ivf.search(vectors[0], k=5, n_probe=1) == []
+
+
+def test_user_encoder_without_descriptions():
+    weights = {"profession": 1.0, "city": 1.0, "age": 1.0, "experience": 1.0, "description": 1.0}
+    encoder = UserEncoder.fit(["dev", "qa", "dev"], None, weights)
+
+    vectors = encoder.encode(["dev", "qa"], np.zeros(2), np.zeros(2), np.array([30, 40]), np.array([0.5, 0.1]), None)
+
+    assert encoder.svd is None
+    assert vectors.shape == (2, encoder.dim)
+
+
+def test_user_encoder_encodes_missing_descriptions_as_zeros():
+    weights = {"profession": 1.0, "city": 1.0, "age": 1.0, "experience": 1.0, "description": 1.0}
+    descriptions = sparse.random(20, 30, density=0.3, random_state=0, format="csr")
+    encoder = UserEncoder.fit(["dev"] * 20, descriptions, weights, n_components=4)
+
+    vectors = encoder.encode(["dev"], np.zeros(1), np.zeros(1), np.array([30]), np.array([0.5]), None)
+
+    assert vectors.shape == (1, encoder.dim)
+    assert not vectors[0, -4:].any()
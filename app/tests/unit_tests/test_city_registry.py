@@ -0,0 +1,74 @@
+import numpy as np
+
+from app.city.geo import haversine_km
+from app.city.names import normalize_city_name
+from app.city.registry import CityRegistry
+
+
+CITIES = [
+    {"id": "1", "name": "Москва", "country": "RU", "latitude": 55.7558, "longitude": 37.6173},
+    {"id": "2", "name": "Химки", "country": "RU", "latitude": 55.8970, "longitude": 37.4297},
+    {"id": "3", "name": "Тверь", "country": "RU", "latitude": 56.8587, "longitude": 35.9176},
+    {"id": "4", "name": "Владивосток", "country": "RU", "latitude": 43.1155, "longitude": 131.8855},
+    {"id": "5", "name": "Paris", "country": "FR", "latitude": 48.8566, "longitude": 2.3522},
+]
+
+
+def test_haversine_km():
+    assert 630 < haversine_km(55.7558, 37.6173, 59.9311, 30.3609) < 640
+
+
+def test_geo_row_thresholds():
+    registry = CityRegistry()
+    for city in CITIES:
+        registry.register(city)
+
+    assert registry.geo_row(registry.get("Москва").index).tolist() == [1.0, 1.0, 0.5, 0.8, 0.0]
+
+
+def test_incremental_matrix_matches_rebuild():
+    incremental = CityRegistry()
+    for city in CITIES * 5:
+        incremental.register({**city, "name": f"{city['name']}-{len(incremental)}"})
+    rebuilt = CityRegistry()
+    for city in CITIES * 5:
+        rebuilt.register({**city, "name": f"{city['name']}-{len(rebuilt)}"}, update_matrix=False)
+    rebuilt._rebuild_matrix()
+
+    # Без ссылок пользователей матрица пуста, уровни считаются на лету
+    assert rebuilt.referenced_count == 0
+    for index in range(len(incremental)):
+        assert np.array_equal(incremental.geo_row(index), rebuilt.geo_row(index))
+    rebuilt._rebuild_matrix(range(len(rebuilt)))
+    for index in range(len(incremental)):
+        assert np.array_equal(incremental.geo_row(index), rebuilt.geo_row(index))
+
+
+def test_matrix_covers_only_referenced_cities():
+    registry = CityRegistry()
+    for city in CITIES:
+        registry.register(city, update_matrix=False)
+    moscow, khimki, tver, vladivostok, paris = (registry.get(city["name"]).index for city in CITIES)
+
+    registry.reference([moscow, paris, moscow])
+
+    assert registry.referenced_count == 2
+    assert registry._levels.shape == (16, 16)
+    assert registry.geo_row(moscow).tolist() == [1.0, 1.0, 0.5, 0.8, 0.0]
+    assert registry.geo_row(tver, np.array([paris, moscow])).tolist() == [0.0, 0.5]
+    assert registry.geo_pairs(np.array([moscow, khimki]), np.array([paris, vladivostok])).tolist() == [0.0, 0.8]
+    assert registry.geo_matrix(np.array([moscow, khimki])).tolist() == [[1.0, 1.0], [1.0, 1.0]]
+    assert registry.referenced_count == 3
+
+
+def test_lookup_through_alias_index():
+    registry = CityRegistry()
+    for city in CITIES:
+        registry.register(city)
+    registry.add_alias("Moscow", "Москва")
+
+    assert normalize_city_name(" Ростов-на-Дону ") == "rostov na donu"
+    assert normalize_city_name("Zürich") == "zurich"
+    for spelling in ["Москва", "москва ", "MOSKVA", "moscow"]:
+        assert registry.get(spelling).name == "Москва"
+    assert registry.get("Лондон") is None
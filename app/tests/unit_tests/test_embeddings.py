@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+from app.recommendation import embeddings
+from app.recommendation.embeddings import DescriptionEmbeddings, QuantizedVectors
+from app.recommendation.scoring import top_k
+
+
+@pytest.fixture
+def vectors():
+    vectors = np.random.default_rng(0).normal(size=(300, 64)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def test_quantized_dot_matches_float(vectors):
+    quantized = QuantizedVectors.quantize(vectors)
+    exact = vectors @ vectors.T
+
+    assert quantized.nbytes < vectors.nbytes / 3
+    assert np.abs(quantized.dot_block(quantized) - exact).max() < 0.02
+    assert quantized.dot_row(5) == pytest.approx(quantized.dot_block(quantized)[5], abs=1e-5)
+    left, right = np.array([0, 3, 7]), np.array([1, 3, 2])
+    assert quantized.dot_pairs(left, right) == pytest.approx(exact[left, right], abs=0.02)
+
+    expected, actual = exact[0].copy(), quantized.dot_row(0)
+    expected[0] = actual[0] = -np.inf
+    assert len(set(top_k(expected, 10).tolist()) & set(top_k(actual, 10).tolist())) >= 9
+
+
+def test_quantized_dot_in_blocks_matches_dequantized(vectors, monkeypatch):
+    monkeypatch.setattr(embeddings, "DOT_BLOCK_ROWS", 64)
+    quantized = QuantizedVectors.quantize(vectors)
+    dequantized = quantized.dequantize()
+    other = quantized[10:150]
+    left, right = np.arange(300), np.arange(300)[::-1]
+
+    assert quantized.dot_block(other) == pytest.approx(dequantized @ dequantized[10:150].T, abs=1e-5)
+    assert quantized.dot_row(7) == pytest.approx(dequantized @ dequantized[7], abs=1e-5)
+    assert quantized.dot_pairs(left, right) == pytest.approx(
+        np.einsum("ij,ij->i", dequantized[left], dequantized[right]), abs=1e-5
+    )
+
+
+def test_description_embeddings_upsert_and_missing(vectors):
+    store = DescriptionEmbeddings(vectors.shape[1])
+    store.upsert(["u1", "u2"], ["h1", "h2"], vectors[:2])
+    store.upsert(["u2"], ["h3"], vectors[2:3])
+
+    assert len(store) == 2
+    assert store.hash_of("u2") == "h3"
+    result = store.vectors(["u2", "missing", "u1"])
+    assert result.dot_row(0)[0] == pytest.approx(1.0, abs=0.02)
+    assert result.dot_row(1).tolist() == [0, 0, 0]
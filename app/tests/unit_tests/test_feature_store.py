@@ -0,0 +1,81 @@
+from datetime import date
+import uuid
+
+import numpy as np
+import pytest
+from scipy import sparse
+
+from app.recommendation.feature_store import DeltaRow, FeatureStore, user_key
+
+
+def publish(store: FeatureStore, user_ids: list, descriptions: sparse.csr_matrix) -> str:
+    keys = np.array([user_key(user_id) for user_id in user_ids], dtype="S16")
+    order = np.argsort(keys)
+    descriptions = descriptions[order]
+    return store.publish(
+        {
+            "user_ids": keys[order],
+            "birthdays": np.array([date(1990, 1, 1)] * len(user_ids), dtype="datetime64[D]"),
+            "experience": np.linspace(0, 1, len(user_ids))[order],
+            "profession_codes": np.arange(len(user_ids), dtype=np.int32)[order],
+            "city_rows": np.zeros(len(user_ids), dtype=np.int32),
+            "description_data": descriptions.data,
+            "description_indices": descriptions.indices.astype(np.int32),
+            "description_indptr": descriptions.indptr.astype(np.int32),
+        },
+        ["Moscow"],
+        {"descriptions": "tfidf", "description_shape": list(descriptions.shape), "description_source": "tfidf:1"},
+    )
+
+
+def test_snapshot_lookup_overlay_and_hot_swap(tmp_path):
+    store = FeatureStore(str(tmp_path), refresh_interval=0, delta_size=10, keep_versions=1)
+    assert store.current() is None
+
+    user_ids = [uuid.uuid4() for _ in range(5)]
+    descriptions = sparse.csr_matrix(np.eye(5))
+    first = publish(store, user_ids, descriptions)
+    snapshot = store.current()
+    assert snapshot.version == first
+    assert isinstance(snapshot.columns["experience"], np.memmap)
+
+    new_user = uuid.uuid4()
+    rows = snapshot.rows_of([user_ids[3], new_user, None, user_ids[0]])
+    assert rows[1] == rows[2] == -1
+    assert snapshot.column("profession_codes", rows[[0, 3]]).tolist() == [3, 0]
+
+    overlay = sparse.csr_matrix(np.full((1, 5), 0.5))
+    merged = snapshot.descriptions_with_overlay(rows[[0, 1, 3]], overlay).toarray()
+    assert merged.tolist() == [np.eye(5)[3].tolist(), [0.5] * 5, np.eye(5)[0].tolist()]
+
+    store.delta.add(new_user, DeltaRow(date(2000, 1, 1), 0.5, 1, 0))
+    second = publish(store, [*user_ids, new_user], sparse.csr_matrix(np.eye(6)))
+    assert store.current().version == second
+    assert len(store.delta) == 0
+    assert store.current().rows_of([new_user])[0] >= 0
+    assert not (tmp_path / first).exists()
+
+
+def test_rebuild_score_rows_reads_store_and_matches_one_vs_all(tmp_path, monkeypatch):
+    from app.recommendation import rebuild
+    from app.recommendation.scoring import score_one_vs_all, top_k
+
+    store = FeatureStore(str(tmp_path), refresh_interval=0, delta_size=10, keep_versions=1)
+    monkeypatch.setattr(rebuild, "feature_store", store)
+    n = 11
+    user_ids = [uuid.uuid4() for _ in range(n)]
+    descriptions = sparse.random(n, 6, density=0.5, random_state=0, format="csr")
+    version = publish(store, user_ids, descriptions)
+    profession_similarity = np.random.default_rng(0).random((n, n))
+    snapshot = rebuild.open_snapshot(version, np.ones((1, 1)), profession_similarity)
+    assert isinstance(snapshot.features.experience, np.memmap)
+
+    rows = rebuild.score_rows(snapshot, range(3, 9), k=3, tile=4)
+
+    for row in range(3, 9):
+        expected = score_one_vs_all(snapshot.features, row, snapshot.geo_similarity[0], rebuild.weights)["similarity"]
+        expected[row] = -np.inf
+        found = [item for item in rows if item["user_id"] == snapshot.user_id(row)]
+        assert [item["recommended_user_id"] for item in found] == [snapshot.user_id(i) for i in top_k(expected, 3)]
+        assert [item["similarity"] for item in found] == pytest.approx(expected[top_k(expected, 3)])
+    assert {snapshot.user_id(row) for row in range(n)} == set(user_ids)
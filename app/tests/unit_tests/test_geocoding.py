@@ -0,0 +1,63 @@
+import asyncio
+import threading
+from types import SimpleNamespace
+
+from app.city.geocoding import GeocodedCity, GeocodingQueue, NominatimGeocoder
+
+
+class StubGeocoder:
+    def __init__(self, known: dict[str, GeocodedCity]):
+        self.known = known
+        self.calls = []
+        self.release = threading.Event()
+
+    def geocode(self, city_name: str) -> GeocodedCity | None:
+        self.release.wait(timeout=5)
+        self.calls.append(city_name)
+        return self.known.get(city_name)
+
+
+def test_concurrent_requests_share_one_geocoder_call():
+    geocoder = StubGeocoder({"Kazan": GeocodedCity("RU", 55.79, 49.12)})
+    queue = GeocodingQueue(geocoder, min_interval=0, negative_ttl=60)
+
+    async def run():
+        requests = [asyncio.ensure_future(queue.geocode(name)) for name in ["Kazan", " kazan", "KAZAN "]]
+        await asyncio.sleep(0.01)
+        geocoder.release.set()
+        return await asyncio.gather(*requests)
+
+    results = asyncio.run(run())
+
+    assert geocoder.calls == ["Kazan"]
+    assert results == [GeocodedCity("RU", 55.79, 49.12)] * 3
+
+
+def test_unknown_city_is_negatively_cached():
+    geocoder = StubGeocoder({})
+    geocoder.release.set()
+    queue = GeocodingQueue(geocoder, min_interval=0, negative_ttl=60)
+
+    async def run():
+        return [await queue.geocode("Atlantis"), await queue.geocode("atlantis")]
+
+    assert asyncio.run(run()) == [None, None]
+    assert geocoder.calls == ["Atlantis"]
+    assert queue.is_missing("ATLANTIS")
+
+
+def test_nominatim_country_is_iso_code():
+    class Geolocator:
+        def geocode(self, city_name, addressdetails=False):
+            assert addressdetails
+            return SimpleNamespace(
+                address="Казань, городской округ Казань, Татарстан, Приволжский федеральный округ, Россия",
+                raw={"address": {"city": "Казань", "country": "Россия", "country_code": "ru"}},
+                latitude=55.79,
+                longitude=49.12,
+            )
+
+    geocoder = NominatimGeocoder()
+    geocoder._geolocator = Geolocator()
+
+    assert geocoder.geocode("Казань") == GeocodedCity("RU", 55.79, 49.12)
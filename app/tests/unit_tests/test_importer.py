@@ -0,0 +1,30 @@
+import asyncio
+
+from app.users.importer import iter_lines, iter_records
+
+
+async def in_blocks(data: bytes, size: int):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+def read(data: bytes, format: str, block_size: int = 3) -> list:
+    async def collect():
+        return [record async for record in iter_records(iter_lines(in_blocks(data, block_size)), format)]
+    return asyncio.run(collect())
+
+
+def test_csv_records_span_lines_and_blocks():
+    data = 'first_name,description\r\nИван,"две\r\nстроки, ""кавычки"""\r\nПётр\r\n'.encode()
+
+    records = read(data, "csv")
+
+    assert records[0] == (1, {"first_name": "Иван", "description": 'две\nстроки, "кавычки"'})
+    assert records[1][0] == 2 and isinstance(records[1][1], ValueError)
+
+
+def test_ndjson_reports_bad_lines():
+    records = read('{"city": "Москва"}\n\nnot json\n'.encode(), "ndjson", block_size=1)
+
+    assert records[0] == (1, {"city": "Москва"})
+    assert records[1][0] == 2 and isinstance(records[1][1], ValueError)
@@ -0,0 +1,76 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import threading
+
+import numpy as np
+import pytest
+from fastapi import HTTPException
+
+from app.recommendation import pool
+from app.recommendation.pool import ScoringJob, ScoringPool
+from app.recommendation.scoring import UserFeatures
+
+
+def make_job(k: int | None = 2) -> ScoringJob:
+    n = 4
+    features = UserFeatures(
+        user_ids=list(range(n)),
+        ages=np.array([30, 31, 50, 29]),
+        experience=np.array([0.5, 0.5, 0.1, 0.4]),
+        profession_codes=np.zeros(n, dtype=np.int64),
+        profession_similarity=np.ones((1, 1)),
+        city_codes=np.zeros(n, dtype=np.int64),
+        descriptions=None,
+    )
+    weights = {"city": .2, "profession": .3, "age": .2, "experience": .3, "description": 0}
+    return ScoringJob(features=features, geo_row=np.ones(1), weights=weights, k=k)
+
+
+def test_run_without_executor_scores_in_a_thread(monkeypatch):
+    threads = []
+    original = pool.score_job
+
+    def score_job(job):
+        threads.append(threading.current_thread())
+        return original(job)
+
+    monkeypatch.setattr(pool, "score_job", score_job)
+    scoring_pool = ScoringPool()
+    scoring_pool.start(size=0, queue_depth=1)
+
+    best, scores = asyncio.run(scoring_pool.run(make_job()))
+
+    assert threads and threads[0] is not threading.main_thread()
+    assert best.tolist() == [0, 2]
+    assert scores.tolist() == pytest.approx([0.998, 0.968])
+
+
+def test_run_rejects_jobs_over_queue_depth(monkeypatch):
+    release = threading.Event()
+
+    def score_job(job):
+        release.wait(5)
+        return None, np.zeros(0)
+
+    monkeypatch.setattr(pool, "score_job", score_job)
+    scoring_pool = ScoringPool()
+    scoring_pool.start(size=0, queue_depth=1)
+    scoring_pool._executor = ThreadPoolExecutor(max_workers=1)
+
+    async def scenario():
+        first = asyncio.create_task(scoring_pool.run(make_job()))
+        await asyncio.sleep(0.05)
+        with pytest.raises(HTTPException) as rejected:
+            await scoring_pool.run(make_job())
+        release.set()
+        await first
+        # Место в очереди освободилось
+        await scoring_pool.run(make_job())
+        return rejected.value
+
+    try:
+        rejected = asyncio.run(scenario())
+    finally:
+        release.set()
+        scoring_pool.shutdown()
+    assert rejected.status_code == 503
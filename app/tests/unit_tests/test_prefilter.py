@@ -0,0 +1,69 @@
+import asyncio
+from datetime import date
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from app.city.registry import city_registry
+from app.recommendation.dao import RecommendationDAO
+from app.recommendation.embeddings import QuantizedVectors
+from app.recommendation.scoring import UserFeatures
+
+
+def make_users(n: int) -> list:
+    """Пользователь i на i лет старше target (строка 0), описания случайные."""
+    vectors = np.random.default_rng(0).normal(size=(n + 1, 16)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return [
+        SimpleNamespace(id=i, city="Москва", profession="developer", birthday=date(1990 - i, 1, 1), experience=5.0, vector=vector)
+        for i, vector in enumerate(vectors)
+    ]
+
+
+@pytest.fixture
+def described(monkeypatch) -> list:
+    """Признаки без реестров; возвращает наборы пользователей, получивших описания."""
+    calls = []
+
+    async def build_features(users, with_descriptions: bool = True):
+        return UserFeatures(
+            user_ids=[user.id for user in users],
+            ages=np.array([2024 - user.birthday.year for user in users]),
+            experience=np.array([user.experience / 10 for user in users]),
+            profession_codes=np.zeros(len(users), dtype=np.int64),
+            profession_similarity=np.ones((1, 1)),
+            city_codes=np.zeros(len(users), dtype=np.int64),
+            descriptions=None,
+        )
+
+    async def attach_descriptions(job, users):
+        calls.append([user.id for user in users])
+        job.features.descriptions = QuantizedVectors.quantize(np.stack([user.vector for user in users]))
+
+    monkeypatch.setattr(RecommendationDAO, "build_features", build_features)
+    monkeypatch.setattr(RecommendationDAO, "attach_descriptions", attach_descriptions)
+    monkeypatch.setattr(city_registry, "geo_row", lambda index, codes: np.ones(len(codes)))
+    return calls
+
+
+def test_prefilter_not_smaller_than_candidates_matches_exhaustive(described):
+    target, *candidates = make_users(20)
+
+    exhaustive = asyncio.run(RecommendationDAO.recommend(target, candidates, k=5))
+    prefiltered = asyncio.run(RecommendationDAO.recommend(target, candidates, k=5, prefilter=len(candidates)))
+
+    assert prefiltered == exhaustive
+    assert [sorted(users) for users in described] == [list(range(21))] * 2
+
+
+def test_prefilter_scores_descriptions_only_for_best_cheap_candidates(described):
+    target, *candidates = make_users(20)
+
+    result = asyncio.run(RecommendationDAO.recommend(target, candidates, k=3, prefilter=6))
+
+    # Дешёвый скор падает с разницей в возрасте: полный скоринг получают 6 ближайших
+    [users] = described
+    assert sorted(users) == list(range(7))
+    assert {row["user_id"] for row in result} <= set(range(1, 7))
+    assert len(result) == 3
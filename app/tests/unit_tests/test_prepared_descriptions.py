@@ -0,0 +1,93 @@
+import asyncio
+
+import pytest
+
+from app.recommendation import dao
+from app.recommendation.dao import LRUCache, PreparedDescriptionDAO, RecommendationDAO
+
+
+class FakeSession:
+    """Таблица prepared_descriptions в словаре: SELECT ... IN и INSERT ... ON CONFLICT DO NOTHING."""
+
+    def __init__(self, table: dict, statements: list):
+        self.table = table
+        self.statements = statements
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        pass
+
+    async def execute(self, statement):
+        self.statements.append(statement.__visit_name__)
+        params = statement.compile().params
+        if statement.__visit_name__ == "select":
+            hashes = next(value for key, value in params.items() if key.startswith("description_hash"))
+            return [Row(h, self.table[h]) for h in hashes if h in self.table]
+        for row in statement._multi_values[0]:
+            values = {column.key: value for column, value in row.items()}
+            self.table.setdefault(values["description_hash"], values["prepared"])
+
+    async def commit(self):
+        pass
+
+
+class Row:
+    def __init__(self, description_hash: str, prepared: str):
+        self.description_hash = description_hash
+        self.prepared = prepared
+
+
+@pytest.fixture
+def translator(monkeypatch):
+    """Перевод без сети: каждый вызов записывается."""
+    calls = []
+
+    async def translate_to_english(text):
+        calls.append(text)
+        return f"en: {text}"
+
+    monkeypatch.setattr(RecommendationDAO, "translate_to_english", translate_to_english)
+    monkeypatch.setattr(dao, "detect", lambda text: "en" if text.isascii() else "ru")
+    monkeypatch.setattr(PreparedDescriptionDAO, "cache", LRUCache(100))
+    return calls
+
+
+def test_second_prepare_is_a_cache_hit(translator):
+    table, statements = {}, []
+    session_maker = lambda: FakeSession(table, statements)
+    descriptions = ["Опытный разработчик", "python developer", "Опытный разработчик", ""]
+
+    first = asyncio.run(PreparedDescriptionDAO.prepare(descriptions, session_maker))
+    executed = len(statements)
+    second = asyncio.run(PreparedDescriptionDAO.prepare(descriptions, session_maker))
+
+    assert first == second == ["en: Опытный разработчик", "python developer", "en: Опытный разработчик", ""]
+    assert translator == ["Опытный разработчик"]
+    assert statements[:executed] == ["select", "insert"]
+    # Повторный вызов обслуживается in-process LRU без запросов к БД
+    assert len(statements) == executed
+
+
+def test_lookup_reads_table_after_lru_eviction(translator, monkeypatch):
+    table, statements = {}, []
+    session_maker = lambda: FakeSession(table, statements)
+    asyncio.run(PreparedDescriptionDAO.prepare(["Опытный разработчик"], session_maker))
+    monkeypatch.setattr(PreparedDescriptionDAO, "cache", LRUCache(100))
+
+    assert asyncio.run(PreparedDescriptionDAO.lookup(["Опытный разработчик", "unknown"], session_maker)) == [
+        "en: Опытный разработчик", None,
+    ]
+    assert translator == ["Опытный разработчик"]
+
+
+def test_failed_translation_is_not_remembered(translator, monkeypatch):
+    async def translate_to_english(text):
+        return ""
+
+    monkeypatch.setattr(RecommendationDAO, "translate_to_english", translate_to_english)
+    table, statements = {}, []
+
+    assert asyncio.run(PreparedDescriptionDAO.prepare(["Опытный разработчик"], lambda: FakeSession(table, statements))) == [""]
+    assert table == {}
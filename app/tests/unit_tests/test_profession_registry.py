@@ -0,0 +1,23 @@
+import os
+
+import numpy as np
+
+from app.profession.registry import ProfessionRegistry
+
+
+def test_matrix_is_indexed_by_code_and_reloads_from_file(tmp_path):
+    path = tmp_path / "profession_similarity.csv"
+    registry = ProfessionRegistry(path=str(path))
+    for code, name in enumerate(["Software Engineer", "Data Scientist", "Chef"], start=1):
+        registry.register(name, code)
+
+    matrix = registry.matrix()
+    assert matrix.shape == (4, 4)
+    assert matrix[1, 2] == matrix[2, 1] == np.float32(0.8)
+    assert registry.similarity("Chef", "Chef") == 1.0
+    assert registry.similarity("Chef", "Data Scientist") == 0.0
+
+    path.write_text("first,second,similarity\nChef,Data Scientist,0.25\n", encoding="utf-8")
+    os.utime(path, ns=(1, 1))
+    assert registry.similarity("Data Scientist", "Chef") == np.float32(0.25)
+    assert registry.similarity("Software Engineer", "Data Scientist") == 0.0
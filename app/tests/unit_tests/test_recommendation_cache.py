@@ -0,0 +1,119 @@
+import asyncio
+import hashlib
+import json
+
+import pytest
+from fastapi_cache import FastAPICache
+from fastapi_cache.backends.redis import RedisBackend
+
+from app.config import settings
+from app.recommendation.cache import RecommendationCache
+from app.tests.fake_redis import FakeRedis
+
+
+@pytest.fixture
+def redis():
+    redis = FakeRedis()
+    FastAPICache.reset()
+    FastAPICache.init(RedisBackend(redis), prefix="test")
+    return redis
+
+
+class Compute:
+    def __init__(self, result, delay: float = 0.05):
+        self.result = result
+        self.delay = delay
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return self.result
+
+
+def lock_key(cache: RecommendationCache, user_id: str, field: str) -> str:
+    return f"{cache.key(user_id)}:lock:{hashlib.sha1(field.encode()).hexdigest()}"
+
+
+def lock_keys(redis: FakeRedis) -> list[str]:
+    return [key for key in redis.data if ":lock:" in key]
+
+
+def test_concurrent_misses_compute_once_and_survive_cancellation(redis):
+    cache = RecommendationCache()
+    compute = Compute([{"user_id": "b", "similarity": 0.5}])
+
+    async def scenario():
+        first = asyncio.create_task(cache.get_or_compute("a", {"k": 5}, compute))
+        second = asyncio.create_task(cache.get_or_compute("a", {"k": 5}, compute))
+        await asyncio.sleep(0.01)
+        # Клиент первого запроса отключился: вычисление для второго продолжается
+        first.cancel()
+        return await second, first
+
+    result, first = asyncio.run(scenario())
+
+    assert first.cancelled()
+    assert result == [{"user_id": "b", "similarity": 0.5}]
+    assert compute.calls == 1
+    assert not cache._in_flight
+
+
+def test_miss_takes_lock_stores_result_and_releases_own_lock(redis):
+    cache = RecommendationCache()
+    compute = Compute({"value": 1}, delay=0)
+
+    assert asyncio.run(cache.get_or_compute("a", {"k": 5}, compute)) == {"value": 1}
+    assert asyncio.run(cache.get_or_compute("a", {"k": 5}, compute)) == {"value": 1}
+
+    assert compute.calls == 1
+    assert json.loads(redis.data[cache.key("a")]['{"k": 5}']) == {"value": 1}
+    assert cache.key("a") in redis.expires
+    assert any(call[0] == "eval" for call in redis.calls)
+    assert lock_keys(redis) == []
+
+
+def test_waits_for_result_of_worker_holding_the_lock(redis):
+    cache = RecommendationCache()
+    compute = Compute({"value": "mine"}, delay=0)
+
+    async def scenario():
+        await redis.set(lock_key(cache, "a", '{"k": 5}'), "other-worker", nx=True, ex=30)
+        waiting = asyncio.create_task(cache.get_or_compute("a", {"k": 5}, compute))
+        await asyncio.sleep(0.1)
+        await redis.hset(cache.key("a"), '{"k": 5}', json.dumps({"value": "theirs"}))
+        return await waiting
+
+    assert asyncio.run(scenario()) == {"value": "theirs"}
+    assert compute.calls == 0
+    # Чужую блокировку не трогаем
+    assert list(redis.data.get(key) for key in lock_keys(redis)) == ["other-worker"]
+
+
+def test_computes_itself_after_lock_timeout_without_releasing_foreign_lock(redis, monkeypatch):
+    monkeypatch.setattr(settings, "RECOMMENDATION_CACHE_LOCK_TIMEOUT", 0.2)
+    cache = RecommendationCache()
+    compute = Compute({"value": "mine"}, delay=0)
+
+    async def scenario():
+        await redis.set(lock_key(cache, "a", '{"k": 5}'), "other-worker", nx=True, ex=30)
+        return await cache.get_or_compute("a", {"k": 5}, compute)
+
+    assert asyncio.run(scenario()) == {"value": "mine"}
+    assert compute.calls == 1
+    assert list(redis.data.get(key) for key in lock_keys(redis)) == ["other-worker"]
+
+
+def test_invalidate_drops_all_variants_of_users(redis):
+    cache = RecommendationCache()
+
+    async def scenario():
+        await cache.get_or_compute("a", {"k": 5}, Compute(1, delay=0))
+        await cache.get_or_compute("a", {"k": 10}, Compute(2, delay=0))
+        await cache.get_or_compute("b", {"k": 5}, Compute(3, delay=0))
+        await cache.invalidate(["a"])
+
+    asyncio.run(scenario())
+
+    assert cache.key("a") not in redis.data
+    assert cache.key("b") in redis.data
@@ -0,0 +1,139 @@
+from datetime import date
+
+import numpy as np
+import pytest
+
+from app.recommendation.description_index import DescriptionIndex, description_hash
+from app.recommendation.scoring import (
+    TopKAccumulator,
+    UserFeatures,
+    all_pairs_top_k,
+    calculate_ages,
+    cosine_to_row,
+    new_rows_top_k,
+    score_one_vs_all,
+    score_pairs,
+    top_k,
+)
+
+
+@pytest.fixture
+def index():
+    descriptions = ["python developer", "data science with python", "cooking and music"]
+    return DescriptionIndex.fit(
+        ["u1", "u2", "u3"], [description_hash(d) for d in descriptions], descriptions
+    )
+
+
+def test_description_index_cosine(index):
+    similarity = cosine_to_row(index.vectors(["u1", "u2", "u3"]), 0)
+
+    assert similarity[0] == pytest.approx(1.0)
+    assert similarity[1] > 0
+    assert similarity[2] == 0
+
+
+def test_description_index_upsert_replaces_row(index):
+    index.upsert(["u3", "u4"], [description_hash("python"), description_hash("music")], ["python", "music"])
+
+    assert len(index) == 4
+    assert index.hash_of("u3") == description_hash("python")
+    similarity = cosine_to_row(index.vectors(["u1", "u3", "missing"]), 0)
+    assert similarity[1] > 0
+    assert similarity[2] == 0
+
+
+def test_calculate_ages():
+    ages = calculate_ages([date(2000, 5, 10), date(2000, 5, 11)], today=date(2024, 5, 10))
+    assert ages.tolist() == [24, 23]
+
+
+def test_top_k_matches_full_sort():
+    scores = np.random.default_rng(0).integers(0, 20, size=500).astype(float)
+
+    expected = sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)[:10]
+    assert top_k(scores, 10).tolist() == expected
+
+
+def test_top_k_accumulator_over_chunks():
+    scores = np.random.default_rng(1).random(1000)
+    accumulator = TopKAccumulator(7)
+    for start in range(0, len(scores), 128):
+        accumulator.push(scores[start:start + 128], list(range(start, min(start + 128, len(scores)))))
+
+    assert [item for _, item in accumulator.result()] == top_k(scores, 7).tolist()
+
+
+def test_all_pairs_top_k_matches_one_vs_all(index):
+    rng = np.random.default_rng(2)
+    n = 37
+    features = UserFeatures(
+        user_ids=list(range(n)),
+        ages=rng.integers(18, 60, size=n),
+        experience=rng.random(n),
+        profession_codes=rng.integers(0, 3, size=n),
+        profession_similarity=np.array([[1, .5, 0], [.5, 1, .2], [0, .2, 1]]),
+        city_codes=rng.integers(0, 4, size=n),
+        descriptions=index.vectors([f"u{i % 4}" for i in range(n)]),
+    )
+    geo_similarity = np.array([[1, .8, .5, 0], [.8, 1, 0, 0], [.5, 0, 1, .5], [0, 0, .5, 1]])
+    weights = {"city": .2, "profession": .3, "age": .1, "experience": .1, "description": .3}
+
+    indices, scores = all_pairs_top_k(features, geo_similarity, weights, k=5, tile=8)
+
+    for row in range(n):
+        expected = score_one_vs_all(features, row, geo_similarity[features.city_codes[row]], weights)["similarity"]
+        expected[row] = -np.inf
+        assert row not in indices[row]
+        assert scores[row] == pytest.approx(expected[top_k(expected, 5)])
+        assert scores[row] == pytest.approx(expected[indices[row]])
+
+
+def test_new_rows_top_k_matches_all_pairs(index):
+    rng = np.random.default_rng(3)
+    n, new = 29, 4
+    features = UserFeatures(
+        user_ids=list(range(n)),
+        ages=rng.integers(18, 60, size=n),
+        experience=rng.random(n),
+        profession_codes=rng.integers(0, 3, size=n),
+        profession_similarity=np.array([[1, .5, 0], [.5, 1, .2], [0, .2, 1]]),
+        city_codes=rng.integers(0, 2, size=n),
+        descriptions=index.vectors([f"u{i % 4}" for i in range(n)]),
+    )
+    geo_similarity = np.array([[1, .5], [.5, 1]])
+    weights = {"city": .2, "profession": .3, "age": .1, "experience": .1, "description": .3}
+
+    own, incoming = new_rows_top_k(features, geo_similarity, new, weights, k=3, tile=8)
+
+    indices, scores = all_pairs_top_k(features, geo_similarity, weights, k=3, tile=8)
+    assert own.scores == pytest.approx(scores[:new])
+    for row in range(n):
+        expected = score_one_vs_all(features, row, geo_similarity[features.city_codes[row]], weights)["similarity"][:new]
+        if row < new:
+            expected[row] = -np.inf
+        best = top_k(expected, 3)
+        assert incoming.scores[row] == pytest.approx(expected[best])
+        assert set(incoming.indices[row]) == set(best)
+
+
+def test_score_pairs_matches_one_vs_all(index):
+    features = UserFeatures(
+        user_ids=[0, 1, 2],
+        ages=np.array([25, 30, 52]),
+        experience=np.array([.2, .5, .9]),
+        profession_codes=np.array([0, 1, 1]),
+        profession_similarity=np.array([[1, .8], [.8, 1]]),
+        city_codes=np.array([0, 1, 0]),
+        descriptions=index.vectors(["u1", "u2", "u3"]),
+    )
+    geo_similarity = np.array([[1, .5], [.5, 1]])
+    weights = {"city": .2, "profession": .3, "age": .2, "experience": .1, "description": .2}
+    left, right = np.array([0, 0, 2]), np.array([1, 2, 1])
+
+    pairs = score_pairs(features, left, right, geo_similarity[features.city_codes[left], features.city_codes[right]], weights)
+
+    for i, (first, second) in enumerate(zip(left, right)):
+        expected = score_one_vs_all(features, first, geo_similarity[features.city_codes[first]], weights)
+        for name, values in pairs.items():
+            assert values[i] == pytest.approx(expected[name][second])
@@ -1,6 +1,48 @@
+import logging
+
+from sqlalchemy import select
+
+from app.database import async_session_maker
+from app.profession.registry import profession_registry
+from app.recommendation.cache import recommendation_cache
+from app.recommendation.dao import PreparedDescriptionDAO, RecommendationDAO
 from app.users.models import Users
 from app.dao.base import BaseDAO
 
+logger = logging.getLogger(__name__)
+
+
 class UsersDAO(BaseDAO):
     model = Users
 
+    @classmethod
+    async def add(cls, **data):
+        data["profession_code"] = int((await profession_registry.resolve([data["profession"]]))[0])
+        result = await super().add(**data)
+        if result:
+            try:
+                # Описание готовится один раз при записи; индексы и top-K обновляются в Celery
+                await PreparedDescriptionDAO.prepare([data["description"]])
+                RecommendationDAO.on_users_added([result["id"]])
+            except Exception as e:
+                logger.error(f"Failed to index new user {result['id']}: {e}", exc_info=True)
+        return result
+
+    @classmethod
+    async def delete(cls, **filter_by):
+        async with async_session_maker() as session:
+            result = await session.execute(select(cls.model.id).filter_by(**filter_by))
+            user_ids = result.scalars().all()
+
+        if not user_ids:
+            return None
+
+        # Сначала убираем пользователей из сохранённых рекомендаций: на них ссылаются внешние ключи
+        affected = await RecommendationDAO.detach_users(user_ids)
+        deleted = await super().delete(**filter_by)
+        if deleted:
+            RecommendationDAO.on_users_deleted(user_ids)
+            await recommendation_cache.invalidate(user_ids)
+            # Дозаполнение требует скоринга каждого затронутого списка: выполняется в Celery
+            RecommendationDAO.schedule_backfill(affected)
+        return deleted
@@ -0,0 +1,238 @@
+"""
+Потоковый массовый импорт пользователей из NDJSON или CSV (с заголовком).
+Файл читается построчно и обрабатывается пачками: валидация UserCreate,
+один запрос на каждый новый город и на новые профессии пачки, многострочный INSERT, постановка
+подготовки описаний и добавления в индексы и top-K (on_users_added) в очередь Celery.
+Ошибочные строки пропускаются и попадают в отчёт; пачка, упавшая целиком
+(например, из-за ошибки БД), попадает в chunk_errors, импорт продолжается.
+После каждой пачки отчёт передаётся в on_progress.
+
+Запуск из корня проекта:
+    python -m app.users.importer data/users.ndjson --format ndjson --chunk-size 1000
+"""
+import argparse
+import asyncio
+import codecs
+import csv
+import io
+import json
+import logging
+from typing import AsyncIterable, AsyncIterator, Awaitable, Callable, Literal
+
+from fastapi import HTTPException
+from pydantic import ValidationError
+from sqlalchemy import insert
+
+from app.cache import init_redis_cache
+from app.city.dao import CityDAO
+from app.city.registry import city_registry
+from app.config import settings
+from app.database import async_session_maker
+from app.profession.registry import profession_registry
+from app.recommendation.dao import PreparedDescriptionDAO, RecommendationDAO
+from app.users.models import Users
+from app.users.schemas import UserCreate
+
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+ImportFormat = Literal["ndjson", "csv"]
+# Сколько ошибок строк возвращается в отчёте (счётчик ведётся по всем)
+MAX_REPORTED_ERRORS = 1000
+INSERT_BATCH = 1000
+
+
+async def iter_lines(chunks: AsyncIterable[bytes]) -> AsyncIterator[str]:
+    """Строки (с переводом строки) из потока байтов без чтения всего файла в память."""
+    # Многобайтовый символ UTF-8 и \r\n могут оказаться на границе блоков
+    decoder = io.IncrementalNewlineDecoder(codecs.getincrementaldecoder("utf-8")(), translate=True)
+    buffer = ""
+    async for chunk in chunks:
+        buffer += decoder.decode(chunk)
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            yield line + "\n"
+    buffer += decoder.decode(b"", final=True)
+    if buffer:
+        yield buffer
+
+
+async def iter_records(lines: AsyncIterable[str], format: ImportFormat) -> AsyncIterator[tuple[int, dict | Exception]]:
+    """
+    Пары (номер записи, словарь полей) или (номер, ошибка разбора).
+    CSV-запись может занимать несколько строк: она закончена, когда число кавычек чётное.
+    """
+    number = 0
+    header, pending = None, ""
+    async for line in lines:
+        if format == "ndjson":
+            if not line.strip():
+                continue
+            number += 1
+            try:
+                yield number, json.loads(line)
+            except json.JSONDecodeError as e:
+                yield number, e
+            continue
+
+        pending += line
+        if pending.count('"') % 2:
+            continue
+        record, pending = pending, ""
+        if not record.strip():
+            continue
+        values = next(csv.reader(io.StringIO(record)))
+        if header is None:
+            header = values
+            continue
+        number += 1
+        if len(values) != len(header):
+            yield number, ValueError(f"expected {len(header)} columns, got {len(values)}")
+        else:
+            yield number, dict(zip(header, values))
+    if pending.strip():
+        yield number + 1, ValueError("unterminated quoted field")
+
+
+async def resolve_batch_cities(users: list[tuple[int, dict]]) -> dict[str, str]:
+    """Разрешает каждый город пачки один раз; возвращает ошибки по названию города."""
+    failed = {}
+    for city in dict.fromkeys(user["city"] for _, user in users):
+        if city in city_registry:
+            continue
+        try:
+            await CityDAO.get_or_create_city(city)
+        except HTTPException as e:
+            failed[city] = str(e.detail)
+    return failed
+
+
+async def import_chunk(records: list[tuple[int, dict | Exception]], report: dict) -> None:
+    """Импортирует пачку записей; report — отчёт этой пачки (сливается в общий в import_users)."""
+    valid = []
+    for number, record in records:
+        if isinstance(record, Exception):
+            add_error(report, number, str(record))
+            continue
+        try:
+            valid.append((number, UserCreate(**record).model_dump()))
+        except (ValidationError, TypeError) as e:
+            add_error(report, number, str(e))
+
+    failed_cities = await resolve_batch_cities(valid)
+    rows = []
+    for number, user in valid:
+        if user["city"] in failed_cities:
+            add_error(report, number, f"city {user['city']!r}: {failed_cities[user['city']]}")
+        else:
+            rows.append(user)
+
+    if rows:
+        codes = await profession_registry.resolve([row["profession"] for row in rows])
+        for row, code in zip(rows, codes.tolist()):
+            row["profession_code"] = code
+        user_ids = []
+        async with async_session_maker() as session:
+            # Многострочные INSERT по INSERT_BATCH строк (ограничение asyncpg на число параметров)
+            for start in range(0, len(rows), INSERT_BATCH):
+                result = await session.execute(insert(Users).values(rows[start:start + INSERT_BATCH]).returning(Users.id))
+                user_ids.extend(result.scalars().all())
+            await session.commit()
+        # Описания, индексы и сохранённые top-K обновляются в Celery пачкой
+        PreparedDescriptionDAO.schedule_preparation(user_ids)
+        RecommendationDAO.on_users_added(user_ids)
+        report["imported"] += len(user_ids)
+    report["processed"] += len(records)
+
+
+def add_error(report: dict, number: int, error: str) -> None:
+    report["failed"] += 1
+    if len(report["errors"]) < MAX_REPORTED_ERRORS:
+        report["errors"].append({"row": number, "error": error})
+
+
+def new_report() -> dict:
+    return {"processed": 0, "imported": 0, "failed": 0, "errors": []}
+
+
+async def process_chunk(records: list[tuple[int, dict | Exception]], report: dict) -> None:
+    """
+    Импортирует пачку и сливает её отчёт в общий. Если пачка упала целиком,
+    её строки не вставлены (транзакция откатилась): все они считаются ошибочными,
+    а причина попадает в chunk_errors.
+    """
+    chunk = new_report()
+    try:
+        await import_chunk(records, chunk)
+    except Exception as e:
+        logger.error(f"Пачка строк {records[0][0]}-{records[-1][0]} не импортирована: {e}", exc_info=True)
+        chunk = new_report()
+        chunk["processed"] = chunk["failed"] = len(records)
+        report["chunk_errors"].append({"rows": [records[0][0], records[-1][0]], "error": str(e)})
+    for key in ("processed", "imported", "failed"):
+        report[key] += chunk[key]
+    report["errors"].extend(chunk["errors"][:MAX_REPORTED_ERRORS - len(report["errors"])])
+
+
+async def import_users(
+    chunks: AsyncIterable[bytes],
+    format: ImportFormat,
+    chunk_size: int | None = None,
+    on_progress: Callable[[dict], Awaitable] | None = None,
+) -> dict:
+    """
+    Импортирует пользователей из потока байтов; возвращает отчёт с ошибками по строкам
+    и по пачкам. on_progress вызывается с текущим отчётом после каждой пачки.
+    """
+    chunk_size = chunk_size or settings.USER_IMPORT_CHUNK_SIZE
+    report = {**new_report(), "chunks": 0, "chunk_errors": []}
+    records = []
+
+    async def flush():
+        await process_chunk(records, report)
+        report["chunks"] += 1
+        records.clear()
+        logger.info(f"Импорт: обработано {report['processed']}, добавлено {report['imported']}, ошибок {report['failed']}")
+        if on_progress is not None:
+            await on_progress(report)
+
+    async for record in iter_records(iter_lines(chunks), format):
+        records.append(record)
+        if len(records) >= chunk_size:
+            await flush()
+    if records:
+        await flush()
+    logger.info(f"Импорт завершён: обработано {report['processed']}, добавлено {report['imported']}, ошибок {report['failed']}")
+    return report
+
+
+async def read_file(path: str, block_size: int = 1 << 20) -> AsyncIterator[bytes]:
+    with open(path, "rb") as file:
+        while block := file.read(block_size):
+            yield block
+
+
+async def main_async(path: str, format: ImportFormat, chunk_size: int) -> dict:
+    init_redis_cache()
+    await city_registry.load()
+    await profession_registry.load()
+    report = await import_users(read_file(path), format, chunk_size)
+    for error in report["errors"]:
+        print(f"row {error['row']}: {error['error']}")
+    for error in report["chunk_errors"]:
+        print(f"rows {error['rows'][0]}-{error['rows'][1]}: {error['error']}")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import users from NDJSON or CSV")
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=["ndjson", "csv"], default="ndjson")
+    parser.add_argument("--chunk-size", type=int, default=settings.USER_IMPORT_CHUNK_SIZE)
+    args = parser.parse_args()
+    asyncio.run(main_async(args.path, args.format, args.chunk_size))
+
+
+if __name__ == "__main__":
+    main()
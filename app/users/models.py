@@ -1,7 +1,7 @@
 
 from typing import Literal
 import uuid
-from sqlalchemy import UUID,  Date
+from sqlalchemy import UUID,  Date, ForeignKey, Index
 from sqlalchemy.orm import mapped_column, Mapped
 
 from app.database import Base
@@ -19,7 +19,14 @@ class Users(Base):
     description: Mapped[str]
     birthday: Mapped[date] = mapped_column(Date)
     gender: Mapped[Literal["man","woman"]]
-    city: Mapped[str]
+    city: Mapped[str] = mapped_column(index=True)
     profession : Mapped[str]
+    # Код профессии в реестре professions (для скоринга)
+    profession_code: Mapped[int | None] = mapped_column(ForeignKey("professions.code"))
     experience : Mapped[float]
 
+    # Keyset-пагинация в порядке (date_created, id)
+    __table_args__ = (
+        Index("ix_users_date_created_id", "date_created", "id"),
+    )
+
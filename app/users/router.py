@@ -1,13 +1,18 @@
 from datetime import date
+import json
 import logging
+import uuid
 from typing import Literal, Optional
-from fastapi import APIRouter, HTTPException, Query,status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
 from pydantic import UUID4
 from sqlalchemy import UUID
 from fastapi_cache import FastAPICache
 from fastapi_cache.backends.redis import RedisBackend
 from fastapi_cache.decorator import cache
 
+from app.config import settings
+from app.users import importer
 from app.users.dao import UsersDAO
 from app.users.schemas import UserCreate, SUsers
 
@@ -22,48 +27,76 @@ router = APIRouter(
 
 
 
-@router.get("/all", summary="Get all users", response_model=list[SUsers])
-async def get_users(
-    offset: int = Query(0, ge=0, description="Смещение для пагинации"),
-    limit: int = Query(10, ge=1, le=100, description="Количество записей для возврата"),
+def user_filters(
     first_name: str | None = Query(None, description="Фильтр по имени"),
     surname: str | None = Query(None, description="Фильтр по фамилии"),
     birthday: date | None = Query(None, description="Фильтр по дате рождения"),
     gender: Literal["man","woman"] | None = Query(None, description="Фильтр по полу"),
     city: str | None = Query(None, description="Фильтр по городу"),
     profession : str | None = Query(None, description="Фильтр по профессии"),
+) -> dict:
+    filters = {
+        "first_name": first_name,
+        "surname": surname,
+        "birthday": birthday,
+        "gender": gender,
+        "city": city,
+        "profession": profession,
+    }
+    return {key: value for key, value in filters.items() if value}
+
+
+@router.get("/all", summary="Get all users", response_model=list[SUsers])
+async def get_users(
+    offset: int = Query(0, ge=0, description="Смещение для пагинации"),
+    limit: int = Query(10, ge=1, le=100, description="Количество записей для возврата"),
+    filters: dict = Depends(user_filters),
 ):
     """
     Возвращает записи из таблицы users с возможностью фильтрации.
     Параметры:
         offset: int — смещение для пагинации.
         limit: int — количество записей для возврата.
-        first_name: str — имя (необязателен).
-        surname: str — фамилия (необязателен).
-        birthday: date — дата рождения (необязателен).
-        genger : Literal["man","woman"] — пол (необязателен).
-        city: str — город (необязателен).
-        profession: str — профессия (необязателен).
+        filters — first_name, surname, birthday, gender, city, profession (необязательны, см. user_filters).
     """
-    filters = {}
-    if first_name:
-        filters['first_name'] = first_name          
-    if surname: 
-        filters['surname'] = surname
-    if birthday:
-        filters['birthday'] = birthday
-    if gender:
-        filters['gender'] = gender
-    if city:
-        filters['city'] = city
-    if profession:
-        filters['profession'] = profession
-
     result = await UsersDAO.find_all(offset=offset, limit=limit, **filters)
     if not result:
         raise HTTPException(status_code=404, detail="Users not found")
     return result
 
+
+@router.get("/page", summary="Get users page by cursor")
+async def get_users_page(
+    cursor: str | None = Query(None, description="next_cursor предыдущей страницы"),
+    limit: int = Query(100, ge=1, le=1000, description="Количество записей на странице"),
+    order: Literal["id", "date_created"] = Query("id", description="Порядок: по id или по (date_created, id)"),
+    filters: dict = Depends(user_filters),
+):
+    """
+    Keyset-пагинация пользователей: следующая страница запрашивается
+    с cursor=next_cursor, на последней странице next_cursor равен null.
+    """
+    keys = ("id",) if order == "id" else ("date_created", "id")
+    rows, next_cursor = await UsersDAO.find_page(cursor=cursor, limit=limit, keys=keys, **filters)
+    return {
+        "items": [SUsers.model_validate(row, from_attributes=True) for row in rows],
+        "next_cursor": next_cursor,
+    }
+
+
+@router.get("/export", summary="Export users as NDJSON")
+async def export_users(filters: dict = Depends(user_filters)):
+    """
+    Выгрузка всех пользователей (с фильтрами) в NDJSON, по одному пользователю в строке.
+    Строки читаются серверным курсором пачками, память воркера не зависит от размера таблицы.
+    """
+    async def lines():
+        async for chunk in UsersDAO.stream_all(chunk_size=settings.USER_EXPORT_CHUNK_SIZE, **filters):
+            yield "".join(json.dumps(row, default=str, ensure_ascii=False) + "\n" for row in chunk)
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
 @router.get("/find_by_id/{id}", summary="Get user by id")
 @cache(expire=60)
 async def get_users_by_id(id)-> SUsers:
@@ -112,6 +145,47 @@ async def add_user(user: UserCreate):
         )
     
 
+@router.post("/import", summary="Bulk import users")
+async def import_users(
+    request: Request,
+    format: Literal["ndjson", "csv"] = Query("ndjson", description="Формат тела запроса: NDJSON или CSV с заголовком"),
+    import_id: str | None = Query(None, max_length=64, description="Идентификатор импорта для GET /users/import/{import_id}"),
+):
+    """
+    Массовый импорт пользователей из тела запроса (NDJSON или CSV, поля как у /users/add).
+    Тело читается потоком и обрабатывается пачками по USER_IMPORT_CHUNK_SIZE строк;
+    строки с ошибками пропускаются. Возвращает число обработанных, добавленных
+    и ошибочных строк, ошибки по номерам строк (первые 1000) и по пачкам (chunk_errors).
+    Ход импорта после каждой пачки доступен по GET /users/import/{import_id}.
+    """
+    import_id = import_id or uuid.uuid4().hex
+    redis = FastAPICache.get_backend().redis
+    progress = importer.new_report()
+
+    async def save_status(report: dict, state: str = "running"):
+        progress.update(report)
+        status_json = json.dumps({"import_id": import_id, "state": state, **report}, ensure_ascii=False)
+        await redis.set(f"user_import:{import_id}", status_json, ex=settings.USER_IMPORT_STATUS_TTL)
+
+    await save_status(importer.new_report())
+    try:
+        report = await importer.import_users(request.stream(), format, on_progress=save_status)
+    except Exception:
+        await save_status(progress, state="failed")
+        raise
+    await save_status(report, state="done")
+    return {"import_id": import_id, **report}
+
+
+@router.get("/import/{import_id}", summary="Bulk import status")
+async def get_import_status(import_id: str):
+    """Статус импорта: state (running, done, failed) и отчёт на момент последней обработанной пачки."""
+    status_json = await FastAPICache.get_backend().redis.get(f"user_import:{import_id}")
+    if status_json is None:
+        raise HTTPException(status_code=404, detail="Import not found")
+    return json.loads(status_json)
+
+
 @router.delete("/")
 async def delete_users(
     id: Optional[UUID4] = Query(None, description="Удаление по ID"), 